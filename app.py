@@ -1,16 +1,28 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
 import pandas as pd
 import os
 import time
 import tempfile
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from werkzeug.utils import secure_filename
 import json
 
 # Import các module thuật toán
-from clean_data import process_transaction
-from apriori_test import main_apriori_algorithm, print_final_results
-from fpgrowth_test import fpgrowth, printResults
-from code_lib import run_library_algorithm
+from clean_data import process_transaction_csr, csr_to_transactions, deduplicate_csr
+from ingest_cache import IngestCache, PARQUET_AVAILABLE, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, file_digest
+from result_cache import ResultCache, result_key, DEFAULT_MAX_MEMORY_BYTES, DEFAULT_MAX_DISK_BYTES
+from apriori_test import main_apriori_algorithm, print_final_results, SUPPORT_COUNTING_BACKENDS
+from fpgrowth_test import fpgrowth, printResults, FP_TREE_BACKENDS
+from eclat_test import eclat, ECLAT_MODES
+from code_lib import run_library_baseline
+from execution_trace import ExecutionTrace, parse_trace_level
+from condensed_itemsets import ITEMSET_OUTPUTS
+from mining_limits import MiningBudget, BUDGET_LIMITS, check_limits
+from job_queue import JobQueue, JobCancelled, QueueFull, FINAL_STATES, JOB_SUCCEEDED
+from threshold_sweep import mine_support_index, parse_grid, SWEEP_ALGORITHMS, DEFAULT_CONFIDENCE_GRID
+from result_pages import RESULT_KINDS, select_records, page_records, iter_ndjson, compare_itemsets, compare_rules
 
 # Load product descriptions
 def load_product_descriptions():
@@ -33,12 +45,16 @@ def load_product_descriptions():
 
 # Global variables
 PRODUCT_DESCRIPTIONS = load_product_descriptions()
-LIBRARY_RESULTS = None  # Store library results for comparison
+LAST_JOB_ARTIFACTS = None  # Artifacts (library results) of the last finished run, for /compare
 
 def get_product_name(stock_code):
     """Get product description from stock code"""
     return PRODUCT_DESCRIPTIONS.get(str(stock_code), f"Unknown Product ({stock_code})")
 
+def describe_rule(rule):
+    """Copy of a rule record with its product description, added when the rule is served"""
+    return {**rule, 'description': format_rule_description(rule['antecedent'], rule['consequent'], rule['confidence'])}
+
 def format_rule_description(antecedent, consequent, confidence):
     """Format association rule with product names"""
     # Convert all items to string to handle mixed types
@@ -61,116 +77,245 @@ def format_rule_description(antecedent, consequent, confidence):
         return f"Nếu mua {antecedent_text} thì khả năng mua {consequent_text} với độ tin cậy là: {confidence*100:.1f}%"
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 50)) * 1024 * 1024  # 50MB max file size by default
+# File CSV được đọc từng khối ngần này dòng để bộ nhớ không phụ thuộc kích thước file
+app.config['CSV_CHUNK_SIZE'] = int(os.environ.get('CSV_CHUNK_SIZE', 100000))
 
 ALLOWED_EXTENSIONS = {'csv', 'xlsx'}
 
+# Dữ liệu đã làm sạch của mỗi file tải lên được lưu theo mã băm nội dung, lần chạy sau với cùng file
+# không phải đọc lại Excel / CSV; cache cần pyarrow, thiếu thì tắt
+app.config['INGEST_CACHE_DIR'] = os.environ.get('INGEST_CACHE_DIR', DEFAULT_CACHE_DIR)
+app.config['INGEST_CACHE_MAX_BYTES'] = int(os.environ.get('INGEST_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+if PARQUET_AVAILABLE:
+    INGEST_CACHE = IngestCache(app.config['INGEST_CACHE_DIR'], app.config['INGEST_CACHE_MAX_BYTES'])
+else:
+    INGEST_CACHE = None
+    print("⚠️ pyarrow is not installed, the ingest cache is disabled")
+
+# Kết quả /upload được lưu theo mã băm file và mọi tham số, gửi lại cùng file với cùng tham số thì trả
+# về ngay; tầng đĩa chỉ bật khi có RESULT_CACHE_DIR
+app.config['RESULT_CACHE_MAX_MEMORY_BYTES'] = int(os.environ.get('RESULT_CACHE_MAX_MEMORY_BYTES',
+                                                                 DEFAULT_MAX_MEMORY_BYTES))
+app.config['RESULT_CACHE_DIR'] = os.environ.get('RESULT_CACHE_DIR')
+app.config['RESULT_CACHE_MAX_DISK_BYTES'] = int(os.environ.get('RESULT_CACHE_MAX_DISK_BYTES', DEFAULT_MAX_DISK_BYTES))
+RESULT_CACHE = ResultCache(app.config['RESULT_CACHE_MAX_MEMORY_BYTES'], app.config['RESULT_CACHE_DIR'],
+                           app.config['RESULT_CACHE_MAX_DISK_BYTES'])
+
+# Các lần khai thác chạy nền trong một nhóm luồng có giới hạn, /upload chỉ xếp hàng và trả về job ID
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_MAX_PENDING'] = int(os.environ.get('JOB_MAX_PENDING', 16))
+JOB_QUEUE = JobQueue(app.config['JOB_WORKERS'], app.config['JOB_MAX_PENDING'])
+
+# Baseline mlxtend chạy trong tiến trình riêng, song song với thuật toán tự viết ('concurrent'),
+# hoặc chỉ chạy khi /compare được gọi ('deferred')
+BASELINE_MODES = ('concurrent', 'deferred')
+app.config['BASELINE_WORKERS'] = int(os.environ.get('BASELINE_WORKERS', app.config['JOB_WORKERS']))
+BASELINE_EXECUTOR = None
+BASELINE_LOCK = threading.Lock()
+
+# Giới hạn tài nguyên mặc định của một lần khai thác, form có thể đổi từng giới hạn (None là không giới hạn)
+# Hết giới hạn thì thuật toán dừng sớm và trả về kết quả dở dang kèm giới hạn đã chạm
+MINING_BUDGET_DEFAULTS = {
+    'max_candidates': None,
+    'max_itemsets': 500000,
+    'max_seconds': 300,
+    'max_memory_mb': None,
+}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def capture_algorithm_steps(algorithm_func, *args):
-    """Capture algorithm execution steps and results"""
-    import io
-    import sys
-    from contextlib import redirect_stdout
-
-    # Capture stdout
-    captured_output = io.StringIO()
+def read_mining_budget(form):
+    """MiningBudget from the max_candidates / max_itemsets / max_seconds / max_memory_mb form fields
+
+    A blank field keeps the server default of MINING_BUDGET_DEFAULTS, raises ValueError.
+    """
+    limits = {}
+    for limit in BUDGET_LIMITS:
+        value = form.get(limit, '').strip()
+        if not value:
+            limits[limit] = MINING_BUDGET_DEFAULTS[limit]
+            continue
+        value = int(value) if limit in ('max_candidates', 'max_itemsets') else float(value)
+        if value <= 0:
+            raise ValueError(f"{limit} must be positive, got {value}")
+        limits[limit] = value
+    return MiningBudget(**limits)
+
+def baseline_executor():
+    """Process pool of the library baseline, created on first use (caller holds BASELINE_LOCK)"""
+    global BASELINE_EXECUTOR
+    if BASELINE_EXECUTOR is None:
+        BASELINE_EXECUTOR = ProcessPoolExecutor(max_workers=app.config['BASELINE_WORKERS'])
+    return BASELINE_EXECUTOR
+
+def start_library_baseline(artifacts):
+    """Submit the baseline of artifacts['library_input'] to the process pool, once"""
+    with BASELINE_LOCK:
+        future = artifacts.get('library_future')
+        if future is None and artifacts.get('library') is None and artifacts.get('library_input') is not None:
+            csr, support_threshold, confidence_threshold = artifacts['library_input']
+            future = baseline_executor().submit(run_library_baseline, csr, support_threshold, confidence_threshold)
+            artifacts['library_future'] = future
+    return future
+
+def library_baseline(artifacts):
+    """Library results of a run, waiting for its baseline; a deferred baseline is started now"""
+    if artifacts.get('library') is None:
+        future = start_library_baseline(artifacts)
+        if future is not None:
+            artifacts['library'] = future.result()
+            artifacts.pop('library_input', None)
+    return artifacts.get('library')
+
+def capture_algorithm_steps(algorithm_func, *args, trace_level='summary', **kwargs):
+    """Capture algorithm execution steps and results
+
+    Steps are recorded in an ExecutionTrace at trace_level ('off', 'summary' or 'detailed'),
+    nothing is formatted for levels that are not enabled.
+    """
+    trace = ExecutionTrace(trace_level)
     start_time = time.time()
 
-    with redirect_stdout(captured_output):
-        result = algorithm_func(*args)
+    result = algorithm_func(*args, trace=trace, **kwargs)
 
     end_time = time.time()
     execution_time = end_time - start_time
 
-    steps = captured_output.getvalue()
+    steps = trace.render()
     return result, steps, execution_time
 
-def format_transactions_for_algorithms(transactions_list):
-    """Clean data already returns list format, just pass through with debug info"""
-    print(f"Debug: transactions_list type: {type(transactions_list)}")
-    print(f"Debug: transactions_list length: {len(transactions_list)}")
-    print(f"Debug: transactions_list sample: {transactions_list[:3] if transactions_list else 'Empty'}")
-
-    return transactions_list
-
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/upload', methods=['POST'])
-def upload_file():
+def remove_upload(temp_dir):
+    """Delete the temporary directory of an upload with the file saved in it"""
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+# Các bước của một lần khai thác, job báo tiến độ theo từng bước
+MINING_JOB_PHASES = ('cleaning', 'mining', 'formatting', 'library')
+
+def run_mining_job(job, temp_file_path, algorithm, parameters, budget):
+    """Clean an upload, run the selected engine and the library baseline as a JOB_QUEUE job
+
+    The engine runs in the job thread while the baseline runs in a BASELINE_EXECUTOR process,
+    unless the baseline is deferred to /compare. Returns (response, http status). Cancelling
+    the job stops the engine through the budget and the job itself at the next phase.
+    """
+    global LAST_JOB_ARTIFACTS
+    job.on_cancel(budget.cancel)
+    support_threshold = parameters['support_threshold']
+    confidence_threshold = parameters['confidence_threshold']
+    apriori_backend = parameters['apriori_backend']
+    transaction_reduction = parameters['transaction_reduction']
+    trace_level = parameters['trace_level']
+    fp_backend = parameters['fp_backend']
+    workers = parameters['workers']
+    eclat_mode = parameters['eclat_mode']
+    itemset_output = parameters['itemset_output']
+    top_k = parameters['top_k']
+    max_len = parameters['max_len']
+    baseline = parameters['baseline']
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-
-        file = request.files['file']
-        algorithm = request.form.get('algorithm', 'apriori')
-        support_threshold = float(request.form.get('support_threshold', 0.3))
-        confidence_threshold = float(request.form.get('confidence_threshold', 0.6))
-
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type. Please upload CSV or XLSX files.'}), 400
-
-        # Save uploaded file temporarily
-        filename = secure_filename(file.filename)
-        temp_dir = tempfile.mkdtemp()
-        temp_file_path = os.path.join(temp_dir, filename)
-        file.save(temp_file_path)
+        # Cùng file, cùng thuật toán và tham số: trả về kết quả đã lưu
+        digest = file_digest(temp_file_path)
+        cache_key = result_key(digest, {'algorithm': algorithm, **parameters})
+        cached, cache_tier = RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            job.artifacts['library'] = cached['library']
+            job.artifacts['library_input'] = cached.get('library_input')
+            LAST_JOB_ARTIFACTS = job.artifacts
+            response_data = cached['response']
+            response_data['result_cache'] = {'hit': True, 'tier': cache_tier, **RESULT_CACHE.stats()}
+            return response_data, 200
 
         # Step 1: Clean data
+        job.start_phase('cleaning')
         print("Processing data...")
         clean_start_time = time.time()
-        transactions_list = process_transaction(temp_file_path)  # clean_data.py trả về list
+        # Thời gian CPU của luồng job; tiến trình con của thuật toán (workers > 1) không được tính
+        clean_cpu_start = time.thread_time()
+        cache_hits = INGEST_CACHE.hits if INGEST_CACHE is not None else 0
+        # Giao dịch ở dạng CSR (indptr, item_ids, vocabulary), chỉ đổi sang list khi thuật toán cần
+        indptr, item_ids, vocabulary = process_transaction_csr(temp_file_path, INGEST_CACHE,
+                                                               app.config['CSV_CHUNK_SIZE'], digest)
+        total_transactions = len(indptr) - 1
+        ingest_cache_hit = INGEST_CACHE is not None and INGEST_CACHE.hits > cache_hits
         clean_end_time = time.time()
         clean_time = clean_end_time - clean_start_time
-
-        # Format for algorithms (just pass through with debug)
-        transactions_list = format_transactions_for_algorithms(transactions_list)
+        clean_cpu_time = time.thread_time() - clean_cpu_start
 
         # Debug: Check if we have enough data
-        print(f"Debug: Total transactions after cleaning: {len(transactions_list)}")
-        if len(transactions_list) == 0:
-            return jsonify({'error': 'No valid transactions found after data cleaning'}), 400
+        print(f"Debug: Total transactions after cleaning: {total_transactions}")
+        if total_transactions == 0:
+            return {'error': 'No valid transactions found after data cleaning'}, 400
 
         # Calculate minimum support count
-        min_support_count = len(transactions_list) * support_threshold
+        min_support_count = total_transactions * support_threshold
         print(f"Debug: Minimum support count needed: {min_support_count} (threshold: {support_threshold})")
 
-        # Show sample transactions
+        # Show sample transactions, chỉ giải mã vài dòng đầu của CSR
         print("Debug: Sample transactions:")
-        for i, trans in enumerate(transactions_list[:5]):
+        sample_rows = min(5, total_transactions)
+        for i, trans in enumerate(csr_to_transactions(indptr[:sample_rows + 1], item_ids[:indptr[sample_rows]],
+                                                        vocabulary)):
             print(f"  Transaction {i+1}: {trans}")
 
-        if len(transactions_list) < 5:
+        if total_transactions < 5:
             print("Warning: Very few transactions. Consider lowering support threshold.")
 
-        # Step 2: Run library algorithm in parallel
-        print("Running library algorithm...")
-        library_start_time = time.time()
-        library_result = run_library_algorithm(transactions_list, support_threshold, confidence_threshold)
-        library_end_time = time.time()
-        library_time = library_end_time - library_start_time
+        # Step 2: Baseline thư viện chạy trong tiến trình riêng, song song với thuật toán tự viết
+        job.artifacts['library_input'] = ((indptr, item_ids, vocabulary), support_threshold, confidence_threshold)
+        if baseline == 'concurrent':
+            print("Running library algorithm in a separate process...")
+            job.on_cancel(start_library_baseline(job.artifacts).cancel)
 
-        # Store library results globally for comparison
-        global LIBRARY_RESULTS
-        LIBRARY_RESULTS = library_result
+        # Identical baskets are mined once, weighted by how often they occur
+        job.start_phase('mining')
+        mining_cpu_start = time.thread_time()
+        unique_indptr, unique_item_ids, transaction_weights = deduplicate_csr(indptr, item_ids)
+        unique_transactions = csr_to_transactions(unique_indptr, unique_item_ids, vocabulary)
+        print(f"Debug: {len(unique_transactions)} distinct baskets out of {total_transactions} transactions")
 
         # Step 3: Run selected algorithm
-        if algorithm == 'apriori':
-            result, steps, exec_time = capture_algorithm_steps(
-                main_apriori_algorithm,
-                transactions_list,
-                support_threshold,
-                confidence_threshold
-            )
+        if algorithm in ('apriori', 'eclat'):
+            if algorithm == 'apriori':
+                result, steps, exec_time = capture_algorithm_steps(
+                    main_apriori_algorithm,
+                    unique_transactions,
+                    support_threshold,
+                    confidence_threshold,
+                    apriori_backend,
+                    transaction_reduction,
+                    trace_level=trace_level,
+                    weights=transaction_weights,
+                    partitions=workers,
+                    output=itemset_output,
+                    max_len=max_len,
+                    top_k=top_k,
+                    budget=budget
+                )
+            else:
+                result, steps, exec_time = capture_algorithm_steps(
+                    eclat,
+                    unique_transactions,
+                    support_threshold,
+                    confidence_threshold,
+                    eclat_mode,
+                    trace_level=trace_level,
+                    weights=transaction_weights,
+                    output=itemset_output,
+                    max_len=max_len,
+                    top_k=top_k,
+                    budget=budget
+                )
+            # Apriori và Eclat trả về cùng một dạng kết quả
             itemsets, rules = result
 
             # Format results for JSON
+            job.start_phase('formatting')
             formatted_itemsets = []
             for itemset, support in itemsets:
                 formatted_itemsets.append({
@@ -190,8 +335,7 @@ def upload_file():
                 formatted_rules.append({
                     'antecedent': list(antecedent),
                     'consequent': list(consequent),
-                    'confidence': round(confidence, 4),
-                    'description': format_rule_description(list(antecedent), list(consequent), confidence)
+                    'confidence': round(confidence, 4)
                 })
 
             # Sắp xếp theo confidence từ cao xuống thấp
@@ -200,28 +344,29 @@ def upload_file():
         else:  # fp-growth
             result, steps, exec_time = capture_algorithm_steps(
                 fpgrowth,
-                transactions_list,
+                unique_transactions,
                 support_threshold,
-                confidence_threshold
+                confidence_threshold,
+                trace_level=trace_level,
+                backend=fp_backend,
+                weights=transaction_weights,
+                workers=workers,
+                output=itemset_output,
+                maxLen=max_len,
+                topK=top_k,
+                budget=budget
             )
 
-            if result is None:
-                return jsonify({'error': 'No frequent itemsets found with given thresholds'}), 400
-
-            freqItems, rules = result
+            if result[0] is None:
+                return {'error': 'No frequent itemsets found with given thresholds'}, 400
 
-            # Calculate support for FP-Growth itemsets
-            def calculate_support_for_itemset(itemset, transactions):
-                count = 0
-                for transaction in transactions:
-                    if set(itemset).issubset(set(transaction)):
-                        count += 1
-                return count / len(transactions)
+            freqItems, rules, supportCounts = result
 
-            # Format results for JSON
+            # Format results for JSON, supports come from the counts recorded while mining
+            job.start_phase('formatting')
             formatted_itemsets = []
             for itemset in freqItems:
-                support = calculate_support_for_itemset(itemset, transactions_list)
+                support = supportCounts[frozenset(itemset)] / total_transactions
                 formatted_itemsets.append({
                     'itemset': list(itemset),
                     'support': round(support, 4)
@@ -240,38 +385,341 @@ def upload_file():
                 formatted_rules.append({
                     'antecedent': list(antecedent),
                     'consequent': list(consequent),
-                    'confidence': round(confidence, 4),
-                    'description': format_rule_description(list(antecedent), list(consequent), confidence)
+                    'confidence': round(confidence, 4)
                 })
 
             # Sắp xếp theo confidence từ cao xuống thấp
             formatted_rules.sort(key=lambda x: x['confidence'], reverse=True)
 
-        # Clean up temporary files
-        os.remove(temp_file_path)
-        os.rmdir(temp_dir)
+        mining_cpu_time = time.thread_time() - mining_cpu_start
+
+        # Chờ baseline nếu nó còn chạy; đường găng là từ lúc làm sạch đến khi cả hai xong
+        baseline_wait_start = time.time()
+        if baseline == 'concurrent':
+            job.start_phase('library')
+            library_result = library_baseline(job.artifacts)
+        else:
+            job.skip_phase('library')
+            library_result = None
+        baseline_wait_time = time.time() - baseline_wait_start
+        critical_path_time = time.time() - clean_start_time
+        library_cpu_time = library_result.get('cpu_time') if library_result is not None else None
 
         # Prepare response
         response_data = {
             'success': True,
             'algorithm': algorithm,
-            'parameters': {
-                'support_threshold': support_threshold,
-                'confidence_threshold': confidence_threshold
-            },
+            'parameters': parameters,
             'data_info': {
-                'total_transactions': len(transactions_list),
-                'cleaning_time': round(clean_time, 4)
+                'total_transactions': total_transactions,
+                'distinct_transactions': len(unique_transactions),
+                'cleaning_time': round(clean_time, 4),
+                'ingest_cache_hit': ingest_cache_hit
             },
             'results': {
                 'frequent_itemsets': formatted_itemsets,
                 'association_rules': formatted_rules,
                 'execution_time': round(exec_time, 4),
-                'steps': steps
+                'steps': steps,
+                # Kết quả dở dang khi thuật toán dừng vì chạm giới hạn tài nguyên
+                'partial': budget.exceeded is not None,
+                'budget': budget.report()
+            },
+            'timings': {
+                'baseline': baseline,
+                # Thời gian chờ của request: làm sạch + max(thuật toán, baseline)
+                'critical_path_time': round(critical_path_time, 4),
+                'baseline_time': round(library_result['execution_time'], 4) if library_result is not None else None,
+                'baseline_wait_time': round(baseline_wait_time, 4),
+                'cpu_time': {
+                    'cleaning': round(clean_cpu_time, 4),
+                    'mining': round(mining_cpu_time, 4),
+                    'baseline': round(library_cpu_time, 4) if library_cpu_time is not None else None,
+                    'total': round(clean_cpu_time + mining_cpu_time + (library_cpu_time or 0), 4)
+                }
             }
         }
 
-        return jsonify(response_data)
+        # Kết quả dở dang phụ thuộc thời gian / bộ nhớ lúc chạy nên không lưu lại
+        if not response_data['results']['partial']:
+            # Baseline hoãn lại chưa chạy: lưu dữ liệu CSR để /compare vẫn chạy được sau khi lấy từ cache
+            RESULT_CACHE.put(cache_key, {'response': response_data, 'library': library_result,
+                                         'library_input': job.artifacts.get('library_input')})
+        response_data['result_cache'] = {'hit': False, 'tier': None, **RESULT_CACHE.stats()}
+        LAST_JOB_ARTIFACTS = job.artifacts
+
+        return response_data, 200
+
+    except JobCancelled:
+        raise
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        print(f"Error occurred: {str(e)}")
+        print(f"Full traceback: {error_details}")
+        return {'error': f'Error processing file: {str(e)}', 'details': error_details}, 500
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file uploaded'}), 400
+
+        file = request.files['file']
+        algorithm = request.form.get('algorithm', 'apriori')
+        support_threshold = float(request.form.get('support_threshold', 0.3))
+        confidence_threshold = float(request.form.get('confidence_threshold', 0.6))
+        apriori_backend = request.form.get('apriori_backend', 'scan')
+        transaction_reduction = request.form.get('transaction_reduction') in ('on', 'true', '1')
+        trace_level = request.form.get('trace_level', 'summary')
+        fp_backend = request.form.get('fp_backend', 'object')
+        workers = request.form.get('workers', '1')
+        eclat_mode = request.form.get('eclat_mode', 'diffset')
+        itemset_output = request.form.get('itemset_output', 'all')
+        top_k = request.form.get('top_k', '').strip()
+        max_len = request.form.get('max_len', '').strip()
+        baseline = request.form.get('baseline', 'concurrent')
+
+        if apriori_backend not in SUPPORT_COUNTING_BACKENDS:
+            return jsonify({'error': f'Invalid Apriori backend: {apriori_backend}'}), 400
+
+        if fp_backend not in FP_TREE_BACKENDS:
+            return jsonify({'error': f'Invalid FP-tree backend: {fp_backend}'}), 400
+
+        if eclat_mode not in ECLAT_MODES:
+            return jsonify({'error': f'Invalid Eclat mode: {eclat_mode}'}), 400
+
+        if baseline not in BASELINE_MODES:
+            return jsonify({'error': f'Invalid baseline mode: {baseline}'}), 400
+
+        if itemset_output not in ITEMSET_OUTPUTS:
+            return jsonify({'error': f'Invalid itemset output: {itemset_output}'}), 400
+
+        # Để trống top_k / max_len nghĩa là không giới hạn
+        try:
+            top_k = int(top_k) if top_k else None
+            max_len = int(max_len) if max_len else None
+            check_limits(itemset_output, top_k, max_len)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid top_k / max_len: {e}'}), 400
+
+        try:
+            budget = read_mining_budget(request.form)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid mining budget: {e}'}), 400
+
+        try:
+            workers = int(workers)
+        except ValueError:
+            return jsonify({'error': f'Invalid number of workers: {workers}'}), 400
+        if workers < 1:
+            return jsonify({'error': 'Number of workers must be at least 1'}), 400
+        # Không chạy nhiều tiến trình hơn số lõi của máy chủ
+        workers = min(workers, os.cpu_count() or 1)
+
+        try:
+            parse_trace_level(trace_level)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        parameters = {
+            'support_threshold': support_threshold,
+            'confidence_threshold': confidence_threshold,
+            'apriori_backend': apriori_backend,
+            'transaction_reduction': transaction_reduction,
+            'trace_level': trace_level,
+            'fp_backend': fp_backend,
+            'workers': workers,
+            'eclat_mode': eclat_mode,
+            'itemset_output': itemset_output,
+            'top_k': top_k,
+            'max_len': max_len,
+            'baseline': baseline,
+            'budget': budget.limits
+        }
+
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'Invalid file type. Please upload CSV or XLSX files.'}), 400
+
+        # Save uploaded file temporarily
+        filename = secure_filename(file.filename)
+        temp_dir = tempfile.mkdtemp()
+        temp_file_path = os.path.join(temp_dir, filename)
+        file.save(temp_file_path)
+
+        try:
+            # Thư mục tạm bị xoá khi job kết thúc, kể cả khi job bị huỷ trước khi chạy
+            job = JOB_QUEUE.submit(run_mining_job, MINING_JOB_PHASES, temp_file_path, algorithm, parameters,
+                                   budget, cleanup=lambda: remove_upload(temp_dir))
+        except QueueFull as e:
+            remove_upload(temp_dir)
+            return jsonify({'error': f'Server busy, try again later: {e}'}), 503
+
+        # Trả về ngay, client hỏi tiến độ qua /jobs/<job_id> rồi lấy kết quả ở /jobs/<job_id>/result
+        return jsonify({
+            'success': True,
+            'algorithm': algorithm,
+            **job.to_dict(),
+            'status_url': f'/jobs/{job.id}',
+            'result_url': f'/jobs/{job.id}/result',
+            'cancel_url': f'/jobs/{job.id}/cancel'
+        }), 202
+
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        print(f"Error occurred: {str(e)}")
+        print(f"Full traceback: {error_details}")
+        return jsonify({'error': f'Error processing file: {str(e)}', 'details': error_details}), 500
+
+# Các bước của một lần quét ngưỡng
+SWEEP_JOB_PHASES = ('cleaning', 'mining', 'sweep')
+
+def run_sweep_job(job, temp_file_path, algorithm, support_floor, support_grid, confidence_grid, budget):
+    """Mine an upload once at support_floor and count itemsets / rules over the threshold grids
+
+    The support index stays in job.artifacts['sweep_index'], /jobs/<id>/sweep answers other
+    thresholds from it without mining again. Returns (response, http status).
+    """
+    job.on_cancel(budget.cancel)
+    try:
+        # Cùng file, cùng thuật toán và ngưỡng sàn: dùng lại chỉ mục đã khai thác
+        digest = file_digest(temp_file_path)
+        cache_key = result_key(digest, {'sweep': True, 'algorithm': algorithm, 'support_floor': support_floor,
+                                        'budget': budget.limits})
+        index, cache_tier = RESULT_CACHE.get(cache_key)
+        mining_time = 0.0
+
+        if index is None:
+            job.start_phase('cleaning')
+            indptr, item_ids, vocabulary = process_transaction_csr(temp_file_path, INGEST_CACHE,
+                                                                   app.config['CSV_CHUNK_SIZE'], digest)
+            if len(indptr) <= 1:
+                return {'error': 'No valid transactions found after data cleaning'}, 400
+            # Identical baskets are mined once, weighted by how often they occur
+            unique_indptr, unique_item_ids, transaction_weights = deduplicate_csr(indptr, item_ids)
+            unique_transactions = csr_to_transactions(unique_indptr, unique_item_ids, vocabulary)
+
+            job.start_phase('mining')
+            print(f"Mining the support index at floor {support_floor} with {algorithm}...")
+            mining_start_time = time.time()
+            index = mine_support_index(unique_transactions, support_floor, algorithm, transaction_weights,
+                                       budget=budget)
+            mining_time = time.time() - mining_start_time
+        else:
+            job.skip_phase('cleaning')
+            job.skip_phase('mining')
+
+        job.start_phase('sweep')
+        sweep_start_time = time.time()
+        if support_grid is None:
+            support_grid = index.default_support_grid()
+        curve = index.curve(support_grid, confidence_grid)
+        sweep_time = time.time() - sweep_start_time
+
+        # Chỉ mục dở dang phụ thuộc thời gian / bộ nhớ lúc chạy nên không lưu lại
+        if cache_tier is None and not index.partial:
+            RESULT_CACHE.put(cache_key, index)
+        job.artifacts['sweep_index'] = index
+
+        return {
+            'success': True,
+            'algorithm': algorithm,
+            'support_floor': support_floor,
+            'total_transactions': index.total_transactions,
+            'indexed_itemsets': len(index),
+            'indexed_rules': len(index.rule_antecedents),
+            'support_grid': support_grid,
+            'confidence_grid': confidence_grid,
+            'curve': curve,
+            'mining_time': round(mining_time, 4),
+            'sweep_time': round(sweep_time, 4),
+            # Chỉ mục dở dang thiếu một số tập phổ biến, các con số trên đường cong là cận dưới
+            'partial': index.partial,
+            'budget': budget.report(),
+            'result_cache': {'hit': cache_tier is not None, 'tier': cache_tier, **RESULT_CACHE.stats()}
+        }, 200
+
+    except JobCancelled:
+        raise
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        print(f"Error occurred: {str(e)}")
+        print(f"Full traceback: {error_details}")
+        return {'error': f'Error processing file: {str(e)}', 'details': error_details}, 500
+
+@app.route('/sweep', methods=['POST'])
+def sweep_thresholds():
+    """Queue a threshold sweep: one mining pass at support_floor, then counts over the grids
+
+    Form fields: file, algorithm, support_floor (the lowest support_grid value by default),
+    support_grid and confidence_grid as comma separated thresholds, and the budget limits.
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file uploaded'}), 400
+
+        file = request.files['file']
+        algorithm = request.form.get('algorithm', 'fp-growth')
+        if algorithm not in SWEEP_ALGORITHMS:
+            return jsonify({'error': f'Invalid algorithm: {algorithm}'}), 400
+
+        try:
+            support_grid = parse_grid(request.form.get('support_grid'), 'support_grid')
+            confidence_grid = parse_grid(request.form.get('confidence_grid'), 'confidence_grid')
+            support_floor = request.form.get('support_floor', '').strip()
+            if support_floor:
+                support_floor = float(support_floor)
+            elif support_grid is not None:
+                support_floor = support_grid[0]
+            else:
+                return jsonify({'error': 'support_floor or support_grid is required'}), 400
+            if not 0 < support_floor <= 1:
+                raise ValueError(f"support_floor must be in (0, 1], got {support_floor}")
+            if support_grid is not None and support_grid[0] < support_floor:
+                raise ValueError(f"support_grid starts below support_floor {support_floor}")
+        except ValueError as e:
+            return jsonify({'error': f'Invalid thresholds: {e}'}), 400
+        if confidence_grid is None:
+            confidence_grid = list(DEFAULT_CONFIDENCE_GRID)
+
+        try:
+            budget = read_mining_budget(request.form)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid mining budget: {e}'}), 400
+
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'Invalid file type. Please upload CSV or XLSX files.'}), 400
+
+        # Save uploaded file temporarily
+        filename = secure_filename(file.filename)
+        temp_dir = tempfile.mkdtemp()
+        temp_file_path = os.path.join(temp_dir, filename)
+        file.save(temp_file_path)
+
+        try:
+            job = JOB_QUEUE.submit(run_sweep_job, SWEEP_JOB_PHASES, temp_file_path, algorithm, support_floor,
+                                   support_grid, confidence_grid, budget, cleanup=lambda: remove_upload(temp_dir))
+        except QueueFull as e:
+            remove_upload(temp_dir)
+            return jsonify({'error': f'Server busy, try again later: {e}'}), 503
+
+        return jsonify({
+            'success': True,
+            'algorithm': algorithm,
+            **job.to_dict(),
+            'status_url': f'/jobs/{job.id}',
+            'result_url': f'/jobs/{job.id}/result',
+            'query_url': f'/jobs/{job.id}/sweep',
+            'cancel_url': f'/jobs/{job.id}/cancel'
+        }), 202
 
     except Exception as e:
         import traceback
@@ -280,27 +728,224 @@ def upload_file():
         print(f"Full traceback: {error_details}")
         return jsonify({'error': f'Error processing file: {str(e)}', 'details': error_details}), 500
 
+@app.route('/jobs/<job_id>/sweep', methods=['GET'])
+def query_sweep(job_id):
+    """Itemsets and rules of a finished sweep at ?support_threshold= / ?confidence_threshold=
+
+    Answered by filtering the sweep's support index, nothing is mined again.
+    """
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    index = job.artifacts.get('sweep_index')
+    if index is None:
+        return jsonify({'error': f'Job {job_id} holds no finished sweep', **job.to_dict()}), 409
+
+    try:
+        support_threshold = float(request.args.get('support_threshold', index.support_floor))
+        confidence_threshold = float(request.args.get('confidence_threshold', 0.6))
+        start_time = time.time()
+        itemsets = index.frequent_itemsets(support_threshold)
+        rules = index.association_rules(support_threshold, confidence_threshold)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid thresholds: {e}'}), 400
+
+    formatted_itemsets = [
+        {'itemset': list(itemset), 'support': round(support, 4), 'rank': rank}
+        for rank, (itemset, support) in enumerate(itemsets, 1)
+    ]
+    formatted_rules = [
+        {
+            'antecedent': list(antecedent),
+            'consequent': list(consequent),
+            'confidence': round(confidence, 4),
+            'description': format_rule_description(list(antecedent), list(consequent), confidence)
+        }
+        for antecedent, consequent, confidence in rules
+    ]
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'parameters': {
+            'support_threshold': support_threshold,
+            'confidence_threshold': confidence_threshold,
+            'support_floor': index.support_floor
+        },
+        'results': {
+            'frequent_itemsets': formatted_itemsets,
+            'association_rules': formatted_rules,
+            'execution_time': round(time.time() - start_time, 4),
+            'partial': index.partial
+        }
+    })
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status and per-phase progress of a mining job"""
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Response of a finished mining job, 409 while it is still queued or running
+
+    Itemsets, rules and steps of a mining result stay on the server under the job ID as
+    result ID, the response only counts them and links the /results/<id>/... endpoints.
+    """
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    if job.status not in FINAL_STATES:
+        return jsonify({'error': f'Job is {job.status}', **job.to_dict()}), 409
+    if job.status == JOB_SUCCEEDED and 'results' in job.result:
+        return jsonify(summarize_result(job)), job.http_status
+    if job.status == JOB_SUCCEEDED:
+        return jsonify({**job.result, 'job_id': job.id}), job.http_status
+    return jsonify(job.result or {'error': job.error or f'Job {job.status}', **job.to_dict()}), job.http_status or 409
+
+def summarize_result(job):
+    """A mining job's response without its itemsets, rules and steps, with their counts and URLs"""
+    results = job.result['results']
+    summary = {key: value for key, value in job.result.items() if key != 'results'}
+    summary['results'] = {
+        key: value for key, value in results.items()
+        if key not in ('frequent_itemsets', 'association_rules', 'steps')
+    }
+    summary['results']['itemset_count'] = len(results['frequent_itemsets'])
+    summary['results']['rule_count'] = len(results['association_rules'])
+    summary['job_id'] = job.id
+    summary['result_id'] = job.id
+    summary['urls'] = {
+        'itemsets': f'/results/{job.id}/itemsets',
+        'rules': f'/results/{job.id}/rules',
+        'steps': f'/results/{job.id}/steps',
+        'export': f'/results/{job.id}/export'
+    }
+    return summary
+
+def stored_results(result_id):
+    """(results, None) of a finished mining job, or (None, error response)"""
+    job = JOB_QUEUE.get(result_id)
+    if job is None:
+        return None, (jsonify({'error': f'Unknown result: {result_id}'}), 404)
+    if job.status != JOB_SUCCEEDED:
+        return None, (jsonify({'error': f'Job is {job.status}', **job.to_dict()}), 409)
+    if 'results' not in job.result:
+        return None, (jsonify({'error': f'Job {result_id} holds no itemsets or rules'}), 404)
+    return job.result['results'], None
+
+@app.route('/results/<result_id>/steps', methods=['GET'])
+def result_steps(result_id):
+    """Execution steps of a result as plain text"""
+    results, error = stored_results(result_id)
+    if error is not None:
+        return error
+    return Response(results['steps'], mimetype='text/plain')
+
+@app.route('/results/<result_id>/export', methods=['GET'])
+def export_results(result_id):
+    """Stream the itemsets or rules (?kind=) of a result as NDJSON, one record per line
+
+    Takes the same filters and sort as the paginated endpoints, rules get their descriptions
+    while they are streamed.
+    """
+    results, error = stored_results(result_id)
+    if error is not None:
+        return error
+    kind = request.args.get('kind', 'itemsets')
+    try:
+        records, _, _ = select_records(results.get(RESULT_KINDS.get(kind), []), kind, request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+    return Response(
+        iter_ndjson(records, describe_rule if kind == 'rules' else None),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={kind}-{result_id}.ndjson'}
+    )
+
+@app.route('/results/<result_id>/<kind>', methods=['GET'])
+def result_page(result_id, kind):
+    """One page of the itemsets or rules of a result
+
+    ?page= / ?per_page= page, ?sort= / ?order= sort and the filters of result_pages.record_filter
+    narrow the records.
+    """
+    if kind not in RESULT_KINDS:
+        return jsonify({'error': f'Unknown result kind: {kind}'}), 404
+    results, error = stored_results(result_id)
+    if error is not None:
+        return error
+    try:
+        page = page_records(results[RESULT_KINDS[kind]], kind, request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+    if kind == 'rules':
+        page['items'] = [describe_rule(rule) for rule in page['items']]
+    return jsonify({'success': True, 'result_id': result_id, **page})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job or stop a running one"""
+    job = JOB_QUEUE.cancel(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
 @app.route('/compare', methods=['GET'])
 def compare_results():
-    """Compare custom algorithm results with library results"""
+    """Compare custom algorithm results with library results
+
+    ?job_id= compares the stored results of that job with its library run on the server: the
+    response holds the library counts and a 'comparison' with the group sizes and the first
+    page of every group, never the full lists. Without it the full library results of the
+    last finished run are returned. A deferred baseline runs now, the first time it is compared.
+    """
     try:
-        global LIBRARY_RESULTS
+        artifacts = LAST_JOB_ARTIFACTS
+        job_id = request.args.get('job_id')
+        if job_id:
+            results, error = stored_results(job_id)
+            if error is not None:
+                return error
+            artifacts = JOB_QUEUE.get(job_id).artifacts
 
-        if LIBRARY_RESULTS is None:
-            return jsonify({'error': 'No library results available. Please run algorithm first.'}), 400
+        library_results = library_baseline(artifacts) if artifacts is not None else None
 
-        # Add product descriptions to library results
-        if 'association_rules' in LIBRARY_RESULTS:
-            for rule in LIBRARY_RESULTS['association_rules']:
-                rule['description'] = format_rule_description(
-                    rule['antecedent'],
-                    rule['consequent'],
-                    rule['confidence']
-                )
+        if library_results is None:
+            return jsonify({'error': 'No library results available. Please run algorithm first.'}), 400
+        if 'error' in library_results:
+            # run_library_baseline trả về dict lỗi khi mlxtend thất bại
+            return jsonify({'error': f"Library baseline failed: {library_results['error']}",
+                            'library_results': library_results}), 502
+
+        if job_id:
+            # So sánh trên server, chỉ trả về số lượng và trang đầu của mỗi nhóm
+            rules = compare_rules(results['association_rules'], library_results['association_rules'])
+            rules['custom_items'] = [describe_rule(rule) for rule in rules['custom_items']]
+            rules['library_items'] = [describe_rule(rule) for rule in rules['library_items']]
+            library_summary = {
+                key: value for key, value in library_results.items()
+                if key not in ('frequent_itemsets', 'association_rules')
+            }
+            library_summary['itemset_count'] = len(library_results['frequent_itemsets'])
+            library_summary['rule_count'] = len(library_results['association_rules'])
+            return jsonify({
+                'success': True,
+                'library_results': library_summary,
+                'comparison': {
+                    'itemsets': compare_itemsets(results['frequent_itemsets'], library_results['frequent_itemsets']),
+                    'rules': rules
+                }
+            })
 
         return jsonify({
             'success': True,
-            'library_results': LIBRARY_RESULTS
+            'library_results': {
+                **library_results,
+                'association_rules': [describe_rule(rule) for rule in library_results['association_rules']]
+            }
         })
 
     except Exception as e:
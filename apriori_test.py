@@ -1,120 +1,343 @@
 from itertools import chain, combinations
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from execution_trace import ExecutionTrace, TRACE_OFF, TRACE_DETAILED
+from condensed_itemsets import ITEMSET_OUTPUTS, condense_itemsets
+from mining_limits import TopKThreshold, BudgetExceeded, check_limits
+
+# Available support counting backends for main_apriori_algorithm
+#   scan   - horizontal layout, every candidate is tested against every transaction
+#   bitset - vertical layout, every item keeps a bitset of transaction IDs and the
+#            support of an itemset is the popcount of the AND of its items' bitsets
+#   trie   - all candidates of a level are stored in a prefix trie and counted in a
+#            single pass, each transaction only walks the branches it can contain
+# scan is fine for a handful of candidates, trie suits many candidates over short
+# transactions and bitset suits dense data with many long transactions.
+# Every backend accepts optional transaction weights (see clean_data.deduplicate_transactions),
+# a transaction with weight w counts as w identical transactions.
+SUPPORT_COUNTING_BACKENDS = ('scan', 'bitset', 'trie')
+
+if hasattr(int, 'bit_count'):
+    def popcount(bits):
+        """Number of set bits in a non-negative int"""
+        return bits.bit_count()
+else:
+    def popcount(bits):
+        """Number of set bits in a non-negative int"""
+        return bin(bits).count('1')
+
 
 def generate_all_subsets(element_list):
     """Generate all non-empty subsets from input element list"""
     return chain.from_iterable(combinations(element_list, length) for length in range(1, len(element_list)+1))
 
 
-def filter_frequent_itemsets(candidates, transaction_list, min_support_threshold, global_counter, step_name=""):
-    """Filter candidate itemsets based on minimum support threshold with detailed print"""
+def count_support_scan(candidates, transaction_list, weights=None):
+    """Count every candidate by testing it against every transaction"""
+    support_counts = {}
+    for candidate in candidates:
+        count = 0
+        if weights is None:
+            for transaction in transaction_list:
+                if candidate.issubset(transaction):
+                    count += 1
+        else:
+            for transaction, weight in zip(transaction_list, weights):
+                if candidate.issubset(transaction):
+                    count += weight
+        support_counts[candidate] = count
+    return support_counts
+
+
+def build_tid_bitsets(transaction_list):
+    """Build the vertical layout: item -> bitset of the IDs of transactions containing it
+
+    Bit i of an item's bitset is set when transaction i contains the item. Bitsets are
+    packed into Python ints so intersections are a single AND over machine words.
+    """
+    num_bytes = (len(transaction_list) + 7) // 8
+    packed_bits = {}
+    for tid, transaction in enumerate(transaction_list):
+        byte_index, bit_mask = tid >> 3, 1 << (tid & 7)
+        for item in transaction:
+            bits = packed_bits.get(item)
+            if bits is None:
+                bits = packed_bits[item] = bytearray(num_bytes)
+            bits[byte_index] |= bit_mask
+
+    return {item: int.from_bytes(bits, 'little') for item, bits in packed_bits.items()}
+
+
+def build_weight_masks(weights):
+    """Group transaction IDs by weight: weight -> bitset of the IDs of transactions with that weight
+
+    A weighted support is then sum(weight * popcount(bits & mask)), one popcount per distinct
+    weight, and there are only a few distinct weights in practice.
+    """
+    # Each transaction "contains" its own weight, so the vertical layout is exactly the masks
+    return build_tid_bitsets([(weight,) for weight in weights])
+
+
+def count_support_bitset(candidates, tid_bitsets, weight_masks=None):
+    """Count every candidate by AND-ing the TID bitsets of its items and taking the popcount
+
+    weight_masks: optional result of build_weight_masks for weighted transactions
+    """
+    support_counts = {}
+    for candidate in candidates:
+        # Intersect the rarest items first so empty intersections stop early
+        item_bits = sorted((tid_bitsets.get(item, 0) for item in candidate), key=popcount)
+        bits = item_bits[0]
+        for other_bits in item_bits[1:]:
+            if not bits:
+                break
+            bits &= other_bits
+        if weight_masks is None:
+            support_counts[candidate] = popcount(bits)
+        else:
+            support_counts[candidate] = sum(weight * popcount(bits & mask) for weight, mask in weight_masks.items())
+    return support_counts
+
+
+class CandidateTrie:
+    """Prefix trie holding all candidates of one level for single-pass support counting
+
+    Items are encoded as integers and every candidate is stored as the path of its sorted
+    item IDs. Inner nodes are dicts {item_id: child}, the nodes at depth k are [count] cells.
+    """
+
+    def __init__(self, candidates):
+        self.candidates = list(candidates)
+        self.size = len(next(iter(self.candidates))) if self.candidates else 0
+        self.item_to_id = {item: item_id for item_id, item in
+                           enumerate(sorted({item for candidate in self.candidates for item in candidate}))}
+        self.root = {}
+        self.leaves = []
+
+        for candidate in self.candidates:
+            node = self.root
+            path = sorted(self.item_to_id[item] for item in candidate)
+            for item_id in path[:-1]:
+                node = node.setdefault(item_id, {})
+            leaf = node.setdefault(path[-1], [0])
+            self.leaves.append(leaf)
+
+    def add_transaction(self, transaction, weight=1):
+        """Add weight to every candidate contained in the transaction"""
+        item_ids = sorted(self.item_to_id[item] for item in transaction if item in self.item_to_id)
+        if len(item_ids) >= self.size:
+            self._visit(self.root, item_ids, 0, 1, weight)
+
+    def _visit(self, node, item_ids, start, depth, weight):
+        # Leave room for the (size - depth) items that still have to follow
+        last_position = len(item_ids) - (self.size - depth) - 1
+        for position in range(start, last_position + 1):
+            child = node.get(item_ids[position])
+            if child is None:
+                continue
+            if depth == self.size:
+                child[0] += weight
+            else:
+                self._visit(child, item_ids, position + 1, depth + 1, weight)
+
+    def counts(self):
+        """Support count of every candidate"""
+        return {candidate: leaf[0] for candidate, leaf in zip(self.candidates, self.leaves)}
+
+
+def count_support_trie(candidates, transaction_list, weights=None):
+    """Count all candidates in one pass over the transactions using a CandidateTrie"""
+    trie = CandidateTrie(candidates)
+    if trie.size:
+        if weights is None:
+            for transaction in transaction_list:
+                trie.add_transaction(transaction)
+        else:
+            for transaction, weight in zip(transaction_list, weights):
+                trie.add_transaction(transaction, weight)
+    return trie.counts()
+
+
+def make_support_counter(backend, transactions, weights=None):
+    """Support counter callable for filter_frequent_itemsets using one of SUPPORT_COUNTING_BACKENDS
+
+    The bitset backend indexes transactions up front, so its counter always counts over
+    that full list whatever transaction list it is given.
+    """
+    if backend == 'bitset':
+        tid_bitsets = build_tid_bitsets(transactions)
+        weight_masks = None if weights is None else build_weight_masks(weights)
+        return lambda candidates, _transaction_list, _weights: count_support_bitset(
+            candidates, tid_bitsets, weight_masks)
+    if backend == 'trie':
+        return count_support_trie
+    return count_support_scan
+
+
+def filter_frequent_itemsets(candidates, transaction_list, min_support_threshold, global_counter, step_name="",
+                             support_counter=None, total_transactions=None, trace=None, weights=None):
+    """Filter candidate itemsets based on minimum support threshold with detailed trace
+
+    support_counter: optional callable (candidates, transaction_list, weights) -> support counts,
+    defaults to count_support_scan (see SUPPORT_COUNTING_BACKENDS)
+    total_transactions: number of transactions support ratios are relative to, needed when
+    transaction_list has been reduced (see reduce_transactions) or is weighted
+    weights: optional weight of every transaction in transaction_list
+    """
+    if trace is None:
+        trace = ExecutionTrace.console()
     qualifying_itemsets = set()
     temporary_counter = defaultdict(int)
 
-    print(f"\n{'='*60}")
-    print(f"STEP: {step_name}")
-    print(f"{'='*60}")
-    print(f"Checking {len(candidates)} candidate itemsets with min support = {min_support_threshold}")
-    print(f"Total transactions: {len(transaction_list)}")
-    print(f"-" * 60)
+    if total_transactions is None:
+        total_transactions = len(transaction_list) if weights is None else sum(weights)
+    trace.section(f"STEP: {step_name}")
+    trace.summary("Checking {} candidate itemsets with min support = {}", len(candidates), min_support_threshold)
+    trace.summary("Total transactions: {}", total_transactions)
+    trace.detail("-" * 60)
 
     # Count occurrences of each candidate in transactions
+    if support_counter is None:
+        support_counter = count_support_scan
+    support_counts = support_counter(candidates, transaction_list, weights)
+
     candidates_with_support = []
     for candidate in candidates:
-        count = 0
-        for transaction in transaction_list:
-            if candidate.issubset(transaction):
-                count += 1
-
-        support_ratio = count / len(transaction_list)
+        count = support_counts[candidate]
+        support_ratio = count / total_transactions
         candidates_with_support.append((candidate, count, support_ratio))
 
         # SỬA: Chỉ update global_counter một lần với count chính xác
         global_counter[candidate] = count
 
-    # Sort by support descending for better readability
-    candidates_with_support.sort(key=lambda x: x[2], reverse=True)
-
-    print("Candidate itemsets and their support:")
-    for candidate, count, support_ratio in candidates_with_support:
-        candidate_str = str(tuple(sorted(candidate)))
-        status = "✓ FREQUENT" if support_ratio >= min_support_threshold else "✗ Not frequent"
-        print(f"  {candidate_str:<25} | Count: {count:2d} | Support: {support_ratio:.3f} | {status}")
-
         if support_ratio >= min_support_threshold:
             qualifying_itemsets.add(candidate)
 
-    print(f"\nRESULT: {len(qualifying_itemsets)} frequent itemsets found")
-    if qualifying_itemsets:
+    if trace.detail_enabled:
+        # Sort by support descending for better readability
+        candidates_with_support.sort(key=lambda x: x[2], reverse=True)
+
+        trace.detail("Candidate itemsets and their support:")
+        for candidate, count, support_ratio in candidates_with_support:
+            status = "✓ FREQUENT" if support_ratio >= min_support_threshold else "✗ Not frequent"
+            trace.detail("  {:<25} | Count: {:2d} | Support: {:.3f} | {}",
+                         str(tuple(sorted(candidate))), count, support_ratio, status)
+
+    trace.summary("\nRESULT: {} frequent itemsets found", len(qualifying_itemsets))
+    if not qualifying_itemsets:
+        trace.summary("No frequent itemsets found - algorithm will terminate")
+    elif trace.detail_enabled:
         frequent_list = [tuple(sorted(itemset)) for itemset in qualifying_itemsets]
         frequent_list.sort()
-        print(f"Frequent itemsets: {frequent_list}")
-    else:
-        print("No frequent itemsets found - algorithm will terminate")
+        trace.detail("Frequent itemsets: {}", frequent_list)
 
     return qualifying_itemsets
 
 
-def combine_itemsets(current_itemsets, target_size):
-    """Combine current itemsets to create itemsets of target size"""
-    new_itemsets = []
+def combine_itemsets(current_itemsets, target_size, trace=None, budget=None):
+    """Combine current itemsets to create itemsets of target size (Apriori-gen)
+
+    Items are integer-encoded and every itemset becomes a sorted tuple of item IDs.
+    Two frequent (k-1)-itemsets are joined only when they share the same (k-2)-prefix,
+    and a joined candidate is kept only if all of its (k-1)-subsets are frequent.
+    budget: optional mining_limits.MiningBudget, checked while candidates are generated
+    so a level that explodes is stopped before it is complete (raises BudgetExceeded).
+    """
+    if trace is None:
+        trace = ExecutionTrace.console()
     itemset_list = list(current_itemsets)
 
-    print(f"\n{'='*60}")
-    print(f"GENERATING {target_size}-ITEMSET CANDIDATES")
-    print(f"{'='*60}")
-    print(f"Combining {len(itemset_list)} frequent {target_size-1}-itemsets:")
+    trace.section(f"GENERATING {target_size}-ITEMSET CANDIDATES")
+    trace.summary("Combining {} frequent {}-itemsets:", len(itemset_list), target_size - 1)
 
     # Show current frequent itemsets
-    current_list = [tuple(sorted(itemset)) for itemset in itemset_list]
-    current_list.sort()
-    for itemset in current_list:
-        print(f"  {itemset}")
-
-    for i in range(len(itemset_list)):
-        for j in range(i+1, len(itemset_list)):
-            union_set = itemset_list[i].union(itemset_list[j])
-            if len(union_set) == target_size:
-                new_itemsets.append(union_set)
-
-    # SỬA: Remove duplicates properly
-    unique_itemsets = set()
-    for itemset in new_itemsets:
-        unique_itemsets.add(itemset)
-    new_itemsets = list(unique_itemsets)
-
-    print(f"\nGenerated {len(new_itemsets)} candidates:")
-    candidates_list = [tuple(sorted(itemset)) for itemset in new_itemsets]
-    candidates_list.sort()
-    for candidate in candidates_list:
-        print(f"  {candidate}")
+    if trace.detail_enabled:
+        current_list = [tuple(sorted(itemset)) for itemset in itemset_list]
+        current_list.sort()
+        for itemset in current_list:
+            trace.detail("  {}", itemset)
+
+    # Encode items as integers so itemsets can be compared as sorted tuples
+    id_to_item = sorted({item for itemset in itemset_list for item in itemset})
+    item_to_id = {item: item_id for item_id, item in enumerate(id_to_item)}
+    encoded_itemsets = sorted(tuple(sorted(item_to_id[item] for item in itemset)) for itemset in itemset_list)
+    frequent_lookup = set(encoded_itemsets)
+
+    new_itemsets = []
+    joined_count = 0
+    pruned_count = 0
+
+    # Once sorted, itemsets sharing a (k-2)-prefix form a contiguous block
+    block_start = 0
+    while block_start < len(encoded_itemsets):
+        prefix = encoded_itemsets[block_start][:-1]
+        block_end = block_start + 1
+        while block_end < len(encoded_itemsets) and encoded_itemsets[block_end][:-1] == prefix:
+            block_end += 1
+
+        for i in range(block_start, block_end):
+            if budget is not None:
+                budget.check_candidates(len(new_itemsets))
+                budget.check()
+            for j in range(i+1, block_end):
+                candidate = encoded_itemsets[i] + (encoded_itemsets[j][-1],)
+                joined_count += 1
+
+                # Dropping either of the last two items gives back the joined itemsets,
+                # every other (k-1)-subset has to be looked up
+                if all(candidate[:m] + candidate[m+1:] in frequent_lookup for m in range(target_size - 2)):
+                    new_itemsets.append(frozenset(id_to_item[item_id] for item_id in candidate))
+                else:
+                    pruned_count += 1
+
+        block_start = block_end
+
+    pairwise_count = len(itemset_list) * (len(itemset_list) - 1) // 2
+    trace.summary("\nCandidate generation (pairwise union would test {} pairs):", pairwise_count)
+    trace.summary("  Joined on shared {}-prefix: {}", target_size - 2, joined_count)
+    trace.summary("  Pruned (infrequent {}-subset): {}", target_size - 1, pruned_count)
+    trace.summary("  Remaining candidates: {}", len(new_itemsets))
+
+    if trace.detail_enabled:
+        trace.detail("\nGenerated {} candidates:", len(new_itemsets))
+        candidates_list = [tuple(sorted(itemset)) for itemset in new_itemsets]
+        candidates_list.sort()
+        for candidate in candidates_list:
+            trace.detail("  {}", candidate)
 
     return set(new_itemsets)
 
 
-def generate_association_rules(frequent_itemsets_result, frequency_counter, transactions, confidence_threshold):
-    """Generate association rules with detailed print"""
+def generate_association_rules(frequent_itemsets_result, frequency_counter, transactions, confidence_threshold,
+                               trace=None, total_transactions=None):
+    """Generate association rules with detailed trace
+
+    total_transactions: number of transactions supports are relative to, len(transactions) by default
+    """
+    if trace is None:
+        trace = ExecutionTrace.console()
+    if total_transactions is None:
+        total_transactions = len(transactions)
     association_rules_list = []
     # SỬA: Sử dụng set để tránh duplicate rules
     unique_rules = set()
 
-    print(f"\n{'='*60}")
-    print(f"GENERATING ASSOCIATION RULES")
-    print(f"{'='*60}")
-    print(f"Minimum confidence threshold: {confidence_threshold}")
-    print(f"Only considering itemsets with 2+ elements")
+    trace.section("GENERATING ASSOCIATION RULES")
+    trace.summary("Minimum confidence threshold: {}", confidence_threshold)
+    trace.summary("Only considering itemsets with 2+ elements")
 
     # Only consider itemsets with at least 2 elements
-    for size, itemsets in list(frequent_itemsets_result.items())[1:]:
-        print(f"\n{'-'*60}")
-        print(f"Processing frequent {size}-itemsets:")
-        print(f"{'-'*60}")
+    for size, itemsets in frequent_itemsets_result.items():
+        if size < 2:
+            continue
+        trace.section(f"Processing frequent {size}-itemsets:", TRACE_DETAILED, '-')
 
         for original_itemset in itemsets:
             itemset_tuple = tuple(sorted(original_itemset))
-            itemset_support = frequency_counter[original_itemset] / len(transactions)
-            print(f"\nItemset: {itemset_tuple} (support = {itemset_support:.3f})")
-            print(f"Generating all possible rules:")
+            itemset_support = frequency_counter[original_itemset] / total_transactions
+            trace.detail("\nItemset: {} (support = {:.3f})", itemset_tuple, itemset_support)
+            trace.detail("Generating all possible rules:")
 
             # Generate all non-empty subsets
             all_subsets = map(frozenset, [x for x in generate_all_subsets(original_itemset)])
@@ -124,18 +347,20 @@ def generate_association_rules(frequent_itemsets_result, frequency_counter, tran
                 remaining_set = original_itemset.difference(subset)
 
                 if len(remaining_set) > 0:
-                    subset_support = frequency_counter[subset] / len(transactions)
                     confidence = frequency_counter[original_itemset] / frequency_counter[subset]
 
                     antecedent = tuple(sorted(subset))
                     consequent = tuple(sorted(remaining_set))
 
-                    status = "✓ ACCEPTED" if confidence >= confidence_threshold else "✗ REJECTED"
-
-                    print(f"  {antecedent} => {consequent}")
-                    print(f"    Confidence = support({itemset_tuple}) / support({antecedent})")
-                    print(f"    Confidence = {itemset_support:.3f} / {subset_support:.3f} = {confidence:.3f}")
-                    print(f"    {status} (threshold = {confidence_threshold})")
+                    if trace.detail_enabled:
+                        subset_support = frequency_counter[subset] / total_transactions
+                        status = "✓ ACCEPTED" if confidence >= confidence_threshold else "✗ REJECTED"
+                        trace.detail("  {} => {}\n"
+                                     "    Confidence = support({}) / support({})\n"
+                                     "    Confidence = {:.3f} / {:.3f} = {:.3f}\n"
+                                     "    {} (threshold = {})\n",
+                                     antecedent, consequent, itemset_tuple, antecedent,
+                                     itemset_support, subset_support, confidence, status, confidence_threshold)
 
                     if confidence >= confidence_threshold:
                         # SỬA: Tạo unique key cho rule để tránh duplicate
@@ -145,48 +370,41 @@ def generate_association_rules(frequent_itemsets_result, frequency_counter, tran
                             new_rule = ((antecedent, consequent), confidence)
                             association_rules_list.append(new_rule)
                             rules_from_this_itemset.append(new_rule)
-                    print()
 
             if rules_from_this_itemset:
-                print(f"  Accepted rules from {itemset_tuple}: {len(rules_from_this_itemset)}")
+                trace.detail("  Accepted rules from {}: {}", itemset_tuple, len(rules_from_this_itemset))
             else:
-                print(f"  No rules accepted from {itemset_tuple}")
+                trace.detail("  No rules accepted from {}", itemset_tuple)
 
-    print(f"\n{'='*60}")
-    print(f"ASSOCIATION RULES SUMMARY")
-    print(f"{'='*60}")
-    print(f"Total rules generated: {len(association_rules_list)}")
+    trace.section("ASSOCIATION RULES SUMMARY")
+    trace.summary("Total rules generated: {}", len(association_rules_list))
 
     return association_rules_list
 
 
-def process_raw_data(raw_data):
+def process_raw_data(raw_data, trace=None):
     """Convert raw data into transaction list and single items"""
+    if trace is None:
+        trace = ExecutionTrace.console()
     transactions = []
     single_items = set()
 
-    print(f"{'='*60}")
-    print(f"DATA PREPROCESSING")
-    print(f"{'='*60}")
-    print(f"📊 Total transactions: {len(raw_data)}")
+    trace.section("DATA PREPROCESSING")
+    trace.summary("📊 Total transactions: {}", len(raw_data))
 
     # Show first 5 transactions as examples
-    print("📋 Sample transactions:")
-    for i, record in enumerate(raw_data[:5], 1):
-        current_transaction = frozenset(record)
-        transactions.append(current_transaction)
-
-        items_display = ', '.join(sorted(record)[:5])  # Show first 5 items
-        if len(record) > 5:
-            items_display += f" ... (+{len(record)-5} more items)"
-        print(f"  • Transaction {i}: [{items_display}]")
-
-        # Create single items (1-itemsets)
-        for item in current_transaction:
-            single_items.add(frozenset([item]))
-
-    # Process remaining transactions
-    for i, record in enumerate(raw_data[5:], 6):
+    if trace.detail_enabled:
+        trace.detail("📋 Sample transactions:")
+        for i, record in enumerate(raw_data[:5], 1):
+            items_display = ', '.join(sorted(record)[:5])  # Show first 5 items
+            if len(record) > 5:
+                items_display += f" ... (+{len(record)-5} more items)"
+            trace.detail("  • Transaction {}: [{}]", i, items_display)
+
+        if len(raw_data) > 5:
+            trace.detail("  ... and {} more transactions", len(raw_data) - 5)
+
+    for record in raw_data:
         current_transaction = frozenset(record)
         transactions.append(current_transaction)
 
@@ -194,63 +412,389 @@ def process_raw_data(raw_data):
         for item in current_transaction:
             single_items.add(frozenset([item]))
 
-    if len(raw_data) > 5:
-        print(f"  ... and {len(raw_data)-5} more transactions")
-
-    unique_items = sorted([list(item)[0] for item in single_items])
-    print(f"\n📈 Analysis summary:")
-    print(f"  • Total transactions: {len(transactions)}")
-    print(f"  • Unique items found: {len(single_items)}")
-    print(f"  • Items: {', '.join(unique_items[:10])}{'...' if len(unique_items) > 10 else ''}")
+    trace.summary("\n📈 Analysis summary:")
+    trace.summary("  • Total transactions: {}", len(transactions))
+    trace.summary("  • Unique items found: {}", len(single_items))
+    if trace.detail_enabled:
+        unique_items = sorted([list(item)[0] for item in single_items])
+        trace.detail("  • Items: {}{}", ', '.join(unique_items[:10]), '...' if len(unique_items) > 10 else '')
 
     return single_items, transactions
 
 
-def main_apriori_algorithm(data, support_threshold, confidence_threshold):
-    """Main function to run Apriori algorithm with detailed output"""
-
-    print(f"{'#'*60}")
-    print(f"APRIORI ALGORITHM - DETAILED EXECUTION")
-    print(f"{'#'*60}")
-    print(f"Support threshold: {support_threshold}")
-    print(f"Confidence threshold: {confidence_threshold}")
-
-    # Step 1: Prepare data
-    single_items, transactions = process_raw_data(data)
-
-    # Initialize storage variables
-    frequency_counter = defaultdict(int)
+def reduce_transactions(transaction_list, candidates, target_size, weights=None):
+    """Trim the working transactions before counting target_size candidates (AprioriTid style)
+
+    Items that appear in no candidate cannot contribute to any frequent itemset of this or a
+    later level and are removed, then transactions shorter than target_size are dropped.
+    Returns the reduced list, the weights of the kept transactions (None if weights is None)
+    and the number of removed item occurrences.
+    """
+    candidate_items = set().union(*candidates)
+    reduced_transactions = []
+    reduced_weights = None if weights is None else []
+    removed_items = 0
+    for tid, transaction in enumerate(transaction_list):
+        reduced = transaction & candidate_items
+        removed_items += len(transaction) - len(reduced)
+        if len(reduced) >= target_size:
+            reduced_transactions.append(reduced)
+            if weights is not None:
+                reduced_weights.append(weights[tid])
+    return reduced_transactions, reduced_weights, removed_items
+
+
+def mine_frequent_levels(single_items, transactions, weights, support_threshold, support_counter,
+                         transaction_reduction, frequency_counter, total_transactions, trace, max_len=None,
+                         top_k=None, budget=None):
+    """Level-wise Apriori search: returns {size: set of frequent itemsets of that size}
+
+    Support counts of every counted candidate are stored in frequency_counter.
+    max_len stops the search after the itemsets of that length. top_k is a
+    mining_limits.TopKThreshold: every level is offered to it, itemsets below its count
+    do not seed candidates and the next level is counted at the raised threshold. The
+    returned levels can still hold itemsets below the final top-k count.
+    budget is an optional mining_limits.MiningBudget: when a limit is reached the search
+    stops, budget.exceeded is set and only the levels completed so far are returned.
+    """
     frequent_itemsets_result = {}
+    try:
+        mine_levels(single_items, transactions, weights, support_threshold, support_counter, transaction_reduction,
+                    frequency_counter, total_transactions, trace, max_len, top_k, budget, frequent_itemsets_result)
+    except BudgetExceeded as exceeded:
+        budget.record(exceeded)
+        trace.summary("\n⛔ {} - stopping with the {} levels completed so far", exceeded,
+                      len(frequent_itemsets_result))
+    return frequent_itemsets_result
+
+
+def mine_levels(single_items, transactions, weights, support_threshold, support_counter, transaction_reduction,
+                frequency_counter, total_transactions, trace, max_len, top_k, budget, frequent_itemsets_result):
+    """Body of mine_frequent_levels, completed levels are stored in frequent_itemsets_result as they finish"""
+    # Transactions still worth scanning, shrinks level by level when reduction is on
+    working_transactions = transactions
+    working_weights = weights
 
     # Step 2: Find frequent 1-itemsets
+    if budget is not None:
+        budget.check()
     current_frequent_itemsets = filter_frequent_itemsets(
         single_items, transactions, support_threshold, frequency_counter,
-        "Finding Frequent 1-itemsets"
+        "Finding Frequent 1-itemsets", support_counter, total_transactions, trace, weights
     )
+    total_itemsets = 0
 
     # Step 3: Iterate to find frequent k-itemsets
     size_index = 2
+    level_threshold = support_threshold
     while len(current_frequent_itemsets) > 0:
         # Store results of (k-1)-itemsets
         frequent_itemsets_result[size_index - 1] = current_frequent_itemsets
+        total_itemsets += len(current_frequent_itemsets)
+        if budget is not None:
+            budget.check_itemsets(total_itemsets)
+
+        if top_k is not None:
+            for itemset in current_frequent_itemsets:
+                top_k.offer(frequency_counter[itemset])
+            # Supersets of an itemset below the top-k count are below it too
+            current_frequent_itemsets = {
+                itemset for itemset in current_frequent_itemsets if frequency_counter[itemset] >= top_k.min_count
+            }
+            level_threshold = max(support_threshold, top_k.min_count / total_transactions)
+            trace.summary("\nTop-{} support count so far: {} ({} itemsets can still be extended)",
+                          top_k.k, top_k.min_count, len(current_frequent_itemsets))
+
+        if max_len is not None and size_index > max_len:
+            trace.summary("\nMaximum itemset length {} reached - algorithm will terminate", max_len)
+            break
 
         # Generate new k-itemset candidates
-        new_candidates = combine_itemsets(current_frequent_itemsets, size_index)
+        new_candidates = combine_itemsets(current_frequent_itemsets, size_index, trace, budget)
+
+        if new_candidates and transaction_reduction:
+            before_count = len(working_transactions)
+            working_transactions, working_weights, removed_items = reduce_transactions(
+                working_transactions, new_candidates, size_index, working_weights
+            )
+            if trace.summary_enabled:
+                remaining_items = sum(len(transaction) for transaction in working_transactions)
+                trace.summary("\nTRANSACTION REDUCTION before counting {}-itemsets:", size_index)
+                trace.summary("  Removed item occurrences: {}", removed_items)
+                trace.summary("  Dropped transactions (< {} items): {}",
+                              size_index, before_count - len(working_transactions))
+                trace.summary("  Working set: {} transactions, {} item occurrences",
+                              len(working_transactions), remaining_items)
 
         if new_candidates:
+            if budget is not None:
+                budget.check_candidates(len(new_candidates))
+                budget.check()
             # Filter candidates that meet support threshold
             current_frequent_itemsets = filter_frequent_itemsets(
-                new_candidates, transactions, support_threshold, frequency_counter,
-                f"Finding Frequent {size_index}-itemsets"
+                new_candidates, working_transactions, level_threshold, frequency_counter,
+                f"Finding Frequent {size_index}-itemsets", support_counter, total_transactions, trace,
+                working_weights
             )
         else:
             current_frequent_itemsets = set()
 
         size_index += 1
 
+
+def split_partitions(transactions, weights, partitions):
+    """Deal transactions (and their weights) round-robin into at most `partitions` shards
+
+    Exports are ordered by date, so striding keeps every shard close to the overall item
+    distribution and fewer itemsets are only locally frequent than with contiguous blocks.
+    """
+    shards = []
+    for offset in range(min(partitions, len(transactions))):
+        shard_weights = None if weights is None else weights[offset::partitions]
+        shards.append((transactions[offset::partitions], shard_weights))
+    return shards
+
+
+def mine_local_itemsets(transactions, weights, support_threshold, backend, transaction_reduction, max_len=None,
+                        budget=None):
+    """SON phase 1 on one shard: all itemsets frequent within the shard at the same support ratio
+
+    Runs in a worker process, so nothing is traced. budget is a MiningBudget.worker_copy().
+    Returns (local frequent itemsets, the BudgetExceeded that stopped the shard or None).
+    """
+    if budget is not None:
+        budget.start()
+    try:
+        single_items = {frozenset([item]) for transaction in transactions for item in transaction}
+        total_transactions = len(transactions) if weights is None else sum(weights)
+        frequent_itemsets_result = mine_frequent_levels(
+            single_items, transactions, weights, support_threshold,
+            make_support_counter(backend, transactions, weights), transaction_reduction, defaultdict(int),
+            total_transactions, ExecutionTrace(TRACE_OFF), max_len, budget=budget
+        )
+    finally:
+        if budget is not None:
+            budget.stop()
+    return set().union(*frequent_itemsets_result.values()), budget.exceeded if budget is not None else None
+
+
+def count_shard_supports(transactions, weights, candidates_by_size, backend, budget=None):
+    """SON phase 2 on one shard: support counts of the candidates within the shard, size by size
+
+    Runs in a worker process like mine_local_itemsets. Sizes are counted in ascending order
+    and the budget is checked before each one. Returns (counts of the candidates of the sizes
+    counted, the BudgetExceeded that stopped the shard or None).
+    """
+    if budget is not None:
+        budget.start()
+    support_counts = {}
+    exceeded = None
+    try:
+        support_counter = make_support_counter(backend, transactions, weights)
+        for size in sorted(candidates_by_size):
+            if budget is not None:
+                try:
+                    budget.check()
+                except BudgetExceeded as error:
+                    exceeded = error
+                    break
+            support_counts.update(support_counter(candidates_by_size[size], transactions, weights))
+    finally:
+        if budget is not None:
+            budget.stop()
+    return support_counts, exceeded
+
+
+def mine_partitioned_levels(transactions, weights, support_threshold, backend, transaction_reduction, partitions,
+                            frequency_counter, total_transactions, trace, max_len=None, budget=None):
+    """SON / partition-based Apriori: returns {size: set of frequent itemsets of that size}
+
+    Phase 1 mines every shard independently in a process pool with the support ratio
+    applied to the shard size. An itemset frequent overall is frequent in at least one
+    shard, so the union of the local results holds every frequent itemset. Phase 2
+    counts that union in every shard on the same pool and sums the shard counts, the
+    globally frequent ones give exactly the serial result.
+    A shard stopped by the budget keeps its completed levels, those stay downward closed so
+    phase 2 still confirms every subset of what it found; phase 2 stops at the budget too
+    and only confirms the sizes every shard finished counting.
+    """
+    shards = split_partitions(transactions, weights, partitions)
+    trace.section("SON PHASE 1: LOCAL FREQUENT ITEMSETS PER PARTITION")
+    trace.summary("Partitions: {} (about {} transactions each)", len(shards), len(shards[0][0]))
+
+    local_candidates = set()
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        futures = [
+            executor.submit(mine_local_itemsets, shard_transactions, shard_weights, support_threshold,
+                            backend, transaction_reduction, max_len,
+                            budget.worker_copy() if budget is not None else None)
+            for shard_transactions, shard_weights in shards
+        ]
+        for shard_index, future in enumerate(futures, 1):
+            shard_itemsets, exceeded = future.result()
+            trace.summary("  • Partition {}: {} local frequent itemsets", shard_index, len(shard_itemsets))
+            if exceeded is not None:
+                budget.record(exceeded)
+                trace.summary("    ⛔ {} - partial local result", exceeded)
+            local_candidates |= shard_itemsets
+        trace.summary("Union of local frequent itemsets: {} candidates", len(local_candidates))
+
+        trace.section("SON PHASE 2: GLOBAL COUNTING OF LOCAL CANDIDATES")
+        candidates_by_size = defaultdict(set)
+        for candidate in local_candidates:
+            candidates_by_size[len(candidate)].add(candidate)
+
+        futures = [
+            executor.submit(count_shard_supports, shard_transactions, shard_weights, dict(candidates_by_size),
+                            backend, budget.worker_copy() if budget is not None else None)
+            for shard_transactions, shard_weights in shards
+        ]
+        global_counts = defaultdict(int)
+        # Sizes every shard finished counting, a shard stopped by the budget misses the larger ones
+        counted_sizes = set(candidates_by_size)
+        for future in futures:
+            shard_counts, exceeded = future.result()
+            if exceeded is not None:
+                budget.record(exceeded)
+                counted_sizes &= {len(candidate) for candidate in shard_counts}
+            for candidate, count in shard_counts.items():
+                global_counts[candidate] += count
+
+    frequent_itemsets_result = {}
+    for size in sorted(candidates_by_size):
+        if size not in counted_sizes:
+            trace.summary("\n⛔ {} - stopping with the {} sizes confirmed so far", budget.exceeded,
+                          len(frequent_itemsets_result))
+            break
+        confirmed = filter_frequent_itemsets(
+            candidates_by_size[size], transactions, support_threshold, frequency_counter,
+            f"Confirming {size}-itemset candidates", lambda _candidates, _transactions, _weights: global_counts,
+            total_transactions, trace, weights
+        )
+        # Subsets of a frequent itemset are frequent, so sizes stop at the first empty level
+        if not confirmed:
+            break
+        frequent_itemsets_result[size] = confirmed
+    return frequent_itemsets_result
+
+
+def main_apriori_algorithm(data, support_threshold, confidence_threshold, backend='scan',
+                           transaction_reduction=False, trace=None, weights=None, partitions=1, output='all',
+                           max_len=None, top_k=None, budget=None, rules=True, support_counts=None):
+    """Main function to run Apriori algorithm with detailed output
+
+    backend selects how candidate supports are counted, one of SUPPORT_COUNTING_BACKENDS.
+    All backends return the same itemsets and supports.
+    transaction_reduction trims items and short transactions from the working set between
+    levels (see reduce_transactions), it does not change the results. It is ignored with the
+    bitset backend, whose TID bitsets always cover the full transaction list.
+    trace is the ExecutionTrace receiving the execution steps, by default they are printed.
+    weights gives how many times every record of data occurred (see
+    clean_data.deduplicate_transactions), supports are relative to the sum of the weights.
+    partitions > 1 splits the transactions into that many shards mined in parallel processes
+    (SON, see mine_partitioned_levels), the results are the same as the serial run.
+    output selects the reported itemsets, one of condensed_itemsets.ITEMSET_OUTPUTS. The
+    level-wise search needs every frequent itemset as a candidate source, so closed and
+    maximal itemsets are picked from the levels once they are counted; closed rules keep
+    their exact confidences, maximal itemsets give no rules.
+    max_len stops the level loop after the itemsets of that length. top_k keeps only the
+    top_k itemsets with the highest support (and those tied with the last one),
+    support_threshold stays a floor; the threshold of every level is raised from the levels
+    before it. With partitions the shards cannot share that threshold, so the top k are
+    picked after the global count. Only with output 'all'.
+    budget is an optional mining_limits.MiningBudget. When one of its limits is reached the
+    search stops, budget.exceeded tells which one and the itemsets of the levels completed
+    before it are returned with their rules: a partial but exact result.
+    rules=False skips rule generation, the rule list is then empty. support_counts is an
+    optional dict that receives the support count of every reported itemset, keyed by
+    frozenset, for callers that need the counts rather than the support ratios.
+    """
+    if partitions < 1:
+        raise ValueError(f"partitions must be at least 1, got {partitions}")
+    if output not in ITEMSET_OUTPUTS:
+        raise ValueError(f"Unknown itemset output '{output}', expected one of {ITEMSET_OUTPUTS}")
+    check_limits(output, top_k, max_len)
+    if backend not in SUPPORT_COUNTING_BACKENDS:
+        raise ValueError(f"Unknown support counting backend '{backend}', expected one of {SUPPORT_COUNTING_BACKENDS}")
+    if trace is None:
+        trace = ExecutionTrace.console()
+
+    trace.section("APRIORI ALGORITHM - DETAILED EXECUTION", char='#')
+    trace.summary("Support threshold: {}", support_threshold)
+    trace.summary("Confidence threshold: {}", confidence_threshold)
+    trace.summary("Support counting backend: {}", backend)
+    if transaction_reduction and backend == 'bitset':
+        # The bitset counter never looks at the reduced list, reducing it would only cost time
+        trace.summary("Transaction reduction: off (ignored with the bitset backend)")
+        transaction_reduction = False
+    else:
+        trace.summary("Transaction reduction: {}", 'on' if transaction_reduction else 'off')
+    trace.summary("Partitions: {}", partitions)
+    trace.summary("Itemset output: {}", output)
+    if max_len is not None:
+        trace.summary("Maximum itemset length: {}", max_len)
+    if top_k is not None:
+        trace.summary("Top-K itemsets by support: {}", top_k)
+
+    # Step 1: Prepare data
+    single_items, transactions = process_raw_data(data, trace)
+    total_transactions = len(transactions) if weights is None else sum(weights)
+    if weights is not None:
+        trace.summary("  • Weighted transactions: {} distinct baskets stand for {} transactions",
+                      len(transactions), total_transactions)
+
+    frequency_counter = defaultdict(int)
+    top_k_threshold = TopKThreshold(top_k) if top_k is not None else None
+    if budget is not None:
+        budget.start()
+    try:
+        if partitions > 1 and transactions:
+            frequent_itemsets_result = mine_partitioned_levels(
+                transactions, weights, support_threshold, backend, transaction_reduction, partitions,
+                frequency_counter, total_transactions, trace, max_len, budget
+            )
+            if top_k_threshold is not None:
+                for itemsets in frequent_itemsets_result.values():
+                    for itemset in itemsets:
+                        top_k_threshold.offer(frequency_counter[itemset])
+        else:
+            support_counter = make_support_counter(backend, transactions, weights)
+            frequent_itemsets_result = mine_frequent_levels(
+                single_items, transactions, weights, support_threshold, support_counter,
+                transaction_reduction, frequency_counter, total_transactions, trace, max_len, top_k_threshold,
+                budget
+            )
+    finally:
+        if budget is not None:
+            budget.stop()
+    if budget is not None and budget.exceeded is not None:
+        trace.summary("⚠️ Partial result: {}", budget.exceeded)
+
+    if top_k_threshold is not None:
+        frequent_itemsets_result = {
+            size: {itemset for itemset in itemsets if frequency_counter[itemset] >= top_k_threshold.min_count}
+            for size, itemsets in frequent_itemsets_result.items()
+        }
+        frequent_itemsets_result = {size: itemsets for size, itemsets in frequent_itemsets_result.items() if itemsets}
+        trace.section(f"SELECTING TOP-{top_k} ITEMSETS")
+        trace.summary("Minimum support count in the top {}: {}", top_k, top_k_threshold.min_count)
+
+    if output != 'all':
+        frequent_counts = {
+            itemset: frequency_counter[itemset]
+            for itemsets in frequent_itemsets_result.values() for itemset in itemsets
+        }
+        condensed = condense_itemsets(frequent_counts, output)
+        trace.section(f"SELECTING {output.upper()} ITEMSETS")
+        trace.summary("{} of {} frequent itemsets are {}", len(condensed), len(frequent_counts), output)
+        condensed_by_size = defaultdict(set)
+        for itemset in condensed.counts:
+            condensed_by_size[len(itemset)].add(itemset)
+        frequent_itemsets_result = {size: condensed_by_size[size] for size in sorted(condensed_by_size)}
+
     # Helper function to calculate support
     def calculate_support(itemset):
-        return frequency_counter[itemset] / len(transactions)
+        return frequency_counter[itemset] / total_transactions
 
     # SỬA: Step 4: Prepare final itemset results - tránh duplicate
     final_itemset_list = []
@@ -264,10 +808,23 @@ def main_apriori_algorithm(data, support_threshold, confidence_threshold):
                 itemset_support = calculate_support(itemset)
                 final_itemset_list.append((itemset_tuple, itemset_support))
 
+    if support_counts is not None:
+        for itemsets in frequent_itemsets_result.values():
+            for itemset in itemsets:
+                support_counts[itemset] = frequency_counter[itemset]
+
     # Step 5: Generate association rules
-    association_rules_list = generate_association_rules(
-        frequent_itemsets_result, frequency_counter, transactions, confidence_threshold
-    )
+    if not rules:
+        trace.summary("Rule generation skipped")
+        association_rules_list = []
+    elif output == 'maximal':
+        trace.summary("Maximal itemsets do not keep the supports of their subsets, no rules are generated")
+        association_rules_list = []
+    else:
+        association_rules_list = generate_association_rules(
+            frequent_itemsets_result, frequency_counter, transactions, confidence_threshold, trace,
+            total_transactions
+        )
 
     return final_itemset_list, association_rules_list
 
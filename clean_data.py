@@ -1,29 +1,180 @@
 import pandas as pd
+import numpy as np
 import os
 
-def process_transaction(file_path):
+from ingest_cache import file_digest
+
+# Columns kept after cleaning and their dtypes, the rows an IngestCache stores
+CLEANED_DTYPES = {'InvoiceNo': 'category', 'StockCode': 'category'}
+
+# Columns a chunked CSV read loads, everything else in the export is skipped while parsing
+CSV_COLUMNS = ['InvoiceNo', 'StockCode', 'Quantity', 'UnitPrice', 'CustomerID']
+CSV_DTYPES = {'InvoiceNo': str, 'StockCode': str, 'Quantity': 'float64', 'UnitPrice': 'float64',
+              'CustomerID': 'float64'}
+
+
+def filter_purchase_rows(df):
+    """Valid purchase rows: a customer, no cancelled ('C') invoice, positive quantity and price"""
+    df = df.dropna(subset=['CustomerID'])
+    df = df[~df['InvoiceNo'].astype(str).str.startswith('C')]
+    df = df[(df['Quantity'] > 0) & (df['UnitPrice'] > 0)]
+    df = df[~df['StockCode'].isin(['POST', 'M'])]
+    return df.reset_index(drop=True)
+
+
+def read_cleaned_rows(file_path, chunk_size=None):
+    """Read an upload and keep the valid purchase rows as typed (InvoiceNo, StockCode) columns
+
+    chunk_size streams a CSV that many rows at a time (see read_cleaned_csv_chunks), XLSX
+    files are always read whole.
+    """
     ext = os.path.splitext(file_path)[1].lower()
     if ext == '.xlsx':
         df = pd.read_excel(file_path)
     elif ext == '.csv':
+        if chunk_size is not None:
+            return read_cleaned_csv_chunks(file_path, chunk_size)
         df = pd.read_csv(file_path)
     else:
         raise ValueError("File phải là .csv hoặc .xlsx")
 
-    df = df.dropna(subset=['CustomerID'])
-    df = df[~df['InvoiceNo'].astype(str).str.startswith('C')]
-    df = df[(df['Quantity'] > 0) & (df['UnitPrice'] > 0)]
-    df = df[~df['StockCode'].isin(['POST', 'M'])]
-    df = df.reset_index(drop=True)
+    df = filter_purchase_rows(df)
+    return df[list(CLEANED_DTYPES)].astype(str).astype(CLEANED_DTYPES)
+
+
+def read_cleaned_csv_chunks(file_path, chunk_size):
+    """read_cleaned_rows for a CSV streamed chunk_size rows at a time
+
+    Only CSV_COLUMNS are parsed. Every chunk is filtered, reduced to its distinct
+    (InvoiceNo, StockCode) pairs and encoded into integer codes shared by all chunks, so an
+    invoice split across chunks keeps one code and becomes one basket. Memory is bounded
+    by one raw chunk plus two int32 codes per kept pair and the distinct values.
+    """
+    invoice_codes = {}
+    item_codes = {}
+    invoice_chunks = []
+    item_chunks = []
+    for chunk in pd.read_csv(file_path, usecols=CSV_COLUMNS, dtype=CSV_DTYPES, chunksize=chunk_size):
+        pairs = filter_purchase_rows(chunk)[list(CLEANED_DTYPES)].drop_duplicates()
+        invoice_chunks.append(encode_chunk_values(pairs['InvoiceNo'], invoice_codes))
+        item_chunks.append(encode_chunk_values(pairs['StockCode'], item_codes))
+
+    columns = {}
+    for name, codes, chunks in (('InvoiceNo', invoice_codes, invoice_chunks), ('StockCode', item_codes, item_chunks)):
+        # Codes follow first appearance, re-number them in sorted order of the values
+        values = np.array(list(codes), dtype=object)
+        order = np.argsort(values, kind='stable')
+        new_codes = np.empty(len(order), dtype=np.int32)
+        new_codes[order] = np.arange(len(order), dtype=np.int32)
+        chunk_codes = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int32)
+        columns[name] = pd.Categorical.from_codes(new_codes[chunk_codes], categories=values[order])
+    return pd.DataFrame(columns)
+
+
+def encode_chunk_values(values, codes):
+    """int32 codes of a chunk's values, new values get the next free code in codes"""
+    chunk_codes, uniques = pd.factorize(values)
+    mapping = np.array([codes.setdefault(value, len(codes)) for value in uniques], dtype=np.int32)
+    return mapping[chunk_codes] if len(mapping) else np.zeros(0, dtype=np.int32)
+
+
+def encode_transactions_csr(rows):
+    """Encode cleaned rows as CSR arrays: (indptr, item_ids, vocabulary)
+
+    StockCode is category encoded, so vocabulary[item_id] is the stock code of an item ID.
+    Invoice i holds the distinct item IDs item_ids[indptr[i]:indptr[i + 1]], sorted;
+    invoices are in sorted InvoiceNo order. Everything is done with vectorized pandas /
+    numpy operations, no Python object is built per invoice.
+    """
+    stock_codes = rows['StockCode'].astype('category')
+    vocabulary = stock_codes.cat.categories.to_numpy(dtype=object)
+    invoice_ids, invoices = pd.factorize(rows['InvoiceNo'], sort=True)
+
+    pairs = pd.DataFrame({'invoice': invoice_ids, 'item': stock_codes.cat.codes.to_numpy()})
+    pairs = pairs.drop_duplicates().sort_values(['invoice', 'item'], kind='stable')
+
+    item_ids = pairs['item'].to_numpy(dtype=np.int32)
+    counts = np.bincount(pairs['invoice'].to_numpy(), minlength=len(invoices))
+    indptr = np.zeros(len(invoices) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, item_ids, vocabulary
+
+
+def csr_to_transactions(indptr, item_ids, vocabulary):
+    """Lists of stock codes, one per CSR row, for the engines taking lists of transactions"""
+    names = vocabulary[item_ids].tolist()
+    bounds = indptr.tolist()
+    return [names[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def rows_to_transactions(rows):
+    """Group cleaned rows into one list of distinct stock codes per invoice"""
+    return csr_to_transactions(*encode_transactions_csr(rows))
+
+
+def load_cleaned_rows(file_path, cache=None, chunk_size=None, digest=None):
+    """Cleaned rows of an upload, cache is an optional ingest_cache.IngestCache
+
+    With a cache the cleaned rows are looked up by the digest of the file's bytes and only
+    read from the file (and stored) on a miss, digest can be passed when already known.
+    chunk_size streams CSV files (see read_cleaned_rows).
+    """
+    if cache is None:
+        return read_cleaned_rows(file_path, chunk_size)
+
+    if digest is None:
+        digest = file_digest(file_path)
+    rows = cache.load(digest)
+    if rows is None:
+        rows = read_cleaned_rows(file_path, chunk_size)
+        cache.store(digest, rows)
+    return rows
+
+
+def process_transaction(file_path, cache=None, chunk_size=None):
+    """Transactions of an upload as lists of stock codes (see load_cleaned_rows for cache / chunk_size)"""
+    return rows_to_transactions(load_cleaned_rows(file_path, cache, chunk_size))
+
+
+def process_transaction_csr(file_path, cache=None, chunk_size=None, digest=None):
+    """Transactions of an upload as CSR arrays (see encode_transactions_csr)"""
+    return encode_transactions_csr(load_cleaned_rows(file_path, cache, chunk_size, digest))
+
+
+def deduplicate_transactions(transactions):
+    """Collapse identical baskets into (transaction, weight) pairs.
+
+    Each transaction is canonicalized as the sorted tuple of its encoded items, so baskets
+    that only differ in item order or repeated items are merged. Returns the distinct
+    transactions (lists of items, in first-seen order) and their weights, the weights sum
+    to len(transactions).
+    """
+    item_ids = {}
+    weights_by_key = {}
+    for transaction in transactions:
+        key = tuple(sorted({item_ids.setdefault(item, len(item_ids)) for item in transaction}))
+        weights_by_key[key] = weights_by_key.get(key, 0) + 1
+
+    item_names = list(item_ids)
+    unique_transactions = [[item_names[item_id] for item_id in key] for key in weights_by_key]
+    weights = list(weights_by_key.values())
 
-    transactions_dict = (
-        df.groupby('InvoiceNo')['StockCode']
-        .apply(lambda x: list(set(str(code) for code in x)))
-        .to_dict()
-    )
+    return unique_transactions, weights
 
-    transactions = list(transactions_dict.values())
 
-    return transactions
+def deduplicate_csr(indptr, item_ids):
+    """deduplicate_transactions for CSR rows with sorted item IDs
 
+    Returns (indptr, item_ids, weights) of the distinct rows in first-seen order, the
+    weights sum to the number of input rows.
+    """
+    weights_by_key = {}
+    for start, end in zip(indptr[:-1].tolist(), indptr[1:].tolist()):
+        key = item_ids[start:end].tobytes()
+        weights_by_key[key] = weights_by_key.get(key, 0) + 1
 
+    rows = [np.frombuffer(key, dtype=item_ids.dtype) for key in weights_by_key]
+    unique_indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=unique_indptr[1:])
+    unique_item_ids = np.concatenate(rows) if rows else np.zeros(0, dtype=item_ids.dtype)
+    return unique_indptr, unique_item_ids, list(weights_by_key.values())
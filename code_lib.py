@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
 from mlxtend.preprocessing import TransactionEncoder
 from mlxtend.frequent_patterns import fpgrowth, association_rules
 import json
@@ -36,14 +38,69 @@ def save_results_to_json(freqItems, rules, output_file, min_support_ratio=0.005,
     print(f"✔️ Đã lưu kết quả JSON vào: {output_file}")
 
 
-def run_library_algorithm(transactions_list, min_support_ratio, min_confidence):
+def encode_sparse_transactions(transactions_list, csr=None):
     """
-    Chạy thuật toán FP-Growth bằng thư viện mlxtend
+    One-hot DataFrame thưa (sparse) cho mlxtend, không dựng ma trận bool đầy đủ
 
     Args:
         transactions_list: List of transactions (list of lists)
+        csr: (indptr, item_ids, vocabulary) từ clean_data.encode_transactions_csr, nếu có thì
+            dựng ma trận thẳng từ các mảng này
+    """
+    if csr is None:
+        te = TransactionEncoder()
+        te_ary = te.fit(transactions_list).transform(transactions_list, sparse=True)
+        return pd.DataFrame.sparse.from_spmatrix(te_ary, columns=te.columns_)
+
+    indptr, item_ids, vocabulary = csr
+    matrix = csr_matrix((np.ones(len(item_ids), dtype=bool), item_ids, indptr),
+                        shape=(len(indptr) - 1, len(vocabulary)))
+    # mlxtend chỉ cần các cột có mặt, bỏ các item không còn xuất hiện
+    present = np.flatnonzero(np.bincount(item_ids, minlength=len(vocabulary)))
+    return pd.DataFrame.sparse.from_spmatrix(matrix[:, present], columns=list(vocabulary[present]))
+
+
+def format_library_itemsets(frequent_itemsets):
+    """Danh sách itemset đã xếp hạng theo support giảm dần, chuyển đổi theo cột thay vì iterrows"""
+    frequent_itemsets = frequent_itemsets.assign(support=frequent_itemsets['support'].round(4))
+    frequent_itemsets = frequent_itemsets.sort_values('support', ascending=False, kind='stable')
+    itemsets = frequent_itemsets['itemsets'].map(list).tolist()
+    supports = frequent_itemsets['support'].tolist()
+    return [
+        {'itemset': itemset, 'support': support, 'rank': rank}
+        for rank, (itemset, support) in enumerate(zip(itemsets, supports), 1)
+    ]
+
+
+def format_library_rules(rules):
+    """Danh sách luật theo confidence giảm dần, chuyển đổi theo cột thay vì iterrows"""
+    if rules.empty:
+        return []
+    rules = rules.assign(confidence=rules['confidence'].round(4))
+    rules = rules.sort_values('confidence', ascending=False, kind='stable')
+    columns = zip(
+        rules['antecedents'].map(list).tolist(),
+        rules['consequents'].map(list).tolist(),
+        rules['confidence'].tolist(),
+        rules['support'].round(4).tolist(),
+        rules['lift'].round(4).tolist(),
+    )
+    return [
+        {'antecedent': antecedent, 'consequent': consequent, 'confidence': confidence, 'support': support,
+         'lift': lift}
+        for antecedent, consequent, confidence, support, lift in columns
+    ]
+
+
+def run_library_algorithm(transactions_list, min_support_ratio, min_confidence, csr=None):
+    """
+    Chạy thuật toán FP-Growth bằng thư viện mlxtend
+
+    Args:
+        transactions_list: List of transactions (list of lists), có thể là None khi có csr
         min_support_ratio: Support threshold
         min_confidence: Confidence threshold
+        csr: (indptr, item_ids, vocabulary) của cùng các giao dịch, dùng để mã hoá one-hot thưa
 
     Returns:
         dict: Kết quả với frequent_itemsets, association_rules, execution_time
@@ -54,17 +111,16 @@ def run_library_algorithm(transactions_list, min_support_ratio, min_confidence):
     print(f"📚 Using mlxtend library")
     print(f"⚙️ Support threshold: {min_support_ratio}")
     print(f"⚙️ Confidence threshold: {min_confidence}")
-    print(f"📊 Total transactions: {len(transactions_list)}")
+    total_transactions = len(transactions_list) if transactions_list is not None else len(csr[0]) - 1
+    print(f"📊 Total transactions: {total_transactions}")
 
     start_time = time.time()
 
     try:
-        # One-hot encoding
-        print("🔄 Performing one-hot encoding...")
-        te = TransactionEncoder()
-        te_ary = te.fit(transactions_list).transform(transactions_list)
-        df_encoded = pd.DataFrame(te_ary, columns=te.columns_)
-        print(f"✅ Encoded {len(df_encoded)} transactions with {len(te.columns_)} unique items")
+        # One-hot encoding (sparse)
+        print("🔄 Performing sparse one-hot encoding...")
+        df_encoded = encode_sparse_transactions(transactions_list, csr)
+        print(f"✅ Encoded {len(df_encoded)} transactions with {df_encoded.shape[1]} unique items")
 
         # Tìm tập mục phổ biến
         print("⛏️ Mining frequent itemsets...")
@@ -84,32 +140,8 @@ def run_library_algorithm(transactions_list, min_support_ratio, min_confidence):
         execution_time = end_time - start_time
 
         # Format kết quả
-        formatted_itemsets = []
-        for _, row in frequent_itemsets.iterrows():
-            formatted_itemsets.append({
-                'itemset': list(row['itemsets']),
-                'support': round(row['support'], 4)
-            })
-
-        # Sắp xếp itemsets theo support giảm dần
-        formatted_itemsets.sort(key=lambda x: x['support'], reverse=True)
-
-        # Thêm số thứ tự
-        for i, itemset in enumerate(formatted_itemsets, 1):
-            itemset['rank'] = i
-
-        formatted_rules = []
-        for _, row in rules.iterrows():
-            formatted_rules.append({
-                'antecedent': list(row['antecedents']),
-                'consequent': list(row['consequents']),
-                'confidence': round(row['confidence'], 4),
-                'support': round(row['support'], 4),
-                'lift': round(row['lift'], 4)
-            })
-
-        # Sắp xếp theo confidence từ cao xuống thấp
-        formatted_rules.sort(key=lambda x: x['confidence'], reverse=True)
+        formatted_itemsets = format_library_itemsets(frequent_itemsets)
+        formatted_rules = format_library_rules(rules)
 
         print(f"⏱️ Library execution time: {execution_time:.4f} seconds")
         print(f"✅ Library algorithm completed successfully")
@@ -135,6 +167,18 @@ def run_library_algorithm(transactions_list, min_support_ratio, min_confidence):
             'algorithm': 'mlxtend_fpgrowth'
         }
 
+def run_library_baseline(csr, min_support_ratio, min_confidence):
+    """
+    Chạy baseline mlxtend trong một tiến trình riêng (ProcessPoolExecutor)
+
+    Chỉ nhận các mảng CSR để dữ liệu gửi sang tiến trình con nhỏ gọn; kết quả có thêm
+    cpu_time là thời gian CPU của tiến trình con cho lần chạy này.
+    """
+    cpu_start = time.process_time()
+    result = run_library_algorithm(None, min_support_ratio, min_confidence, csr=csr)
+    result['cpu_time'] = time.process_time() - cpu_start
+    return result
+
 def main():
     # Đọc dữ liệu
     input_file = "invoice_summary.csv"
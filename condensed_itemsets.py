@@ -0,0 +1,119 @@
+from collections import defaultdict
+
+# Which frequent itemsets a mining run reports
+#   all     - every frequent itemset
+#   closed  - itemsets with no proper superset of the same support, they keep the support
+#             of every frequent itemset (the support of X is that of its smallest closed superset)
+#   maximal - itemsets with no frequent proper superset, the smallest output but the supports
+#             of their subsets are lost, so no association rules are generated from them
+ITEMSET_OUTPUTS = ('all', 'closed', 'maximal')
+
+
+class CondensedItemsets:
+    """Closed or maximal itemsets found so far during a search, indexed for subset checks
+
+    Engines add every candidate they reach, add() keeps the collection free of redundant
+    itemsets whatever the order candidates arrive in: a candidate covered by a kept
+    itemset is ignored and kept itemsets the candidate covers are dropped. A closed
+    itemset is covered by a superset with the same support, a maximal one by any superset.
+    """
+
+    def __init__(self, output):
+        if output not in ('closed', 'maximal'):
+            raise ValueError(f"Condensed output must be 'closed' or 'maximal', got '{output}'")
+        self.output = output
+        self.counts = {}
+        # item -> kept itemsets containing it, to find the supersets of a candidate
+        self.by_item = defaultdict(set)
+        # Kept itemsets a candidate may cover, to find its subsets: closed itemsets are grouped by
+        # support count, maximal ones under a single anchor item (a subset's anchor is in the candidate)
+        self.by_count = defaultdict(set)
+        self.by_anchor = defaultdict(set)
+        self.anchors = {}
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _containing(self, itemset):
+        """Kept itemsets containing the rarest item of itemset, a superset of every kept superset"""
+        return min((self.by_item.get(item, ()) for item in itemset), key=len)
+
+    def is_subsumed(self, itemset, count=None):
+        """True if a kept itemset contains itemset, with support count when count is given"""
+        itemset = frozenset(itemset)
+        containing = self._containing(itemset)
+        if count is not None:
+            containing = min(containing, self.by_count.get(count, ()), key=len)
+        for kept in containing:
+            if itemset <= kept and (count is None or self.counts[kept] == count):
+                return True
+        return False
+
+    def add(self, itemset, count):
+        """Record a candidate itemset with its support count, returns True if it is kept"""
+        itemset = frozenset(itemset)
+        if itemset in self.counts or self.is_subsumed(itemset, count if self.output == 'closed' else None):
+            return False
+
+        if self.output == 'closed':
+            covered = [kept for kept in self.by_count[count] if kept < itemset]
+        else:
+            covered = [kept for item in itemset for kept in self.by_anchor.get(item, ()) if kept < itemset]
+        for kept in covered:
+            self._remove(kept)
+
+        self.counts[itemset] = count
+        for item in itemset:
+            self.by_item[item].add(itemset)
+        if self.output == 'closed':
+            self.by_count[count].add(itemset)
+        else:
+            anchor = min(itemset, key=lambda item: len(self.by_anchor.get(item, ())))
+            self.anchors[itemset] = anchor
+            self.by_anchor[anchor].add(itemset)
+        return True
+
+    def _remove(self, itemset):
+        count = self.counts.pop(itemset)
+        for item in itemset:
+            self.by_item[item].discard(itemset)
+        if self.output == 'closed':
+            self.by_count[count].discard(itemset)
+        else:
+            self.by_anchor[self.anchors.pop(itemset)].discard(itemset)
+
+    def update(self, counts):
+        """Add every (itemset, count) of a mapping, e.g. the result of another worker"""
+        for itemset, count in counts.items():
+            self.add(itemset, count)
+
+
+class ClosureSupports:
+    """Read-only support count lookup for any frequent itemset, backed by closed itemsets
+
+    The support of a frequent itemset is the largest support among the closed itemsets
+    containing it, so rules can be generated from closed itemsets alone.
+    """
+
+    def __init__(self, closed_itemsets):
+        self.closed_itemsets = closed_itemsets
+        self.cache = {}
+
+    def __getitem__(self, itemset):
+        itemset = frozenset(itemset)
+        count = self.cache.get(itemset)
+        if count is None:
+            counts = self.closed_itemsets.counts
+            count = max((counts[kept] for kept in self.closed_itemsets._containing(itemset) if itemset <= kept),
+                        default=0)
+            self.cache[itemset] = count
+        return count
+
+
+def condense_itemsets(support_counts, output):
+    """Closed or maximal itemsets among a complete {frozenset(itemset): support count} mapping"""
+    condensed = CondensedItemsets(output)
+    # Largest first, so most redundant itemsets are rejected without being indexed
+    for itemset in sorted(support_counts, key=len, reverse=True):
+        condensed.add(itemset, support_counts[itemset])
+    return condensed
@@ -0,0 +1,286 @@
+from collections import defaultdict
+
+from apriori_test import (process_raw_data, build_tid_bitsets, build_weight_masks, generate_association_rules,
+                          popcount)
+from execution_trace import ExecutionTrace
+from condensed_itemsets import ITEMSET_OUTPUTS, CondensedItemsets, ClosureSupports
+from mining_limits import TopKThreshold, BudgetExceeded, check_limits, downward_closed
+
+# Available vertical set representations for eclat
+#   tidset  - every itemset keeps the bitset of the transaction IDs containing it (Eclat)
+#   diffset - below the first level every itemset keeps only the IDs its prefix has and it
+#             lacks, d(PXY) = d(PY) - d(PX), support(PXY) = support(PX) - |d(PXY)| (dEclat)
+# Diffsets shrink quickly as itemsets grow, which keeps the intersections and the memory
+# small on long itemsets; tidsets are smaller for the very first levels of sparse data.
+ECLAT_MODES = ('tidset', 'diffset')
+
+
+def weighted_popcount(bits, weight_masks=None):
+    """Number of transactions in a TID bitset, every transaction counted with its weight"""
+    if weight_masks is None:
+        return popcount(bits)
+    return sum(weight * popcount(bits & mask) for weight, mask in weight_masks.items())
+
+
+def mine_equivalence_classes(frequent_items, support_threshold, total_transactions, mode, weight_masks, trace,
+                             condensed=None, max_len=None, top_k=None, budget=None):
+    """Depth-first search over prefix equivalence classes
+
+    frequent_items: [(item, tid_bitset, count)] of the frequent single items.
+    condensed: CondensedItemsets collecting only closed or maximal itemsets. Closed mining
+    merges every extension with the same support into the itemset instead of branching on
+    it (CHARM), maximal mining skips classes whose itemset plus all extensions is already
+    covered by a maximal itemset.
+    max_len: itemsets of this length are not extended. Closure merging could overshoot it,
+    so closed candidates are then recorded unmerged and CondensedItemsets drops the others.
+    top_k: mining_limits.TopKThreshold, members and extensions below its rising count are skipped.
+    budget: mining_limits.MiningBudget checked before every member is extended, the search
+    stops at the first limit reached and budget.exceeded tells which one.
+    Returns {frozenset(itemset): support count} of every frequent (or every condensed) itemset.
+    """
+    support_counts = {}
+    # A class is (prefix, members, members_hold_diffsets), members are [(item, bits, count)]
+    # with every prefix + (item,) frequent
+    stack = [((), frequent_items, False)]
+    classes_mined = intersections = stored_tids = merged_items = subsumed_classes = below_top_k = 0
+
+    try:
+        while stack:
+            prefix, members, members_hold_diffsets = stack.pop()
+            classes_mined += 1
+
+            for position, (item, bits, count) in enumerate(members):
+                if top_k is not None and count < top_k.min_count:
+                    # The threshold rose since this class was pushed
+                    below_top_k += 1
+                    continue
+
+                itemset = prefix + (item,)
+                if condensed is None:
+                    support_counts[frozenset(itemset)] = count
+                    if top_k is not None:
+                        top_k.offer(count)
+
+                extensions = []
+                if max_len is not None and len(itemset) >= max_len:
+                    siblings = ()
+                else:
+                    siblings = members[position + 1:]
+                if budget is not None:
+                    budget.check()
+                    budget.check_itemsets(len(support_counts) if condensed is None else len(condensed))
+                    budget.check_candidates(len(siblings))
+                min_count = top_k.min_count if top_k is not None else 0
+                for other_item, other_bits, other_count in siblings:
+                    intersections += 1
+                    if mode == 'tidset':
+                        new_bits = bits & other_bits
+                        new_count = weighted_popcount(new_bits, weight_masks)
+                    elif members_hold_diffsets:
+                        # d(PXY) = d(PY) - d(PX)
+                        new_bits = other_bits & ~bits
+                        new_count = count - weighted_popcount(new_bits, weight_masks)
+                    else:
+                        # First diffset level: d(XY) = t(X) - t(Y)
+                        new_bits = bits & ~other_bits
+                        new_count = count - weighted_popcount(new_bits, weight_masks)
+
+                    if new_count / total_transactions >= support_threshold and new_count >= min_count:
+                        extensions.append((other_item, new_bits, new_count))
+                        stored_tids += popcount(new_bits)
+
+                if condensed is not None:
+                    if condensed.output == 'closed':
+                        # Every transaction of the itemset holds these items: they belong to its closure
+                        closure_items = ()
+                        if max_len is None:
+                            closure_items = tuple(extension[0] for extension in extensions if extension[2] == count)
+                        if closure_items:
+                            merged_items += len(closure_items)
+                            itemset += closure_items
+                            extensions = [extension for extension in extensions if extension[2] != count]
+                        condensed.add(itemset, count)
+                    elif not extensions:
+                        condensed.add(itemset, count)
+                    elif condensed.is_subsumed(itemset + tuple(extension[0] for extension in extensions)):
+                        subsumed_classes += 1
+                        continue
+
+                if extensions:
+                    stack.append((itemset, extensions, mode == 'diffset'))
+                    if trace.detail_enabled:
+                        trace.detail("  Class {}: {} frequent extensions", itemset, len(extensions))
+    except BudgetExceeded as exceeded:
+        budget.record(exceeded)
+        trace.summary("⛔ {} - stopping with {} itemsets found so far", exceeded,
+                      len(support_counts) if condensed is None else len(condensed))
+
+    trace.summary("🔍 Equivalence classes mined: {}", classes_mined)
+    trace.summary("🔗 {} computed: {}", "Diffsets" if mode == 'diffset' else "Tidset intersections", intersections)
+    trace.summary("💾 Transaction IDs stored in {}s of frequent itemsets: {}", mode, stored_tids)
+    if condensed is not None:
+        if condensed.output == 'closed':
+            trace.summary("🧩 Items merged into closures instead of branched on: {}", merged_items)
+        else:
+            trace.summary("✂️ Classes skipped because a maximal itemset already covers them: {}", subsumed_classes)
+        support_counts = condensed.counts
+    if top_k is not None:
+        trace.summary("🏆 Itemsets skipped below the rising top-{} threshold: {}", top_k.k, below_top_k)
+    return support_counts
+
+
+def eclat(data, support_threshold, confidence_threshold, mode='diffset', trace=None, weights=None, output='all',
+          max_len=None, top_k=None, budget=None, rules=True, support_counts=None):
+    """Eclat / dEclat: depth-first frequent itemset mining over vertical TID bitsets
+
+    Returns (itemsets, rules) with the same shapes as main_apriori_algorithm:
+    [(sorted itemset tuple, support)] and [((antecedent, consequent), confidence)].
+    mode selects the set representation, one of ECLAT_MODES, both give the same results.
+    trace is the ExecutionTrace receiving the execution steps, by default they are printed.
+    weights gives how many times every record of data occurred (see
+    clean_data.deduplicate_transactions), supports are relative to the sum of the weights.
+    output selects the reported itemsets, one of condensed_itemsets.ITEMSET_OUTPUTS, both
+    condensed outputs prune the search (see mine_equivalence_classes). Closed rules get subset
+    supports from the closed itemsets, maximal itemsets give no rules.
+    max_len caps the itemset length. top_k keeps only the top_k itemsets with the highest
+    support (and those tied with the last one), support_threshold stays a floor; only with
+    output 'all'.
+    budget is an optional mining_limits.MiningBudget. When one of its limits is reached the
+    search stops, budget.exceeded tells which one and the itemsets found so far are returned
+    with their exact supports. The depth-first search can miss subsets of what it found, so
+    rules only come from the itemsets whose subsets were all found; a partial closed output
+    gives no rules.
+    rules=False skips rule generation and support_counts receives the support counts of the
+    reported itemsets, as in main_apriori_algorithm.
+    """
+    if mode not in ECLAT_MODES:
+        raise ValueError(f"Unknown Eclat mode '{mode}', expected one of {ECLAT_MODES}")
+    if output not in ITEMSET_OUTPUTS:
+        raise ValueError(f"Unknown itemset output '{output}', expected one of {ITEMSET_OUTPUTS}")
+    check_limits(output, top_k, max_len)
+    if trace is None:
+        trace = ExecutionTrace.console()
+
+    trace.section("ECLAT ALGORITHM - DETAILED EXECUTION", char='#')
+    trace.summary("Support threshold: {}", support_threshold)
+    trace.summary("Confidence threshold: {}", confidence_threshold)
+    trace.summary("Set representation: {}", mode)
+    trace.summary("Itemset output: {}", output)
+    if max_len is not None:
+        trace.summary("Maximum itemset length: {}", max_len)
+    if top_k is not None:
+        trace.summary("Top-K itemsets by support: {}", top_k)
+
+    # Step 1: Prepare data
+    single_items, transactions = process_raw_data(data, trace)
+    total_transactions = len(transactions) if weights is None else sum(weights)
+    if weights is not None:
+        trace.summary("  • Weighted transactions: {} distinct baskets stand for {} transactions",
+                      len(transactions), total_transactions)
+    if not transactions:
+        return [], []
+    if budget is not None:
+        budget.start()
+
+    # Step 2: Vertical layout and frequent single items
+    trace.section("STEP: Building vertical TID bitsets")
+    tid_bitsets = build_tid_bitsets(transactions)
+    weight_masks = None if weights is None else build_weight_masks(weights)
+
+    frequent_items = []
+    for item, bits in tid_bitsets.items():
+        count = weighted_popcount(bits, weight_masks)
+        if count / total_transactions >= support_threshold:
+            frequent_items.append((item, bits, count))
+    # Least frequent items first keeps the classes of the deepest searches small
+    frequent_items.sort(key=lambda member: (member[2], member[0]))
+    trace.summary("Frequent 1-itemsets: {} of {} items", len(frequent_items), len(tid_bitsets))
+
+    # Step 3: Depth-first search
+    trace.section("STEP: Depth-first search over equivalence classes")
+    condensed = CondensedItemsets(output) if output != 'all' else None
+    top_k_threshold = None
+    if top_k is not None:
+        top_k_threshold = TopKThreshold(top_k)
+        top_k_threshold.raise_floor([count for _, _, count in frequent_items])
+        trace.summary("Top-{} starting support count: {}", top_k, top_k_threshold.min_count)
+    try:
+        found_counts = mine_equivalence_classes(
+            frequent_items, support_threshold, total_transactions, mode, weight_masks, trace, condensed,
+            max_len, top_k_threshold, budget
+        )
+    finally:
+        if budget is not None:
+            budget.stop()
+    partial = budget is not None and budget.exceeded is not None
+    if partial:
+        trace.summary("⚠️ Partial result: {}", budget.exceeded)
+    if top_k_threshold is not None:
+        found_counts = top_k_threshold.select(found_counts)
+        trace.summary("Final top-{} support count: {}", top_k, top_k_threshold.min_count)
+
+    frequent_itemsets_result = defaultdict(set)
+    for itemset in found_counts:
+        frequent_itemsets_result[len(itemset)].add(itemset)
+    # generate_association_rules expects the levels in increasing size
+    frequent_itemsets_result = {size: frequent_itemsets_result[size] for size in sorted(frequent_itemsets_result)}
+
+    if trace.summary_enabled:
+        trace.summary("\nRESULT: {} frequent itemsets found", len(found_counts))
+        for size, itemsets in frequent_itemsets_result.items():
+            trace.summary("  • {}-itemsets: {} found", size, len(itemsets))
+
+    final_itemset_list = [
+        (tuple(sorted(itemset)), count / total_transactions) for itemset, count in found_counts.items()
+    ]
+    if support_counts is not None:
+        support_counts.update(found_counts)
+
+    # Step 4: Generate association rules
+    if not rules:
+        trace.summary("Rule generation skipped")
+        association_rules_list = []
+    elif output == 'maximal':
+        trace.summary("Maximal itemsets do not keep the supports of their subsets, no rules are generated")
+        association_rules_list = []
+    elif partial and output == 'closed':
+        trace.summary("Closed itemsets of a partial run do not give subset supports, no rules are generated")
+        association_rules_list = []
+    elif partial:
+        rule_counts = downward_closed(found_counts)
+        trace.summary("Rules from the {} of {} itemsets whose subsets were all found",
+                      len(rule_counts), len(found_counts))
+        rule_levels = defaultdict(set)
+        for itemset in rule_counts:
+            rule_levels[len(itemset)].add(itemset)
+        association_rules_list = generate_association_rules(
+            {size: rule_levels[size] for size in sorted(rule_levels)}, rule_counts, transactions,
+            confidence_threshold, trace, total_transactions
+        )
+    else:
+        association_rules_list = generate_association_rules(
+            frequent_itemsets_result, found_counts if condensed is None else ClosureSupports(condensed),
+            transactions, confidence_threshold, trace, total_transactions
+        )
+
+    return final_itemset_list, association_rules_list
+
+
+# Usage example
+if __name__ == "__main__":
+    from apriori_test import print_final_results
+
+    # Sample data
+    sample_data = [
+        ['B', 'C'],
+        ['A', 'B'],
+        ['A', 'C'],
+        ['B', 'C'],
+        ['A', 'B', 'C']
+    ]
+
+    # Run algorithm
+    itemsets, rules = eclat(sample_data, 0.4, 0.6)
+
+    # Print final results
+    print_final_results(itemsets, rules, 0.4, 0.6)
@@ -0,0 +1,118 @@
+import sys
+
+# Trace levels, higher levels include everything recorded by lower ones
+TRACE_OFF = 0
+TRACE_SUMMARY = 1
+TRACE_DETAILED = 2
+
+TRACE_LEVELS = {
+    'off': TRACE_OFF,
+    'summary': TRACE_SUMMARY,
+    'detailed': TRACE_DETAILED,
+}
+
+# Maximum number of events kept in memory by a recorded trace
+DEFAULT_MAX_EVENTS = 20000
+
+
+def parse_trace_level(level):
+    """Convert a level name ('off', 'summary', 'detailed') or number to a trace level"""
+    if isinstance(level, int):
+        return level
+    try:
+        return TRACE_LEVELS[str(level).strip().lower()]
+    except KeyError:
+        raise ValueError(f"Unknown trace level '{level}', expected one of {list(TRACE_LEVELS)}")
+
+
+class ExecutionTrace:
+    """Leveled execution trace of a mining run
+
+    Messages are format strings with their arguments, they are only formatted when their
+    level is enabled and the trace still has room, so a disabled trace costs one comparison
+    per call. Callers guard loops that only produce detailed output with detail_enabled.
+
+    A trace with a stream writes every event as it happens (console use), otherwise events
+    are kept in memory, at most max_events of them, and returned by render(). Events past
+    the limit are counted but not formatted.
+    """
+
+    def __init__(self, level=TRACE_DETAILED, max_events=DEFAULT_MAX_EVENTS, stream=None):
+        self.level = parse_trace_level(level)
+        self.max_events = max_events
+        self.stream = stream
+        self.events = []
+        self.recorded_events = 0
+        self.dropped_events = 0
+
+    @classmethod
+    def console(cls):
+        """Detailed trace printed straight to stdout, the behaviour of running a module directly"""
+        return cls(TRACE_DETAILED, max_events=None, stream=sys.stdout)
+
+    @property
+    def full(self):
+        return self.max_events is not None and self.recorded_events >= self.max_events
+
+    def is_enabled(self, level):
+        """True if events of this level are traced
+
+        Only the level decides: once the trace is full, log() still counts every event it
+        receives in dropped_events, so guarded call sites must keep calling it.
+        """
+        return self.level >= level
+
+    @property
+    def summary_enabled(self):
+        return self.is_enabled(TRACE_SUMMARY)
+
+    @property
+    def detail_enabled(self):
+        return self.is_enabled(TRACE_DETAILED)
+
+    def log(self, level, message, *args):
+        """Record message.format(*args) if level is enabled"""
+        if self.level < level:
+            return
+        if self.full:
+            self.dropped_events += 1
+            return
+
+        text = message.format(*args) if args else message
+        self.recorded_events += 1
+        if self.stream is not None:
+            print(text, file=self.stream)
+        else:
+            self.events.append(text)
+
+    def summary(self, message, *args):
+        self.log(TRACE_SUMMARY, message, *args)
+
+    def detail(self, message, *args):
+        self.log(TRACE_DETAILED, message, *args)
+
+    def section(self, title, level=TRACE_SUMMARY, char='='):
+        """Record a section banner: a blank line, a rule, the title and a rule"""
+        if self.is_enabled(level):
+            self.log(level, "\n{0}\n{1}\n{0}", char * 60, title)
+
+    def extend(self, other):
+        """Append the events recorded by another trace, e.g. one filled in a worker process"""
+        for text in other.events:
+            if self.full:
+                self.dropped_events += 1
+            else:
+                self.recorded_events += 1
+                if self.stream is not None:
+                    print(text, file=self.stream)
+                else:
+                    self.events.append(text)
+        self.dropped_events += other.dropped_events
+
+    def render(self):
+        """All recorded events as one text block"""
+        lines = list(self.events)
+        if self.dropped_events:
+            lines.append(f"\n... {self.dropped_events} more trace events not recorded "
+                         f"(limit of {self.max_events} events reached)")
+        return "\n".join(lines)
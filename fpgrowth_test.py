@@ -1,9 +1,24 @@
 from itertools import chain, combinations
 from collections import defaultdict, OrderedDict
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import heapq
 from tqdm import tqdm
 
+from execution_trace import ExecutionTrace, TRACE_OFF, TRACE_DETAILED
+from condensed_itemsets import ITEMSET_OUTPUTS, CondensedItemsets, ClosureSupports
+from mining_limits import TopKThreshold, BudgetExceeded, MemoryTracker, check_limits, downward_closed
+
+# Các kiểu cây FP có thể dùng trong fpgrowth
+#   object  - mỗi nút là một đối tượng Node
+#   compact - item được mã hoá thành số nguyên, các nút lưu trong mảng song song (CompactFPTree)
+FP_TREE_BACKENDS = ('object', 'compact')
+
 global viz_tree_dict
 class Node:
+    # Không dùng __dict__ cho từng nút để giảm bộ nhớ khi cây có rất nhiều nút
+    __slots__ = ('itemName', 'count', 'parent', 'children', 'next')
+
     def __init__(self, itemName, frequency, parentNode):
         self.itemName = itemName    # tên item
         self.count = frequency      # tần suất xuất hiện
@@ -23,40 +38,53 @@ class Node:
             child.display(ind+1)
 
 # Hàm xây dựng cậy
-def constructTree(itemSetList, frequency, minSup):
-    print("Building FP-Tree...")
+# trace: ExecutionTrace nhận các bước thực hiện, mặc định in ra màn hình
+# itemCounts: tần suất các item nếu đã đếm trước (xem pruneConditionalPatternBase), khi đó bỏ qua bước đếm
+def constructTree(itemSetList, frequency, minSup, trace=None, itemCounts=None):
+    if trace is None:
+        trace = ExecutionTrace.console()
+    # Thanh tiến trình chỉ hiện khi trace ở mức chi tiết
+    hideProgress = not trace.detail_enabled
+
+    trace.detail("Building FP-Tree...")
     headerTable = defaultdict(int)
 
-    print("Counting item frequencies...")
-    # Đếm tuần suất xuất hiện và tạo bảng header
-    for idx, itemSet in enumerate(tqdm(itemSetList, desc="Counting frequencies")):
-        for item in itemSet:
-            headerTable[item] += frequency[idx]
+    if itemCounts is not None:
+        headerTable.update(itemCounts)
+    else:
+        trace.detail("Counting item frequencies...")
+        # Đếm tuần suất xuất hiện và tạo bảng header
+        for idx, itemSet in enumerate(tqdm(itemSetList, desc="Counting frequencies", disable=hideProgress)):
+            for item in itemSet:
+                headerTable[item] += frequency[idx]
 
-    print(f"Initial item frequencies: {dict(headerTable)}")
+    if trace.detail_enabled:
+        trace.detail("Initial item frequencies: {}", dict(headerTable))
 
     # Bỏ những item nhỏ hơn minSup
     original_items = len(headerTable)
     headerTable = dict((item, sup) for item, sup in headerTable.items() if sup >= minSup)
-    print(f"After filtering (minSup={minSup}): {len(headerTable)}/{original_items} items remain")
-    print(f"Frequent items: {dict(headerTable)}")
+    if trace.detail_enabled:
+        trace.detail("After filtering (minSup={}): {}/{} items remain", minSup, len(headerTable), original_items)
+        trace.detail("Frequent items: {}", dict(headerTable))
 
     if(len(headerTable) == 0):
-        print("❌ No frequent items found!")
+        trace.detail("❌ No frequent items found!")
         return None, None
 
     # Chuyển giá trị trong HeaderTable dạng [Item: [frequency]]
-    # Thành HeaderTable dạng [Item: [frequency, headNode]]
+    # Thành HeaderTable dạng [Item: [frequency, headNode, tailNode]]
+    # Giữ thêm nút cuối để nối nút mới vào danh sách liên kết trong O(1)
     for item in headerTable:
-        headerTable[item] = [headerTable[item], None]
+        headerTable[item] = [headerTable[item], None, None]
 
     # Khởi tạo node đầu tiên là Null
     fpTree = Node('Null', 1, None)
-    print("Root node created")
+    trace.detail("Root node created")
 
-    print("Inserting transactions into FP-Tree...")
+    trace.detail("Inserting transactions into FP-Tree...")
     # Cập nhật cây FP cho các mục
-    for idx, itemSet in enumerate(tqdm(itemSetList, desc="Building tree")):
+    for idx, itemSet in enumerate(tqdm(itemSetList, desc="Building tree", disable=hideProgress)):
         # Lấy các item nhỏ hơn minSSup
         itemSet = [item for item in itemSet if item in headerTable]
         # Sắp xếp các item này theo thứ tự giảm dần của tần suất xuất hiện
@@ -69,7 +97,7 @@ def constructTree(itemSetList, frequency, minSup):
             for item in itemSet:
                 currentNode = updateTree(item, currentNode, headerTable, frequency[idx])
 
-    print("✅ FP-Tree construction completed")
+    trace.detail("✅ FP-Tree construction completed")
     return fpTree, headerTable
 
 def updateHeaderTable(item, targetNode, headerTable):
@@ -77,12 +105,10 @@ def updateHeaderTable(item, targetNode, headerTable):
     if(headerTable[item][1] == None):
         headerTable[item][1] = targetNode
     else:
-        # Ngược lại ta lấy nút đầu tiên trong danh sách các nút của item đang xét
-        currentNode = headerTable[item][1]
-        # Duyệt tới nút cuối cùng và thêm nó vào cuối danh sách
-        while currentNode.next != None:
-            currentNode = currentNode.next
-        currentNode.next = targetNode
+        # Ngược lại nối thẳng vào sau nút cuối cùng, không cần duyệt lại cả danh sách
+        headerTable[item][2].next = targetNode
+    # Nút vừa thêm trở thành nút cuối của danh sách
+    headerTable[item][2] = targetNode
 
 def updateTree(item, treeNode, headerTable, frequency):
     if item in treeNode.children:
@@ -125,27 +151,431 @@ def findPrefixPath(basePat, headerTable):
         treeNode = treeNode.next
     return condPats, frequency
 
-# Hàm khai thác hàm phổ biến
-def mineTree(headerTable, minSup, preFix, freqItemList):
-    stack = [(headerTable, minSup, preFix)]
+# Cây FP dạng mảng song song, dùng cho backend 'compact'
+# Mỗi nút là một chỉ số i trong các mảng item[i], count[i], parent[i], next[i], nút 0 là gốc
+# Item là số nguyên liên tiếp, itemNames dùng để giải mã lại thành StockCode
+# HeaderTable có dạng [Item: [frequency, headIndex, tailIndex]], -1 nghĩa là chưa có nút
+class CompactFPTree:
+    __slots__ = ('itemNames', 'width', 'item', 'count', 'parent', 'next', 'children')
+
+    def __init__(self, itemNames):
+        self.itemNames = itemNames
+        self.width = len(itemNames)
+        self.item = array('l', [-1])
+        self.count = array('q', [0])
+        self.parent = array('l', [-1])
+        self.next = array('l', [-1])
+        # Nút con được tra theo khoá số nguyên parent * width + item thay vì một dict cho mỗi nút
+        self.children = {}
+
+    def __len__(self):
+        return len(self.item)
+
+    # Thêm một giao dịch (đã lọc và sắp xếp) vào cây
+    def insert(self, itemSet, frequency, headerTable):
+        currentNode = 0
+        for item in itemSet:
+            key = currentNode * self.width + item
+            child = self.children.get(key)
+            if child is None:
+                child = len(self.item)
+                self.item.append(item)
+                self.count.append(frequency)
+                self.parent.append(currentNode)
+                self.next.append(-1)
+                self.children[key] = child
+
+                # Nối nút mới vào cuối danh sách liên kết của item
+                entry = headerTable[item]
+                if entry[1] == -1:
+                    entry[1] = child
+                else:
+                    self.next[entry[2]] = child
+                entry[2] = child
+            else:
+                self.count[child] += frequency
+            currentNode = child
+
+    # Tìm tất cả các đường đi tới nút basePat, giống findPrefixPath
+    def findPrefixPath(self, basePat, headerTable):
+        condPats = []
+        frequency = []
+        node = headerTable[basePat][1]
+        while node != -1:
+            prefixPath = []
+            parent = self.parent[node]
+            while parent > 0:
+                prefixPath.append(self.item[parent])
+                parent = self.parent[parent]
+            if prefixPath:
+                condPats.append(prefixPath)
+                frequency.append(self.count[node])
+            node = self.next[node]
+        return condPats, frequency
+
+# Hàm xây dựng cây dạng mảng từ các giao dịch đã mã hoá thành số nguyên
+def constructCompactTree(itemSetList, frequency, minSup, itemNames, trace=None, itemCounts=None):
+    if trace is None:
+        trace = ExecutionTrace.console()
 
-    while stack:
-        headerTable, minSup, preFix = stack.pop()
+    headerTable = defaultdict(int)
+    if itemCounts is not None:
+        headerTable.update(itemCounts)
+    else:
+        for idx, itemSet in enumerate(itemSetList):
+            for item in itemSet:
+                headerTable[item] += frequency[idx]
+
+    original_items = len(headerTable)
+    headerTable = dict((item, [sup, -1, -1]) for item, sup in headerTable.items() if sup >= minSup)
+    trace.detail("Building compact FP-Tree (minSup={}): {}/{} items remain", minSup, len(headerTable), original_items)
+
+    if(len(headerTable) == 0):
+        return None, None
 
-        # Sắp xếp các mục trong headerTable theo tần suất giảm dần
-        sortedItemList = [item[0] for item in sorted(list(headerTable.items()), key=lambda p: p[1][0], reverse=True)]
+    fpTree = CompactFPTree(itemNames)
+    for idx, itemSet in enumerate(itemSetList):
+        itemSet = [item for item in itemSet if item in headerTable]
+        itemSet.sort(key=lambda item: (-headerTable[item][0], item))
+        if itemSet:
+            fpTree.insert(itemSet, frequency[idx], headerTable)
 
+    trace.detail("✅ Compact FP-Tree construction completed: {} nodes", len(fpTree) - 1)
+    return fpTree, headerTable
 
-        for item in sortedItemList:
-            newFreqSet = preFix.copy()
-            newFreqSet.add(item)
-            freqItemList.append(newFreqSet)
+# Mã hoá StockCode thành số nguyên liên tiếp, trả về danh sách giao dịch đã mã hoá và bảng tên item
+def encodeItemSetList(itemSetList):
+    itemNames = sorted({item for itemSet in itemSetList for item in itemSet})
+    itemIds = {item: itemId for itemId, item in enumerate(itemNames)}
+    encodedList = [[itemIds[item] for item in itemSet] for itemSet in itemSetList]
+    return encodedList, itemNames
+
+# Đếm tần suất các item trong cơ sở mẫu điều kiện và bỏ các item không phổ biến trước khi dựng cây
+# Trả về các đường đi đã lọc (bỏ đường rỗng), tần suất tương ứng và tần suất của các item còn lại
+def pruneConditionalPatternBase(condPats, frequency, minSup):
+    itemCounts = defaultdict(int)
+    for idx, path in enumerate(condPats):
+        for item in path:
+            itemCounts[item] += frequency[idx]
+    itemCounts = dict((item, count) for item, count in itemCounts.items() if count >= minSup)
+
+    prunedPats = []
+    prunedFrequency = []
+    if itemCounts:
+        for idx, path in enumerate(condPats):
+            path = [item for item in path if item in itemCounts]
+            if path:
+                prunedPats.append(path)
+                prunedFrequency.append(frequency[idx])
+    return prunedPats, prunedFrequency, itemCounts
+
+# Nếu cây chỉ gồm một đường đi duy nhất thì trả về [(item, count), ...] từ gốc xuống lá, ngược lại trả về None
+def getSinglePath(tree):
+    if isinstance(tree, CompactFPTree):
+        # Các nút được đánh số theo thứ tự thêm vào, cây là một đường đi khi mỗi nút là con của nút ngay trước nó
+        for node in range(1, len(tree)):
+            if tree.parent[node] != node - 1:
+                return None
+        return [(tree.item[node], tree.count[node]) for node in range(1, len(tree))]
+
+    path = []
+    node = tree
+    while node.children:
+        if len(node.children) > 1:
+            return None
+        node = next(iter(node.children.values()))
+        path.append((node.itemName, node.count))
+    return path
+
+# Dựng cây điều kiện cho newFreqSet từ cơ sở mẫu điều kiện đã lọc
+# Nếu cây chỉ có một đường đi thì ghi luôn mọi tập phổ biến sinh từ đường đi đó và trả về None,
+# ngược lại trả về (conditionalTree, newHeaderTable) để khai thác tiếp
+# itemNames: bảng giải mã item khi dùng CompactFPTree, None với cây Node
+# condensed: CondensedItemsets khi chỉ lấy tập đóng / tập tối đại, khi đó chỉ ghi các tập ứng viên vào đó
+# maxLen: độ dài tối đa của tập phổ biến, topK: TopKThreshold khi chỉ lấy K tập có support cao nhất
+def growConditionalTree(conditionalPattBase, frequency, itemCounts, minSup, newFreqSet, freqItemList,
+                        supportCounts, trace, itemNames=None, condensed=None, maxLen=None, topK=None):
+    if itemNames is not None:
+        conditionalTree, newHeaderTable = constructCompactTree(
+            conditionalPattBase, frequency, minSup, itemNames, trace, itemCounts)
+    else:
+        conditionalTree, newHeaderTable = constructTree(conditionalPattBase, frequency, minSup, trace, itemCounts)
+
+    singlePath = getSinglePath(conditionalTree)
+    if singlePath is None:
+        return conditionalTree, newHeaderTable
+
+    pathNames = [itemNames[pathItem] if itemNames is not None else pathItem for pathItem, _ in singlePath]
+    # Số item tối đa còn được thêm vào newFreqSet
+    maxExtra = len(singlePath) if maxLen is None else min(len(singlePath), maxLen - len(newFreqSet))
+    if condensed is not None and maxExtra == len(singlePath):
+        if condensed.output == 'maximal':
+            # Cả đường đi cùng newFreqSet là tập phổ biến lớn nhất của nhánh này
+            condensed.add(newFreqSet.union(pathNames), singlePath[-1][1])
+        else:
+            # Tập đóng là các đoạn đầu của đường đi kết thúc ngay trước chỗ count giảm
+            for size in range(1, len(singlePath) + 1):
+                if size == len(singlePath) or singlePath[size][1] < singlePath[size - 1][1]:
+                    condensed.add(newFreqSet.union(pathNames[:size]), singlePath[size - 1][1])
+        return None
+
+    # Cây điều kiện chỉ có một đường đi: mọi tổ hợp các nút trên đường đi đều phổ biến,
+    # support count của tổ hợp là count nhỏ nhất, tức count của nút sâu nhất trong tổ hợp
+    # Khi bị giới hạn maxLen, tập tối đại là các tổ hợp dài đúng maxExtra
+    minSize = maxExtra if condensed is not None and condensed.output == 'maximal' else 1
+    for size in range(minSize, maxExtra + 1):
+        for combo in combinations(range(len(singlePath)), size):
+            comboCount = singlePath[combo[-1]][1]
+            if topK is not None and comboCount < topK.min_count:
+                continue
+            comboSet = newFreqSet.copy()
+            comboSet.update(pathNames[pathIdx] for pathIdx in combo)
+            if condensed is not None:
+                condensed.add(comboSet, comboCount)
+                continue
+            freqItemList.append(comboSet)
+            supportCounts[frozenset(comboSet)] = comboCount
+            if topK is not None:
+                topK.offer(comboCount)
+    return None
 
+# Hàm khai thác hàm phổ biến
+# tree: cây ứng với headerTable, cần khi dùng CompactFPTree (item là số nguyên cần giải mã)
+# condensed: CondensedItemsets để chỉ lấy tập đóng / tập tối đại, cắt tỉa ngay trong lúc khai thác
+# maxLen: không mở rộng các tập đã dài maxLen
+# topK: TopKThreshold, ngưỡng support được nâng dần trong lúc khai thác
+# budget: MiningBudget, kiểm tra trước mỗi item; khi vượt giới hạn thì dừng, ghi vào budget.exceeded
+# và giữ các tập đã tìm được
+# Trả về chỉ mục {frozenset(itemset): support count} được ghi lại ngay trong lúc khai thác
+def mineTree(headerTable, minSup, preFix, freqItemList, trace=None, tree=None, supportCounts=None, condensed=None,
+             maxLen=None, topK=None, budget=None):
+    if trace is None:
+        trace = ExecutionTrace.console()
+    if supportCounts is None:
+        supportCounts = {}
+    stack = [(tree, headerTable, minSup, preFix)]
+    # Thống kê số cây điều kiện theo cách xử lý
+    minedTrees = singlePathTrees = prunedBases = subsumedBranches = belowTopK = 0
+
+    try:
+        while stack:
+            tree, headerTable, minSup, preFix = stack.pop()
+            itemNames = tree.itemNames if isinstance(tree, CompactFPTree) else None
+
+            # Sắp xếp các mục trong headerTable theo tần suất giảm dần
+            sortedItemList = [item[0] for item in
+                              sorted(list(headerTable.items()), key=lambda p: p[1][0], reverse=True)]
+
+            for item in sortedItemList:
+                if budget is not None:
+                    budget.check()
+                    budget.check_itemsets(len(supportCounts) if condensed is None else len(condensed))
+                if topK is not None:
+                    # Ngưỡng có thể đã được nâng từ khi cây này được dựng
+                    minSup = max(minSup, topK.min_count)
+                    if headerTable[item][0] < minSup:
+                        belowTopK += 1
+                        continue
+
+                newFreqSet, conditionalPattBase, frequency, itemCounts = expandHeaderItem(
+                    item, tree, headerTable, minSup, preFix, freqItemList, supportCounts, itemNames, condensed,
+                    maxLen, topK)
+
+                # Không còn item phổ biến nào thì không cần dựng cây điều kiện
+                if not itemCounts:
+                    prunedBases += 1
+                    continue
+
+                if condensed is not None and condensed.output == 'maximal' and isSubsumedBranch(
+                        newFreqSet, itemCounts, itemNames, condensed):
+                    subsumedBranches += 1
+                    continue
+
+                conditional = growConditionalTree(conditionalPattBase, frequency, itemCounts, minSup, newFreqSet,
+                                                  freqItemList, supportCounts, trace, itemNames, condensed, maxLen,
+                                                  topK)
+                if conditional is None:
+                    singlePathTrees += 1
+                else:
+                    minedTrees += 1
+                    conditionalTree, newHeaderTable = conditional
+                    stack.append((conditionalTree, newHeaderTable, minSup, newFreqSet))
+    except BudgetExceeded as exceeded:
+        budget.record(exceeded)
+        trace.summary("⛔ {} - stopping with {} itemsets found so far", exceeded,
+                      len(supportCounts) if condensed is None else len(condensed))
+
+    trace.summary("🌿 Conditional trees: {} mined recursively, {} single-path shortcuts, {} pattern bases pruned empty",
+                  minedTrees, singlePathTrees, prunedBases)
+    if condensed is not None and condensed.output == 'maximal':
+        trace.summary("✂️ Branches skipped because a maximal itemset already covers them: {}", subsumedBranches)
+    if topK is not None:
+        trace.summary("🏆 Items skipped below the rising top-{} threshold: {}", topK.k, belowTopK)
+    return supportCounts
+
+# Cắt tỉa kiểu FPMax: nếu newFreqSet cùng mọi item còn phổ biến trong cơ sở mẫu điều kiện đã nằm trong
+# một tập tối đại tìm được thì cả nhánh không thể sinh thêm tập tối đại nào
+def isSubsumedBranch(newFreqSet, itemCounts, itemNames, condensed):
+    branchItems = newFreqSet.union(itemNames[item] if itemNames is not None else item for item in itemCounts)
+    return condensed.is_subsumed(branchItems)
+
+# Gộp vào tiền tố các item xuất hiện trong mọi giao dịch của cơ sở mẫu điều kiện (count bằng support
+# của tiền tố): mọi tập đóng mở rộng từ tiền tố đều chứa chúng nên bỏ chúng khỏi cây điều kiện (FPClose)
+# Trả về (conditionalPattBase, frequency, itemCounts, closureItems) sau khi gộp
+def mergeClosureItems(conditionalPattBase, frequency, itemCounts, count):
+    closureItems = [item for item, itemCount in itemCounts.items() if itemCount == count]
+    if not closureItems:
+        return conditionalPattBase, frequency, itemCounts, closureItems
+
+    itemCounts = dict((item, itemCount) for item, itemCount in itemCounts.items() if itemCount != count)
+    mergedPats = []
+    mergedFrequency = []
+    for idx, path in enumerate(conditionalPattBase):
+        path = [item for item in path if item in itemCounts]
+        if path:
+            mergedPats.append(path)
+            mergedFrequency.append(frequency[idx])
+    return mergedPats, mergedFrequency, itemCounts, closureItems
+
+# Ghi nhận tập phổ biến preFix + item rồi lấy cơ sở mẫu điều kiện của item (đã lọc item không phổ biến)
+# Trả về (newFreqSet, conditionalPattBase, frequency, itemCounts), itemCounts rỗng nếu không cần dựng cây điều kiện
+# Với condensed, tập đóng được gộp thêm các item trong bao đóng và tập không còn mở rộng được là ứng viên
+# Tập đã dài maxLen thì không lấy cơ sở mẫu điều kiện nữa
+def expandHeaderItem(item, tree, headerTable, minSup, preFix, freqItemList, supportCounts, itemNames=None,
+                     condensed=None, maxLen=None, topK=None):
+    newFreqSet = preFix.copy()
+    newFreqSet.add(itemNames[item] if itemNames is not None else item)
+    # Tần suất của item trong headerTable (có điều kiện) chính là support count của newFreqSet
+    count = headerTable[item][0]
+    if condensed is None:
+        freqItemList.append(newFreqSet)
+        supportCounts[frozenset(newFreqSet)] = count
+        if topK is not None:
+            topK.offer(count)
+
+    if maxLen is not None and len(newFreqSet) >= maxLen:
+        conditionalPattBase, frequency, itemCounts = [], [], {}
+    else:
+        if itemNames is not None:
+            conditionalPattBase, frequency = tree.findPrefixPath(item, headerTable)
+        else:
             conditionalPattBase, frequency = findPrefixPath(item, headerTable)
-            conditionalTree, newHeaderTable = constructTree(conditionalPattBase, frequency, minSup)
 
-            if newHeaderTable:
-                stack.append((newHeaderTable, minSup, newFreqSet))
+        conditionalPattBase, frequency, itemCounts = pruneConditionalPatternBase(conditionalPattBase, frequency, minSup)
+
+    if condensed is not None:
+        if condensed.output == 'closed':
+            # Gộp bao đóng có thể vượt quá maxLen nên khi có maxLen chỉ ghi ứng viên, add() loại tập không đóng
+            if maxLen is None:
+                conditionalPattBase, frequency, itemCounts, closureItems = mergeClosureItems(
+                    conditionalPattBase, frequency, itemCounts, count)
+                newFreqSet.update(itemNames[closureItem] if itemNames is not None else closureItem
+                                  for closureItem in closureItems)
+            condensed.add(newFreqSet, count)
+        elif not itemCounts:
+            condensed.add(newFreqSet, count)
+    return newFreqSet, conditionalPattBase, frequency, itemCounts
+
+# Khai thác một nhóm cơ sở mẫu điều kiện trong tiến trình con (chế độ song song kiểu PFP)
+# tasks: danh sách (newFreqSet, conditionalPattBase, frequency, itemCounts) do mineTreeParallel chia
+# Trả về (freqItemList, supportCounts, trace) để tiến trình chính gộp lại, với output 'closed' / 'maximal'
+# supportCounts chỉ chứa các tập đóng / tối đại tìm được trong nhóm
+# topKCount, topKMinCount: K và ngưỡng top-K hiện tại của tiến trình chính, mỗi nhóm nâng ngưỡng riêng từ đó
+# Mỗi lần gọi mineTree ghi một dòng tóm tắt nên tiến trình con chỉ ghi lại khi trace ở mức chi tiết
+# budget: MiningBudget.worker_copy() của tiến trình chính, giới hạn số tập áp dụng cho riêng nhóm này;
+# khi vượt giới hạn nhóm dừng lại và trả về thêm BudgetExceeded (None nếu chạy hết)
+def mineConditionalBases(tasks, minSup, itemNames, traceLevel, output='all', maxLen=None, topKCount=None,
+                         topKMinCount=0, budget=None):
+    trace = ExecutionTrace(traceLevel if traceLevel >= TRACE_DETAILED else TRACE_OFF)
+    condensed = CondensedItemsets(output) if output != 'all' else None
+    # K tập tốt nhất của một nhóm không tốt hơn K tập tốt nhất chung nên ngưỡng riêng vẫn an toàn
+    groupTopK = TopKThreshold(topKCount, topKMinCount) if topKCount is not None else None
+    freqItemList = []
+    supportCounts = {}
+    if budget is not None:
+        budget.start()
+    try:
+        for newFreqSet, conditionalPattBase, frequency, itemCounts in tasks:
+            if budget is not None:
+                if budget.exceeded is not None:
+                    break
+                try:
+                    budget.check()
+                except BudgetExceeded as exceeded:
+                    budget.record(exceeded)
+                    break
+            conditional = growConditionalTree(conditionalPattBase, frequency, itemCounts, minSup, newFreqSet,
+                                              freqItemList, supportCounts, trace, itemNames, condensed, maxLen,
+                                              groupTopK)
+            if conditional is not None:
+                conditionalTree, newHeaderTable = conditional
+                mineTree(newHeaderTable, minSup, newFreqSet, freqItemList, trace, conditionalTree, supportCounts,
+                         condensed, maxLen, groupTopK, budget)
+    finally:
+        if budget is not None:
+            budget.stop()
+    if condensed is not None:
+        supportCounts = condensed.counts
+    return freqItemList, supportCounts, trace, budget.exceeded if budget is not None else None
+
+# Chia các công việc vào số nhóm cho trước sao cho tổng chi phí mỗi nhóm gần bằng nhau
+# (tham lam: công việc lớn nhất trước, đưa vào nhóm đang nhẹ nhất)
+def balanceGroups(tasks, costs, groupCount):
+    groups = [[] for _ in range(groupCount)]
+    load = [(0, groupIdx) for groupIdx in range(groupCount)]
+    for taskIdx in sorted(range(len(tasks)), key=lambda idx: costs[idx], reverse=True):
+        groupLoad, groupIdx = heapq.heappop(load)
+        groups[groupIdx].append(tasks[taskIdx])
+        heapq.heappush(load, (groupLoad + costs[taskIdx], groupIdx))
+    return [group for group in groups if group]
+
+# Khai thác song song kiểu PFP: các cơ sở mẫu điều kiện của từng item trong headerTable gốc độc lập
+# với nhau nên được chia thành các nhóm cân bằng và khai thác trong ProcessPoolExecutor
+# Chi phí một cơ sở mẫu được ước lượng bằng tổng độ dài các đường đi trong nó
+def mineTreeParallel(headerTable, minSup, freqItemList, trace, tree, workers, condensed=None, maxLen=None,
+                     topK=None, budget=None):
+    supportCounts = {}
+    itemNames = tree.itemNames if isinstance(tree, CompactFPTree) else None
+
+    tasks = []
+    costs = []
+    for item in headerTable:
+        newFreqSet, conditionalPattBase, frequency, itemCounts = expandHeaderItem(
+            item, tree, headerTable, minSup, set(), freqItemList, supportCounts, itemNames, condensed, maxLen, topK)
+        if itemCounts:
+            tasks.append((newFreqSet, conditionalPattBase, frequency, itemCounts))
+            costs.append(sum(len(path) for path in conditionalPattBase))
+
+    groups = balanceGroups(tasks, costs, workers)
+    trace.summary("🧵 Parallel mining: {} conditional pattern bases in {} groups on {} worker processes",
+                  len(tasks), len(groups), workers)
+    if trace.detail_enabled:
+        for groupIdx, group in enumerate(groups, 1):
+            trace.detail("  • Group {}: {} pattern bases, {} path items", groupIdx, len(group),
+                         sum(len(path) for _, conditionalPattBase, _, _ in group for path in conditionalPattBase))
+
+    output = condensed.output if condensed is not None else 'all'
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(mineConditionalBases, group, minSup, itemNames, trace.level, output, maxLen,
+                                   topK.k if topK is not None else None, topK.min_count if topK is not None else 0,
+                                   budget.worker_copy() if budget is not None else None)
+                   for group in groups]
+        for future in futures:
+            groupItems, groupCounts, groupTrace, exceeded = future.result()
+            if exceeded is not None:
+                budget.record(exceeded)
+                trace.summary("⛔ {} - a worker group stopped early", exceeded)
+            if condensed is not None:
+                # Tập đóng / tối đại trong một nhóm có thể bị tập của nhóm khác bao phủ
+                condensed.update(groupCounts)
+            else:
+                freqItemList.extend(groupItems)
+                supportCounts.update(groupCounts)
+                if topK is not None:
+                    for count in groupCounts.values():
+                        topK.offer(count)
+            trace.extend(groupTrace)
+    return supportCounts
 
 # Hàm sinh ra tất cả các tập con không rỗng của tập hợp s (trừ rỗng và chính nó)
 def powerset(s):
@@ -160,24 +590,32 @@ def getSupport(testSet, itemSetList):
     return count
 
 # Xây dựng rule từ các tập mục thường xuyên
-def associationRule(freqItemSet, itemSetList, minConf):
+# supportCounts: chỉ mục support count trả về từ mineTree, nếu có thì không phải quét lại giao dịch
+# (mọi tập con của một tập phổ biến đều phổ biến nên luôn có trong chỉ mục)
+def associationRule(freqItemSet, itemSetList, minConf, showProgress=True, supportCounts=None):
+    if supportCounts is None:
+        lookupSupport = lambda testSet: getSupport(testSet, itemSetList)
+    else:
+        lookupSupport = lambda testSet: supportCounts[frozenset(testSet)]
+
     rules = []
-    for itemSet in tqdm(freqItemSet):
+    for itemSet in tqdm(freqItemSet, disable=not showProgress):
         # Lấy tất cả các tập con không rỗng của tập itemSet
         subsets = powerset(itemSet)
         # Tính độ support của itemset đó
-        itemSetSup = getSupport(itemSet, itemSetList)
+        itemSetSup = lookupSupport(itemSet)
         # Kiểm tra nếu chính itemSet đó nhỏ hơn minConf thì bỏ qua luôn
         if itemSetSup <= minConf: continue
         for s in subsets:
             # dựa trên công thức tính confidence
-            confidence = float(itemSetSup / getSupport(s, itemSetList))
+            confidence = float(itemSetSup / lookupSupport(s))
             if(confidence > minConf):
                 rules.append([set(s), set(itemSet.difference(s)), confidence])
     return rules
 
 # Hàm gán cho mỗi itemSet xuất hiện 1 lần
-# Không xử lý gộp các itemSet trùng nhau
+# Không xử lý gộp các itemSet trùng nhau, muốn gộp thì dùng clean_data.deduplicate_transactions
+# rồi truyền trọng số vào fpgrowth(weights=...)
 def getFrequencyFromList(itemSetList):
     frequency = [1 for i in range(len(itemSetList))]
     return frequency
@@ -186,139 +624,247 @@ def getFrequencyFromList(itemSetList):
 # itemSetList: danh sách các transaction (mỗi phần tử là 1 tập các item)
 # minSupRatio: ngưỡng hỗ trợ tối thiểu tính theo tỷ lệ %
 # ngưỡng tin cậy tối thiểu cho rule
-def fpgrowth(itemSetList, minSupRatio, minConf):
+# weights: số lần xuất hiện của mỗi transaction (sau khi gộp trùng), mặc định mỗi transaction là 1
+def fpgrowth(itemSetList, minSupRatio, minConf, trace=None, backend='object', trackMemory=False, weights=None,
+             workers=1, output='all', maxLen=None, topK=None, budget=None, rules=True):
     """
     FP-Growth algorithm with detailed step-by-step output
+
+    Returns (freqItems, rules, supportCounts) where supportCounts maps frozenset(itemset)
+    to its support count as recorded while mining, or (None, None, None) if nothing is frequent.
+    trace is the ExecutionTrace receiving the execution steps, by default they are printed.
+    backend selects the FP-tree representation, one of FP_TREE_BACKENDS, both give the same results.
+    trackMemory measures the peak memory of tree construction and mining with tracemalloc
+    and reports it in the trace summary (tracemalloc slows the run down noticeably).
+    workers > 1 mines the conditional pattern bases of the header items in that many processes
+    (PFP style, see mineTreeParallel), memory is then only tracked for the main process.
+    output selects the reported itemsets, one of condensed_itemsets.ITEMSET_OUTPUTS: closed
+    itemsets merge closure items into the prefix while mining (FPClose style), maximal ones
+    skip branches an already found maximal itemset covers (FPMax style). supportCounts then
+    only holds the reported itemsets; closed rules get subset supports from the closed
+    itemsets and maximal itemsets give no rules.
+    maxLen stops extending itemsets once they hold maxLen items.
+    topK keeps only the topK itemsets with the highest support (and those tied with the last
+    one), minSupRatio stays a floor; the support threshold is raised while mining (see
+    mining_limits.TopKThreshold). Only with output 'all'.
+    budget is an optional mining_limits.MiningBudget checked while mining. When a limit is
+    reached mining stops and budget.exceeded tells which one; the itemsets found so far are
+    returned with their exact supports, rules only come from the ones whose subsets were
+    all found (closed output then gives no rules).
+    rules=False skips rule generation, for callers that only need freqItems and supportCounts.
     """
-    print(f"{'#'*60}")
-    print(f"FP-GROWTH ALGORITHM - DETAILED EXECUTION")
-    print(f"{'#'*60}")
-    print(f"Support threshold: {minSupRatio}")
-    print(f"Confidence threshold: {minConf}")
-    print(f"Total transactions: {len(itemSetList)}")
+    if output not in ITEMSET_OUTPUTS:
+        raise ValueError(f"Unknown itemset output '{output}', expected one of {ITEMSET_OUTPUTS}")
+    check_limits(output, topK, maxLen)
+    if backend not in FP_TREE_BACKENDS:
+        raise ValueError(f"Unknown FP-tree backend '{backend}', expected one of {FP_TREE_BACKENDS}")
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    if trace is None:
+        trace = ExecutionTrace.console()
+
+    trace.section("FP-GROWTH ALGORITHM - DETAILED EXECUTION", char='#')
+    trace.summary("Support threshold: {}", minSupRatio)
+    trace.summary("Confidence threshold: {}", minConf)
+    # Đếm số lần tần suất xuất hiện của từng itemSet
+    frequency = list(weights) if weights is not None else getFrequencyFromList(itemSetList)
+    totalTransactions = sum(frequency)
+
+    trace.summary("Total transactions: {}", totalTransactions)
+    trace.summary("FP-tree backend: {}", backend)
+    trace.summary("Worker processes: {}", workers)
+    trace.summary("Itemset output: {}", output)
+    if maxLen is not None:
+        trace.summary("Maximum itemset length: {}", maxLen)
+    if topK is not None:
+        trace.summary("Top-K itemsets by support: {}", topK)
 
     global viz_tree_dict
     viz_tree_dict = dict()
 
-    print(f"\n{'='*60}")
-    print(f"STEP 1: DATA PREPROCESSING")
-    print(f"{'='*60}")
-    print(f"📊 Total transactions: {len(itemSetList)}")
+    trace.section("STEP 1: DATA PREPROCESSING")
+    trace.summary("📊 Total transactions: {}", totalTransactions)
+    if weights is not None:
+        trace.summary("🧺 Distinct baskets after merging duplicates: {}", len(itemSetList))
 
     # Show first 5 transactions as examples
-    print("📋 Sample transactions:")
-    for i, transaction in enumerate(itemSetList[:5], 1):
-        items_display = ', '.join(transaction[:5])  # Show first 5 items
-        if len(transaction) > 5:
-            items_display += f" ... (+{len(transaction)-5} more items)"
-        print(f"  • Transaction {i}: [{items_display}]")
+    if trace.detail_enabled:
+        trace.detail("📋 Sample transactions:")
+        for i, transaction in enumerate(itemSetList[:5], 1):
+            items_display = ', '.join(transaction[:5])  # Show first 5 items
+            if len(transaction) > 5:
+                items_display += f" ... (+{len(transaction)-5} more items)"
+            trace.detail("  • Transaction {}: [{}]", i, items_display)
 
-    if len(itemSetList) > 5:
-        print(f"  ... and {len(itemSetList)-5} more transactions")
+        if len(itemSetList) > 5:
+            trace.detail("  ... and {} more transactions", len(itemSetList) - 5)
 
-    # Đếm số lần tần suất xuất hiện của từng itemSet
-    frequency = getFrequencyFromList(itemSetList)
-    minSup = len(itemSetList) * minSupRatio
+    minSup = totalTransactions * minSupRatio
 
-    print(f"\n⚙️ Minimum support count: {minSup:.1f} (threshold: {minSupRatio*100}%)")
+    trace.summary("\n⚙️ Minimum support count: {:.1f} (threshold: {}%)", minSup, minSupRatio * 100)
 
-    print(f"\n{'='*60}")
-    print(f"STEP 2: BUILDING FP-TREE")
-    print(f"{'='*60}")
-    print("🌳 Constructing FP-Tree from transactions...")
+    trace.section("STEP 2: BUILDING FP-TREE")
+    trace.summary("🌳 Constructing FP-Tree from transactions...")
 
-    fpTree, headerTable = constructTree(itemSetList, frequency, minSup)
+    if budget is not None:
+        budget.start()
 
-    if(fpTree == None):
-        print('❌ No frequent item set found')
-        return None, None
-    else:
-        print("✅ FP-Tree construction completed")
+    # Cùng một phiên tracemalloc với budget nếu budget đang đo bộ nhớ, không bật / tắt riêng
+    ownTracker = trackMemory and (budget is None or not budget.memory.active)
+    memoryTracker = None
+    # try / finally: kể cả khi xây cây hay khai thác lỗi (vd. MemoryError) vẫn dừng đo bộ nhớ và budget
+    try:
+        if trackMemory:
+            memoryTracker = MemoryTracker().start() if ownTracker else budget.memory
 
-        print(f"\n{'='*60}")
-        print(f"STEP 3: HEADER TABLE ANALYSIS")
-        print(f"{'='*60}")
-        print(f"📊 Frequent items found: {len(headerTable)}")
+        if backend == 'compact':
+            encodedList, itemNames = encodeItemSetList(itemSetList)
+            fpTree, headerTable = constructCompactTree(encodedList, frequency, minSup, itemNames, trace)
+            del encodedList
+        else:
+            fpTree, headerTable = constructTree(itemSetList, frequency, minSup, trace)
 
-        # Show top 10 most frequent items
-        sorted_items = sorted(headerTable.items(), key=lambda x: x[1][0], reverse=True)
-        print("🔝 Top frequent items:")
-        for i, (item, (freq, _)) in enumerate(sorted_items[:10], 1):
-            support_pct = (freq / len(itemSetList)) * 100
-            print(f"  {i}. {item}: {freq} times ({support_pct:.1f}%)")
+        if(fpTree == None):
+            trace.summary('❌ No frequent item set found')
+            return None, None, None
 
-        if len(headerTable) > 10:
-            print(f"  ... and {len(headerTable)-10} more items")
+        trace.summary("✅ FP-Tree construction completed")
 
-        print(f"\n{'='*60}")
-        print(f"STEP 4: MINING FREQUENT PATTERNS")
-        print(f"{'='*60}")
-        print("⛏️ Mining frequent itemsets from FP-Tree...")
+        trace.section("STEP 3: HEADER TABLE ANALYSIS")
+        trace.summary("📊 Frequent items found: {}", len(headerTable))
 
-        freqItems = []
-        mineTree(headerTable, minSup, set(), freqItems)
+        # Show top 10 most frequent items
+        if trace.summary_enabled:
+            sorted_items = sorted(headerTable.items(), key=lambda x: x[1][0], reverse=True)
+            trace.summary("🔝 Top frequent items:")
+            for i, (item, (freq, _, _)) in enumerate(sorted_items[:10], 1):
+                support_pct = (freq / totalTransactions) * 100
+                itemLabel = fpTree.itemNames[item] if backend == 'compact' else item
+                trace.summary("  {}. {}: {} times ({:.1f}%)", i, itemLabel, freq, support_pct)
 
-        print(f"✅ Found {len(freqItems)} frequent itemsets")
-        print(f"📈 Total frequent itemsets discovered: {len(freqItems)}")
+            if len(headerTable) > 10:
+                trace.summary("  ... and {} more items", len(headerTable) - 10)
 
-        print(f"\n{'='*60}")
-        print(f"STEP 5: FP-TREE STRUCTURE")
-        print(f"{'='*60}")
-        print("🌳 FP-Tree built successfully with frequent items")
-        print(f"🌳 Tree contains {len(freqItems)} frequent items")
+        trace.section("STEP 4: MINING FREQUENT PATTERNS")
+        trace.summary("⛏️ Mining frequent itemsets from FP-Tree...")
 
-        # Show itemset size distribution
+        freqItems = []
+        condensed = CondensedItemsets(output) if output != 'all' else None
+        topKThreshold = None
+        if topK is not None:
+            # Bản thân mỗi item là một tập phổ biến nên count lớn thứ K của các item đã là ngưỡng an toàn
+            topKThreshold = TopKThreshold(topK, minSup)
+            topKThreshold.raise_floor([entry[0] for entry in headerTable.values()])
+            trace.summary("🏆 Top-{} starting support count: {}", topK, topKThreshold.min_count)
+        if workers > 1:
+            supportCounts = mineTreeParallel(headerTable, minSup, freqItems, trace, fpTree, workers, condensed,
+                                             maxLen, topKThreshold, budget)
+        else:
+            supportCounts = mineTree(headerTable, minSup, set(), freqItems, trace, fpTree, condensed=condensed,
+                                     maxLen=maxLen, topK=topKThreshold, budget=budget)
+        del fpTree, headerTable
+        # Đọc peak trước khi budget.stop() kết thúc phiên đo bộ nhớ
+        if trackMemory:
+            peakMemory = memoryTracker.peak_bytes()
+    finally:
+        if ownTracker and memoryTracker is not None:
+            memoryTracker.stop()
+        if budget is not None:
+            budget.stop()
+
+    partial = budget is not None and budget.exceeded is not None
+    if partial:
+        trace.summary("⚠️ Partial result: {}", budget.exceeded)
+
+    if condensed is not None:
+        supportCounts = condensed.counts
+        freqItems = [set(itemSet) for itemSet in supportCounts]
+    elif topKThreshold is not None:
+        supportCounts = topKThreshold.select(supportCounts)
+        freqItems = [set(itemSet) for itemSet in supportCounts]
+        trace.summary("🏆 Final top-{} support count: {}", topK, topKThreshold.min_count)
+
+    if trackMemory:
+        trace.summary("💾 Peak memory of tree construction and mining ({} backend): {:.2f} MB",
+                      backend, peakMemory / (1024 * 1024))
+
+    trace.summary("✅ Found {} frequent itemsets", len(freqItems))
+    trace.summary("📈 Total frequent itemsets discovered: {}", len(freqItems))
+
+    trace.section("STEP 5: FP-TREE STRUCTURE")
+    trace.summary("🌳 FP-Tree built successfully with frequent items")
+    trace.summary("🌳 Tree contains {} frequent items", len(freqItems))
+
+    # Show itemset size distribution
+    if trace.summary_enabled:
         size_dist = {}
         for itemset in freqItems:
             size = len(itemset)
             size_dist[size] = size_dist.get(size, 0) + 1
 
-        print("📊 Itemset size distribution:")
+        trace.summary("📊 Itemset size distribution:")
         for size in sorted(size_dist.keys()):
-            print(f"  • {size}-itemsets: {size_dist[size]} found")
-
-        print(f"\n{'='*60}")
-        print(f"STEP 6: GENERATING ASSOCIATION RULES")
-        print(f"{'='*60}")
-        print(f"🔗 Generating rules with confidence ≥ {minConf*100}%...")
-
-        rules = associationRule(freqItems, itemSetList, minConf)
-
-        print(f"✅ Generated {len(rules)} association rules")
-
-        if rules:
-            # Show confidence distribution
-            conf_ranges = {"90-100%": 0, "80-90%": 0, "70-80%": 0, "60-70%": 0, "<60%": 0}
-            for rule in rules:
-                conf = rule[2] * 100
-                if conf >= 90:
-                    conf_ranges["90-100%"] += 1
-                elif conf >= 80:
-                    conf_ranges["80-90%"] += 1
-                elif conf >= 70:
-                    conf_ranges["70-80%"] += 1
-                elif conf >= 60:
-                    conf_ranges["60-70%"] += 1
-                else:
-                    conf_ranges["<60%"] += 1
-
-            print("📊 Confidence distribution:")
-            for range_name, count in conf_ranges.items():
-                if count > 0:
-                    print(f"  • {range_name}: {count} rules")
-
-        print(f"\n{'='*60}")
-        print(f"✅ ALGORITHM COMPLETED SUCCESSFULLY")
-        print(f"{'='*60}")
-        print(f"📈 Summary: {len(freqItems)} itemsets, {len(rules)} rules generated")
-
-        return freqItems, rules
+            trace.summary("  • {}-itemsets: {} found", size, size_dist[size])
+
+    trace.section("STEP 6: GENERATING ASSOCIATION RULES")
+    trace.summary("🔗 Generating rules with confidence ≥ {}%...", minConf * 100)
+
+    if not rules:
+        trace.summary("ℹ️ Rule generation skipped")
+        rules = []
+    elif output == 'maximal':
+        trace.summary("ℹ️ Maximal itemsets do not keep the supports of their subsets, no rules are generated")
+        rules = []
+    elif output == 'closed' and partial:
+        # Tập đóng của một lần khai thác dở dang không cho support đúng của các tập con
+        trace.summary("ℹ️ Closed itemsets of a partial run do not give subset supports, no rules are generated")
+        rules = []
+    elif output == 'closed':
+        rules = associationRule(freqItems, itemSetList, minConf, trace.detail_enabled,
+                                ClosureSupports(condensed))
+    elif partial:
+        # Chỉ sinh rule từ các tập có đủ mọi tập con trong kết quả dở dang
+        ruleCounts = downward_closed(supportCounts)
+        trace.summary("ℹ️ Rules from the {} of {} itemsets whose subsets were all found",
+                      len(ruleCounts), len(supportCounts))
+        rules = associationRule([set(itemSet) for itemSet in ruleCounts], itemSetList, minConf,
+                                trace.detail_enabled, ruleCounts)
+    else:
+        rules = associationRule(freqItems, itemSetList, minConf, trace.detail_enabled, supportCounts)
+
+    trace.summary("✅ Generated {} association rules", len(rules))
+
+    if rules and trace.summary_enabled:
+        # Show confidence distribution
+        conf_ranges = {"90-100%": 0, "80-90%": 0, "70-80%": 0, "60-70%": 0, "<60%": 0}
+        for rule in rules:
+            conf = rule[2] * 100
+            if conf >= 90:
+                conf_ranges["90-100%"] += 1
+            elif conf >= 80:
+                conf_ranges["80-90%"] += 1
+            elif conf >= 70:
+                conf_ranges["70-80%"] += 1
+            elif conf >= 60:
+                conf_ranges["60-70%"] += 1
+            else:
+                conf_ranges["<60%"] += 1
+
+        trace.summary("📊 Confidence distribution:")
+        for range_name, count in conf_ranges.items():
+            if count > 0:
+                trace.summary("  • {}: {} rules", range_name, count)
+
+    trace.section("✅ ALGORITHM COMPLETED SUCCESSFULLY")
+    trace.summary("📈 Summary: {} itemsets, {} rules generated", len(freqItems), len(rules))
+
+    return freqItems, rules, supportCounts
 
 def print_header_links(headerTable):
     print("\n===== Header Table Links =====")
     print("{:<10} {:<10} {}".format("Item", "Frequency", "Linked Nodes"))
     print("-" * 40)
-    for item, (frequency, node) in headerTable.items():
+    for item, (frequency, node, _) in headerTable.items():
         current = node
         chain = []
         while current is not None:
@@ -369,7 +915,7 @@ if __name__ == "__main__":
     print_fp_tree(fpTree)
 
 
-    freqItems, rules = fpgrowth(transactions, minSup, minConf)
+    freqItems, rules, supportCounts = fpgrowth(transactions, minSup, minConf)
     # # fpTree.display()
 
     printResults(freqItems, rules)
\ No newline at end of file
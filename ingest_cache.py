@@ -0,0 +1,126 @@
+import hashlib
+import os
+import stat
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    # The cache only stores Parquet, without pyarrow there is no ingest cache
+    PARQUET_AVAILABLE = False
+
+# Default location and size cap of the ingest cache, private to the user running the app
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'fim_ingest_cache')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def private_directory(directory):
+    """Create directory readable by its owner only, raise PermissionError if someone else can write to it
+
+    Cached files are loaded as they are, so a directory another user owns or can write to
+    (e.g. one planted in a shared temp dir) is refused instead of read.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise PermissionError(f"Cache directory {directory} is owned by another user")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"Cache directory {directory} is writable by other users")
+    return directory
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's bytes, the cache key of an upload"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestCache:
+    """Cleaned upload rows stored as Parquet files keyed by the digest of the uploaded bytes
+
+    Re-running an upload with other thresholds loads the cleaned rows instead of parsing
+    the spreadsheet again. A hit touches the file, so when the cache grows past max_bytes
+    the least recently used files are evicted first. Needs pyarrow (PARQUET_AVAILABLE) and
+    a private directory (see private_directory).
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError("The ingest cache stores Parquet files, install pyarrow to use it")
+        self.directory = private_directory(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, digest):
+        return os.path.join(self.directory, f"{digest}.parquet")
+
+    def load(self, digest):
+        """Cached rows of digest, or None"""
+        path = self.path(digest)
+        try:
+            rows = pd.read_parquet(path)
+        except (FileNotFoundError, OSError, ValueError, EOFError):
+            # Missing, evicted meanwhile or half written by a crashed run: read the upload again
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return rows
+
+    def store(self, digest, rows):
+        """Write rows under digest, then evict down to max_bytes"""
+        path = self.path(digest)
+        # Written next to the final file and renamed, so readers never see a partial file
+        partial_path = f"{path}.{os.getpid()}.tmp"
+        rows.to_parquet(partial_path, index=False)
+        os.replace(partial_path, path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """Remove least recently used files until the cache fits in max_bytes, returns how many"""
+        return evict_lru_files(self.directory, self.max_bytes, ('.parquet',), keep)
+
+
+def lru_file_entries(directory, suffixes):
+    """(path, size, last use) of the files of directory ending in suffixes, least recently used first"""
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(suffixes):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((path, stat.st_size, stat.st_mtime))
+    entries.sort(key=lambda entry: entry[2])
+    return entries
+
+
+def evict_lru_files(directory, max_bytes, suffixes, keep=None):
+    """Remove the least recently used files (by mtime) of directory until they fit in max_bytes
+
+    Readers touch a file on every hit. keep is never removed, e.g. the file just written.
+    Returns how many files were removed.
+    """
+    entries = lru_file_entries(directory, suffixes)
+    total_bytes = sum(size for _, size, _ in entries)
+    evicted = 0
+    for path, size, _ in entries:
+        if total_bytes <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        evicted += 1
+    return evicted
@@ -0,0 +1,196 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Job states, the last three are final
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+FINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function at the next phase boundary once the job is cancelled"""
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_pending jobs are already waiting"""
+
+
+class Job:
+    """One queued run: its state, the progress of its phases and finally its result
+
+    The job function reports progress with start_phase(), which also raises JobCancelled
+    once the job is cancelled. Long phases can register on_cancel callbacks to stop
+    sooner, e.g. MiningBudget.cancel.
+    """
+
+    def __init__(self, phases):
+        self.id = uuid.uuid4().hex
+        self.status = JOB_QUEUED
+        self.phases = OrderedDict((phase, {'status': 'pending', 'seconds': None}) for phase in phases)
+        self.current_phase = None
+        self.phase_started_at = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.http_status = None
+        self.error = None
+        # Extra values of a finished job that are not part of its result
+        self.artifacts = {}
+        self.cancel_requested = False
+        self.cancel_callbacks = []
+        self.lock = threading.Lock()
+        self.future = None
+
+    def check_cancelled(self):
+        if self.cancel_requested:
+            raise JobCancelled(self.id)
+
+    def start_phase(self, phase):
+        """Finish the current phase and start the next one"""
+        self.check_cancelled()
+        with self.lock:
+            self._finish_phase()
+            self.current_phase = phase
+            self.phase_started_at = time.time()
+            self.phases[phase]['status'] = 'running'
+
+    def skip_phase(self, phase):
+        """Mark a phase this run does not need, it counts as finished"""
+        with self.lock:
+            self.phases[phase]['status'] = 'skipped'
+
+    def _finish_phase(self, status='done'):
+        if self.current_phase is not None:
+            self.phases[self.current_phase]['status'] = status
+            self.phases[self.current_phase]['seconds'] = round(time.time() - self.phase_started_at, 4)
+            self.current_phase = None
+
+    def on_cancel(self, callback):
+        with self.lock:
+            self.cancel_callbacks.append(callback)
+        if self.cancel_requested:
+            callback()
+
+    @property
+    def progress(self):
+        """Share of the phases finished or skipped, a running phase counts half"""
+        done = sum(1 for phase in self.phases.values() if phase['status'] in ('done', 'skipped'))
+        running = 1 if self.current_phase is not None else 0
+        return round((done + running / 2) / len(self.phases), 3) if self.phases else 0.0
+
+    def to_dict(self):
+        """Status of the job for a response, without its result"""
+        with self.lock:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'phase': self.current_phase,
+                'phases': {phase: dict(state) for phase, state in self.phases.items()},
+                'progress': 1.0 if self.status == JOB_SUCCEEDED else self.progress,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'error': self.error,
+            }
+
+
+class JobQueue:
+    """Bounded pool of worker threads running jobs submitted by request handlers
+
+    At most max_workers jobs run at once and at most max_pending wait; the max_finished
+    most recent finished jobs are kept for their status and result.
+    A job function is called as func(job, *args, **kwargs) and returns (result, http_status),
+    a status of 400 or more marks the job failed with result['error'].
+    cleanup, if given to submit(), is called once the job is over, whether it ran, failed or
+    was cancelled before it started, e.g. to delete the upload the job would have read.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, max_finished=100):
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mining-job')
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, func, phases, *args, cleanup=None, **kwargs):
+        with self.lock:
+            pending = sum(1 for job in self.jobs.values() if job.status == JOB_QUEUED)
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs are already waiting")
+            job = Job(phases)
+            self.jobs[job.id] = job
+            self._forget_finished()
+        job.future = self.executor.submit(self._run, job, func, args, kwargs)
+        if cleanup is not None:
+            # Also called when the future is cancelled and when _run skips a cancelled job
+            job.future.add_done_callback(lambda _future: cleanup())
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or ask a running one to stop; returns the job or None"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with job.lock:
+            if job.status in FINAL_STATES:
+                return job
+            job.cancel_requested = True
+            callbacks = list(job.cancel_callbacks)
+            if job.status == JOB_QUEUED and job.future is not None and job.future.cancel():
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+        for callback in callbacks:
+            callback()
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        with job.lock:
+            if job.cancel_requested:
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+                return
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+        try:
+            result, http_status = func(job, *args, **kwargs)
+            job.check_cancelled()
+        except JobCancelled:
+            status, result, http_status, error = JOB_CANCELLED, None, None, None
+        except Exception as e:
+            status, result, http_status, error = JOB_FAILED, None, 500, str(e)
+        else:
+            if http_status >= 400:
+                status, error = JOB_FAILED, result.get('error')
+            else:
+                status, error = JOB_SUCCEEDED, None
+        with job.lock:
+            job._finish_phase('done' if status == JOB_SUCCEEDED else status)
+            job.status = status
+            job.result = result
+            job.http_status = http_status
+            job.error = error
+            job.finished_at = time.time()
+
+    def _forget_finished(self):
+        """Drop the oldest finished jobs beyond max_finished (caller holds the lock)"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINAL_STATES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    def stats(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
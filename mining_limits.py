@@ -0,0 +1,263 @@
+import heapq
+import os
+import threading
+import time
+import tracemalloc
+
+
+class TopKThreshold:
+    """Support count threshold that rises while mining so that only the top k itemsets are kept
+
+    Every mined itemset is offered once with its support count. Once k itemsets have been
+    seen, no itemset below the k-th best count seen so far can be in the final top k, and
+    neither can any of its supersets, so engines prune with min_count as it rises. The
+    final selection keeps every itemset tied with the k-th best, so it can hold more than k.
+    """
+
+    def __init__(self, k, min_count=0):
+        if k < 1:
+            raise ValueError(f"top_k must be at least 1, got {k}")
+        self.k = k
+        self.floor = min_count
+        self.best_counts = []
+
+    @property
+    def min_count(self):
+        """Smallest support count an itemset can have and still be in the top k"""
+        if len(self.best_counts) < self.k:
+            return self.floor
+        return max(self.floor, self.best_counts[0])
+
+    def offer(self, count):
+        """Record the support count of a newly mined itemset"""
+        if len(self.best_counts) < self.k:
+            heapq.heappush(self.best_counts, count)
+        elif count > self.best_counts[0]:
+            heapq.heapreplace(self.best_counts, count)
+
+    def raise_floor(self, counts):
+        """Raise the floor to the k-th best of counts of k distinct itemsets known to be frequent
+
+        Used with the single item counts before mining, the items are itemsets themselves.
+        """
+        if len(counts) >= self.k:
+            self.floor = max(self.floor, heapq.nlargest(self.k, counts)[-1])
+
+    def select(self, support_counts):
+        """The itemsets of a {itemset: support count} mapping that make the top k"""
+        min_count = self.min_count
+        return {itemset: count for itemset, count in support_counts.items() if count >= min_count}
+
+
+def check_limits(output, top_k=None, max_len=None):
+    """Validate top_k / max_len against an itemset output, raises ValueError"""
+    if top_k is not None and top_k < 1:
+        raise ValueError(f"top_k must be at least 1, got {top_k}")
+    if max_len is not None and max_len < 1:
+        raise ValueError(f"max_len must be at least 1, got {max_len}")
+    if top_k is not None and output != 'all':
+        raise ValueError(f"top_k can only be used with output 'all', got '{output}'")
+
+
+# tracemalloc is process-wide: every MemoryTracker joins one shared session, the first one
+# starts it and the last one stops it
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+# Memory budgeted runs of a process take turns, the traced peak cannot tell concurrent runs apart
+_memory_budget_lock = threading.Lock()
+
+
+def _reset_tracing_after_fork():
+    """A worker process starts with no tracing session and unlocked locks of its own"""
+    global _tracing_lock, _tracing_users, _tracing_started, _memory_budget_lock
+    _tracing_lock = threading.Lock()
+    _memory_budget_lock = threading.Lock()
+    _tracing_users = 0
+    _tracing_started = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_tracing_after_fork)
+
+
+class MemoryTracker:
+    """Peak traced memory since start(), measured in the shared tracemalloc session
+
+    The peak is reset when the tracker is the only user of the session. With several users
+    (other threads) the peak is that of the whole process since the last reset, an upper
+    bound of this tracker's own peak.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.base_memory = 0
+
+    def start(self):
+        global _tracing_users, _tracing_started
+        if self.active:
+            return self
+        with _tracing_lock:
+            if _tracing_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing_started = True
+            _tracing_users += 1
+            if _tracing_users == 1:
+                tracemalloc.reset_peak()
+            self.base_memory = tracemalloc.get_traced_memory()[0]
+        self.active = True
+        return self
+
+    def stop(self):
+        global _tracing_users, _tracing_started
+        if not self.active:
+            return
+        self.active = False
+        with _tracing_lock:
+            _tracing_users -= 1
+            if _tracing_users == 0 and _tracing_started:
+                tracemalloc.stop()
+                _tracing_started = False
+
+    def peak_bytes(self):
+        """Peak traced memory above the memory traced at start(), None when not started"""
+        if not self.active:
+            return None
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc was stopped outside of MemoryTracker while a tracker was active")
+        return max(0, tracemalloc.get_traced_memory()[1] - self.base_memory)
+
+
+# Limits a MiningBudget can enforce, as reported in BudgetExceeded.limit
+BUDGET_LIMITS = ('max_candidates', 'max_itemsets', 'max_seconds', 'max_memory_mb')
+
+
+class BudgetExceeded(Exception):
+    """Raised inside a mining loop when a MiningBudget limit is reached"""
+
+    def __init__(self, limit, value, maximum):
+        super().__init__(limit, value, maximum)
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+
+    def __str__(self):
+        if self.limit == 'cancelled':
+            return "run cancelled"
+        return f"{self.limit} budget exceeded: {self.value} > {self.maximum}"
+
+    def as_dict(self):
+        return {'limit': self.limit, 'value': self.value, 'maximum': self.maximum}
+
+
+class MiningBudget:
+    """Resource limits of one mining run, checked by the engines inside their loops
+
+    max_candidates: candidate itemsets generated for one level (Apriori) or extensions
+    tested for one equivalence class (Eclat); FP-Growth generates no candidates.
+    max_itemsets: frequent itemsets recorded so far.
+    max_seconds: wall time since start().
+    max_memory_mb: peak memory traced by tracemalloc since start(), tracing slows the run
+    down noticeably so it is only started when this limit is set. tracemalloc cannot tell
+    threads apart, so memory budgeted runs of one process take turns: start() waits for the
+    previous one to stop(). memory exposes the tracker for other measurements of the run.
+
+    A check raises BudgetExceeded; engines catch it, keep it in exceeded and return what
+    they found so far as a partial result. None disables a limit.
+    cancel() makes the next check() raise BudgetExceeded('cancelled'), so a run can be
+    stopped from another thread through the same checks (worker processes do not see it).
+    """
+
+    def __init__(self, max_candidates=None, max_itemsets=None, max_seconds=None, max_memory_mb=None):
+        self.max_candidates = max_candidates
+        self.max_itemsets = max_itemsets
+        self.max_seconds = max_seconds
+        self.max_memory_mb = max_memory_mb
+        self.started_at = None
+        self.memory = MemoryTracker()
+        self.holds_memory_lock = False
+        self.cancelled = False
+        self.exceeded = None
+
+    @property
+    def limits(self):
+        return {limit: getattr(self, limit) for limit in BUDGET_LIMITS}
+
+    def start(self):
+        """Start the clock (and memory tracing), a budget already started keeps its start time"""
+        if self.max_memory_mb is not None and not self.memory.active:
+            # Waiting for another memory budgeted run ends early once this run is cancelled,
+            # the next check() then stops it
+            while not _memory_budget_lock.acquire(timeout=0.1):
+                if self.cancelled:
+                    break
+            else:
+                self.holds_memory_lock = True
+                self.memory.start()
+        if self.started_at is None:
+            self.started_at = time.time()
+        return self
+
+    def stop(self):
+        """Stop the memory tracing started by start()"""
+        self.memory.stop()
+        if self.holds_memory_lock:
+            self.holds_memory_lock = False
+            _memory_budget_lock.release()
+
+    def worker_copy(self):
+        """Copy sent to a worker process: same limits and start time, no tracing of its own yet"""
+        copy = MiningBudget(**self.limits)
+        copy.started_at = self.started_at
+        return copy
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self):
+        """Check the time and memory limits"""
+        if self.cancelled:
+            raise BudgetExceeded('cancelled', None, None)
+        if self.max_seconds is not None and self.started_at is not None:
+            elapsed = time.time() - self.started_at
+            if elapsed > self.max_seconds:
+                raise BudgetExceeded('max_seconds', round(elapsed, 2), self.max_seconds)
+        if self.max_memory_mb is not None and self.memory.active:
+            peak_mb = self.memory.peak_bytes() / (1024 * 1024)
+            if peak_mb > self.max_memory_mb:
+                raise BudgetExceeded('max_memory_mb', round(peak_mb, 1), self.max_memory_mb)
+
+    def check_candidates(self, count):
+        if self.max_candidates is not None and count > self.max_candidates:
+            raise BudgetExceeded('max_candidates', count, self.max_candidates)
+
+    def check_itemsets(self, count):
+        if self.max_itemsets is not None and count > self.max_itemsets:
+            raise BudgetExceeded('max_itemsets', count, self.max_itemsets)
+
+    def record(self, exceeded):
+        """Keep the first limit reached in a run"""
+        if self.exceeded is None:
+            self.exceeded = exceeded
+
+    def report(self):
+        """Summary for a response: the limits and the exceeded one, if any"""
+        return {
+            'limits': self.limits,
+            'exceeded': self.exceeded.as_dict() if self.exceeded is not None else None,
+        }
+
+
+def downward_closed(support_counts):
+    """Largest part of a partial {frozenset(itemset): count} mapping that holds every subset of its itemsets
+
+    A run stopped early can miss subsets of itemsets it found, rules can only be generated
+    from itemsets whose subsets all have a support count.
+    """
+    closed = {}
+    for itemset in sorted(support_counts, key=len):
+        if len(itemset) == 1 or all(itemset - {item} in closed for item in itemset):
+            closed[itemset] = support_counts[itemset]
+    return closed
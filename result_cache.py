@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from ingest_cache import evict_lru_files
+
+# Default bounds of the two tiers
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+def result_key(digest, parameters):
+    """Cache key of a run: the digest of the uploaded bytes plus every parameter of the run"""
+    encoded = json.dumps({'digest': digest, 'parameters': parameters}, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Finished /upload results in an in-memory LRU tier and an optional on-disk tier
+
+    Values are pickled once when stored: the pickled size is what bounds the memory tier
+    and it is also what the disk tier writes. A memory miss falls back to the disk tier
+    and promotes the value back into memory. Both tiers evict least recently used entries
+    first. get() returns (value, tier) with tier 'memory', 'disk' or None on a miss.
+    """
+
+    def __init__(self, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, directory=None,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_memory_bytes = max_memory_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Flask serves requests from several threads
+        self.lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, key):
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(payload), 'memory'
+
+        if self.directory is not None:
+            path = self.path(key)
+            try:
+                with open(path, 'rb') as file:
+                    payload = file.read()
+                value = pickle.loads(payload)
+            except (FileNotFoundError, OSError, EOFError, pickle.UnpicklingError):
+                value = None
+            if value is not None:
+                os.utime(path)
+                with self.lock:
+                    self.hits += 1
+                    self._remember(key, payload)
+                return value, 'disk'
+
+        with self.lock:
+            self.misses += 1
+        return None, None
+
+    def put(self, key, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self._remember(key, payload)
+        if self.directory is not None and len(payload) <= self.max_disk_bytes:
+            path = self.path(key)
+            # Written next to the final file and renamed, so readers never see a partial file
+            partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(partial_path, 'wb') as file:
+                file.write(payload)
+            os.replace(partial_path, path)
+            evict_lru_files(self.directory, self.max_disk_bytes, ('.pickle',), keep=path)
+
+    def _remember(self, key, payload):
+        """Keep payload in the memory tier (caller holds the lock), values larger than the tier are skipped"""
+        if len(payload) > self.max_memory_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= len(previous)
+        self.entries[key] = payload
+        self.memory_bytes += len(payload)
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def stats(self):
+        """Counters for a response"""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_entries': len(self.entries),
+                'memory_bytes': self.memory_bytes,
+                'disk_enabled': self.directory is not None,
+            }
@@ -0,0 +1,190 @@
+import json
+
+# Kinds of records a stored result holds, with the list they come from in result['results']
+RESULT_KINDS = {
+    'itemsets': 'frequent_itemsets',
+    'rules': 'association_rules',
+}
+
+# Sort keys of every kind, the first one is the default (highest first)
+SORT_KEYS = {
+    'itemsets': {
+        'support': lambda record: record['support'],
+        'size': lambda record: len(record['itemset']),
+        'rank': lambda record: record['rank'],
+    },
+    'rules': {
+        'confidence': lambda record: record['confidence'],
+        'size': lambda record: len(record['antecedent']) + len(record['consequent']),
+        'antecedent_size': lambda record: len(record['antecedent']),
+    },
+}
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+
+def parse_items(text):
+    """Items of a comma separated filter value as strings, None when blank"""
+    if text is None:
+        return None
+    items = {item.strip() for item in text.split(',') if item.strip()}
+    return items or None
+
+
+def _float_arg(args, name):
+    value = args.get(name, '').strip()
+    return float(value) if value else None
+
+
+def _int_arg(args, name, default=None):
+    value = args.get(name, '').strip()
+    return int(value) if value else default
+
+
+def record_filter(kind, args):
+    """Predicate on the records of kind built from the query args, raises ValueError
+
+    itemsets: min_support, max_support, min_size, max_size, contains (every listed item)
+    rules: min_confidence, max_confidence, min_size, max_size, contains (every listed item on
+    either side), antecedent and consequent (every listed item on that side)
+    Items are compared as strings.
+    """
+    min_size = _int_arg(args, 'min_size')
+    max_size = _int_arg(args, 'max_size')
+    contains = parse_items(args.get('contains'))
+    size_key = SORT_KEYS[kind]['size']
+
+    if kind == 'itemsets':
+        min_value, max_value = _float_arg(args, 'min_support'), _float_arg(args, 'max_support')
+        value_key = SORT_KEYS[kind]['support']
+        sides = {}
+    else:
+        min_value, max_value = _float_arg(args, 'min_confidence'), _float_arg(args, 'max_confidence')
+        value_key = SORT_KEYS[kind]['confidence']
+        sides = {side: parse_items(args.get(side)) for side in ('antecedent', 'consequent')}
+        sides = {side: items for side, items in sides.items() if items}
+
+    def matches(record):
+        if min_value is not None and value_key(record) < min_value:
+            return False
+        if max_value is not None and value_key(record) > max_value:
+            return False
+        if min_size is not None and size_key(record) < min_size:
+            return False
+        if max_size is not None and size_key(record) > max_size:
+            return False
+        if contains is not None:
+            items = record['itemset'] if kind == 'itemsets' else record['antecedent'] + record['consequent']
+            if not contains <= {str(item) for item in items}:
+                return False
+        for side, items in sides.items():
+            if not items <= {str(item) for item in record[side]}:
+                return False
+        return True
+
+    return matches
+
+
+def select_records(records, kind, args):
+    """Records of kind matching the query args, in the order they ask for
+
+    sort is one of SORT_KEYS[kind] and order 'desc' (default) or 'asc'; records with equal
+    keys keep their stored order. Returns (records, sort, order), raises ValueError.
+    """
+    if kind not in RESULT_KINDS:
+        raise ValueError(f"Unknown result kind '{kind}', expected one of {list(RESULT_KINDS)}")
+    sort_keys = SORT_KEYS[kind]
+    default_sort = next(iter(sort_keys))
+    sort = args.get('sort', default_sort)
+    order = args.get('order', 'desc')
+    if sort not in sort_keys:
+        raise ValueError(f"Unknown sort '{sort}' for {kind}, expected one of {list(sort_keys)}")
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"Unknown order '{order}', expected 'asc' or 'desc'")
+
+    matches = record_filter(kind, args)
+    selected = [record for record in records if matches(record)]
+    # Stored results are already highest first by the default key, only other orders need a sort
+    if sort != default_sort or order != 'desc':
+        selected.sort(key=sort_keys[sort], reverse=order == 'desc')
+    return selected, sort, order
+
+
+def page_records(records, kind, args):
+    """One page of the records of kind selected by the query args, raises ValueError
+
+    page is 1-based, per_page at most MAX_PER_PAGE. Returns the page with the totals needed
+    to page through the rest.
+    """
+    selected, sort, order = select_records(records, kind, args)
+    page = _int_arg(args, 'page', 1)
+    per_page = _int_arg(args, 'per_page', DEFAULT_PER_PAGE)
+    if page < 1:
+        raise ValueError(f"page must be at least 1, got {page}")
+    if not 1 <= per_page <= MAX_PER_PAGE:
+        raise ValueError(f"per_page must be between 1 and {MAX_PER_PAGE}, got {per_page}")
+    start = (page - 1) * per_page
+    return {
+        'kind': kind,
+        'items': selected[start:start + per_page],
+        'page': page,
+        'per_page': per_page,
+        'total': len(selected),
+        'pages': (len(selected) + per_page - 1) // per_page,
+        'sort': sort,
+        'order': order,
+    }
+
+
+def iter_ndjson(records, transform=None):
+    """One JSON document per line for every record, transform(record) is applied first"""
+    for record in records:
+        if transform is not None:
+            record = transform(record)
+        yield json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+def _itemset_key(items):
+    return tuple(sorted(str(item) for item in items))
+
+
+def _rule_key(record):
+    return _itemset_key(record['antecedent']), _itemset_key(record['consequent'])
+
+
+def compare_itemsets(custom_records, library_records, limit=DEFAULT_PER_PAGE):
+    """Set comparison of two itemset lists, matched on their items as strings
+
+    Returns the size of every group (common, custom_only, library_only) and the first limit
+    records of each, highest support first; common records are {'custom', 'library'} pairs.
+    """
+    custom = {_itemset_key(record['itemset']): record for record in custom_records}
+    library = {_itemset_key(record['itemset']): record for record in library_records}
+    common = [{'custom': custom[key], 'library': record} for key, record in library.items() if key in custom]
+    custom_only = [record for key, record in custom.items() if key not in library]
+    library_only = [record for key, record in library.items() if key not in custom]
+    common.sort(key=lambda pair: pair['library']['support'], reverse=True)
+    custom_only.sort(key=SORT_KEYS['itemsets']['support'], reverse=True)
+    library_only.sort(key=SORT_KEYS['itemsets']['support'], reverse=True)
+    return {
+        'common': len(common),
+        'custom_only': len(custom_only),
+        'library_only': len(library_only),
+        'common_items': common[:limit],
+        'custom_only_items': custom_only[:limit],
+        'library_only_items': library_only[:limit],
+    }
+
+
+def compare_rules(custom_records, library_records, limit=DEFAULT_PER_PAGE):
+    """Totals of two rule lists, how many rules they share and the first limit of each by confidence"""
+    library_keys = {_rule_key(record) for record in library_records}
+    by_confidence = SORT_KEYS['rules']['confidence']
+    return {
+        'custom_total': len(custom_records),
+        'library_total': len(library_records),
+        'common': sum(1 for record in custom_records if _rule_key(record) in library_keys),
+        'custom_items': sorted(custom_records, key=by_confidence, reverse=True)[:limit],
+        'library_items': sorted(library_records, key=by_confidence, reverse=True)[:limit],
+    }
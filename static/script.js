@@ -11,6 +11,7 @@ const progressBar = document.getElementById('progressBar');
 const progressText = document.getElementById('progressText');
 const resultsSection = document.getElementById('resultsSection');
 const compareBtn = document.getElementById('compareBtn');
+const cancelBtn = document.getElementById('cancelBtn');
 
 // Tab functionality
 const tabButtons = document.querySelectorAll('.tab-button');
@@ -19,6 +20,31 @@ const tabContents = document.querySelectorAll('.tab-content');
 // Global variables
 let currentResults = null;
 let isComparisonMode = false;
+let currentJob = null;
+
+// Tên hiển thị của các giai đoạn của job
+const PHASE_LABELS = {
+    cleaning: 'Đang làm sạch dữ liệu...',
+    mining: 'Đang khai phá tập phổ biến...',
+    formatting: 'Đang định dạng kết quả...',
+    library: 'Đang chờ thư viện mlxtend chạy song song...'
+};
+const JOB_POLL_INTERVAL_MS = 500;
+
+// Kết quả được lưu trên server, giao diện lấy từng trang itemsets / rules
+const RESULTS_PER_PAGE = 50;
+const SORT_OPTIONS = {
+    itemsets: { support: 'Support', size: 'Số item', rank: 'Thứ hạng' },
+    rules: { confidence: 'Độ tin cậy', size: 'Số item', antecedent_size: 'Số item vế trái' }
+};
+let resultQueries = {};
+
+function resetResultQueries() {
+    resultQueries = {
+        itemsets: { page: 1, sort: 'support', order: 'desc', contains: '' },
+        rules: { page: 1, sort: 'confidence', order: 'desc', contains: '' }
+    };
+}
 
 // File upload handling
 uploadArea.addEventListener('dragover', (e) => {
@@ -138,21 +164,35 @@ uploadForm.addEventListener('submit', async (e) => {
     const formData = new FormData(uploadForm);
 
     try {
-        // Simulate progress updates
-        updateProgress(20, 'Đang tải file lên server...');
+        updateProgress(5, 'Đang tải file lên server...');
 
         const response = await fetch('/upload', {
             method: 'POST',
             body: formData
         });
 
-        updateProgress(60, 'Đang xử lý dữ liệu...');
+        const submitted = await response.json();
 
-        const result = await response.json();
+        if (!response.ok) {
+            throw new Error(submitted.error || 'Có lỗi xảy ra');
+        }
+
+        // Server trả về 202 ngay, theo dõi job cho đến khi xong
+        currentJob = submitted;
+        cancelBtn.classList.remove('hidden');
+        const job = await pollJob(submitted.status_url);
+
+        if (job.status === 'cancelled') {
+            hideProgress();
+            return;
+        }
+
+        const resultResponse = await fetch(submitted.result_url);
+        const result = await resultResponse.json();
 
         console.log("data tra ra " ,result)
 
-        if (!response.ok) {
+        if (!resultResponse.ok) {
             throw new Error(result.error || 'Có lỗi xảy ra');
         }
 
@@ -162,7 +202,7 @@ uploadForm.addEventListener('submit', async (e) => {
         setTimeout(() => {
             hideProgress();
             showResults(result);
-        }, 1000);
+        }, 500);
 
     } catch (error) {
         hideProgress();
@@ -170,6 +210,40 @@ uploadForm.addEventListener('submit', async (e) => {
     }
 });
 
+// Hỏi trạng thái job định kỳ, cập nhật thanh tiến trình, trả về trạng thái cuối
+async function pollJob(statusUrl) {
+    while (true) {
+        const response = await fetch(statusUrl);
+        const job = await response.json();
+
+        if (!response.ok) {
+            throw new Error(job.error || 'Không tìm thấy job');
+        }
+
+        if (job.status === 'queued') {
+            updateProgress(5, 'Đang chờ trong hàng đợi...');
+        } else if (job.status === 'running') {
+            updateProgress(Math.max(5, Math.round(job.progress * 100)), PHASE_LABELS[job.phase] || 'Đang xử lý dữ liệu...');
+        } else {
+            return job;
+        }
+
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+}
+
+// Hủy job đang chạy
+cancelBtn.addEventListener('click', async () => {
+    if (!currentJob) return;
+    cancelBtn.disabled = true;
+    updateProgress(parseInt(progressBar.style.width) || 0, 'Đang hủy...');
+    try {
+        await fetch(currentJob.cancel_url, { method: 'POST' });
+    } catch (error) {
+        alert('Lỗi: ' + error.message);
+    }
+});
+
 function showProgress() {
     progressSection.classList.remove('hidden');
     resultsSection.classList.add('hidden');
@@ -183,6 +257,9 @@ function updateProgress(percent, text) {
 
 function hideProgress() {
     progressSection.classList.add('hidden');
+    cancelBtn.classList.add('hidden');
+    cancelBtn.disabled = false;
+    currentJob = null;
     submitBtn.disabled = false;
 }
 
@@ -198,19 +275,134 @@ function showResults(data) {
     // Populate summary cards
     populateSummaryCards(data);
 
-    // Populate algorithm steps
-    document.getElementById('algorithmSteps').textContent = data.results.steps;
+    // Warn when a resource limit stopped the run early
+    populatePartialNotice(data.results);
 
-    // Populate itemsets
-    populateItemsets(data.results.frequent_itemsets);
+    // Populate algorithm steps
+    loadAlgorithmSteps();
 
-    // Populate rules
-    populateRules(data.results.association_rules);
+    // Populate itemsets and rules, one page at a time
+    resetResultQueries();
+    loadResultPage('itemsets');
+    loadResultPage('rules');
 
     // Scroll to results
     resultsSection.scrollIntoView({ behavior: 'smooth' });
 }
 
+async function loadAlgorithmSteps() {
+    const algorithmSteps = document.getElementById('algorithmSteps');
+    algorithmSteps.textContent = 'Đang tải...';
+    try {
+        const response = await fetch(currentResults.urls.steps);
+        algorithmSteps.textContent = await response.text();
+    } catch (error) {
+        algorithmSteps.textContent = 'Lỗi: ' + error.message;
+    }
+}
+
+// Lấy một trang itemsets / rules theo truy vấn hiện tại của tab đó
+async function loadResultPage(kind) {
+    const query = resultQueries[kind];
+    const params = new URLSearchParams({
+        page: query.page,
+        per_page: RESULTS_PER_PAGE,
+        sort: query.sort,
+        order: query.order
+    });
+    if (query.contains) params.set('contains', query.contains);
+
+    try {
+        const response = await fetch(`${currentResults.urls[kind]}?${params}`);
+        const page = await response.json();
+        if (!response.ok) {
+            throw new Error(page.error || 'Có lỗi xảy ra');
+        }
+        if (kind === 'itemsets') {
+            populateItemsets(page);
+        } else {
+            populateRules(page);
+        }
+    } catch (error) {
+        alert('Lỗi: ' + error.message);
+    }
+}
+
+// Thoát các ký tự đặc biệt trước khi đưa giá trị người dùng nhập vào HTML / thuộc tính
+function escapeHtml(text) {
+    return String(text)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;');
+}
+
+// Thanh sắp xếp / lọc phía trên danh sách
+function resultToolbar(kind, page) {
+    const query = resultQueries[kind];
+    const sortOptions = Object.entries(SORT_OPTIONS[kind]).map(([value, label]) =>
+        `<option value="${value}" ${value === query.sort ? 'selected' : ''}>${label}</option>`).join('');
+    return `
+        <div class="flex flex-wrap items-center gap-2 mb-4 text-sm" data-toolbar="${kind}">
+            <select data-field="sort" class="border border-gray-300 rounded-lg px-2 py-1">${sortOptions}</select>
+            <select data-field="order" class="border border-gray-300 rounded-lg px-2 py-1">
+                <option value="desc" ${query.order === 'desc' ? 'selected' : ''}>Giảm dần</option>
+                <option value="asc" ${query.order === 'asc' ? 'selected' : ''}>Tăng dần</option>
+            </select>
+            <input data-field="contains" type="text" value="${escapeHtml(query.contains)}" placeholder="Lọc theo mã sản phẩm (cách nhau bởi dấu phẩy)"
+                   class="border border-gray-300 rounded-lg px-2 py-1 flex-1 min-w-[200px]">
+            <button data-action="apply" class="bg-blue-600 text-white px-3 py-1 rounded-lg hover:bg-blue-700">Lọc</button>
+            <a href="${currentResults.urls.export}?kind=${kind}" class="text-blue-600 hover:underline ml-auto">
+                <i class="fas fa-download mr-1"></i>Tải NDJSON
+            </a>
+        </div>
+    `;
+}
+
+// Nút chuyển trang phía dưới danh sách
+function resultPager(kind, page) {
+    if (page.pages <= 1) return '';
+    return `
+        <div class="flex items-center justify-center gap-4 mt-4 text-sm" data-pager="${kind}">
+            <button data-page="${page.page - 1}" ${page.page <= 1 ? 'disabled' : ''}
+                    class="px-3 py-1 border border-gray-300 rounded-lg disabled:opacity-50">
+                <i class="fas fa-chevron-left"></i>
+            </button>
+            <span>Trang ${page.page} / ${page.pages}</span>
+            <button data-page="${page.page + 1}" ${page.page >= page.pages ? 'disabled' : ''}
+                    class="px-3 py-1 border border-gray-300 rounded-lg disabled:opacity-50">
+                <i class="fas fa-chevron-right"></i>
+            </button>
+        </div>
+    `;
+}
+
+function bindResultControls(container, kind) {
+    const toolbar = container.querySelector(`[data-toolbar="${kind}"]`);
+    if (toolbar) {
+        const apply = () => {
+            resultQueries[kind] = {
+                page: 1,
+                sort: toolbar.querySelector('[data-field="sort"]').value,
+                order: toolbar.querySelector('[data-field="order"]').value,
+                contains: toolbar.querySelector('[data-field="contains"]').value.trim()
+            };
+            loadResultPage(kind);
+        };
+        toolbar.querySelector('[data-action="apply"]').addEventListener('click', apply);
+        toolbar.querySelectorAll('select').forEach(select => select.addEventListener('change', apply));
+        toolbar.querySelector('[data-field="contains"]').addEventListener('keydown', (e) => {
+            if (e.key === 'Enter') apply();
+        });
+    }
+    container.querySelectorAll(`[data-pager="${kind}"] button[data-page]`).forEach(button => {
+        button.addEventListener('click', () => {
+            resultQueries[kind].page = parseInt(button.getAttribute('data-page'));
+            loadResultPage(kind);
+        });
+    });
+}
+
 function populateSummaryCards(data) {
     const summaryCards = document.getElementById('summaryCards');
     summaryCards.innerHTML = `
@@ -227,7 +419,7 @@ function populateSummaryCards(data) {
             <div class="flex items-center">
                 <i class="fas fa-cubes text-green-600 text-2xl mr-3"></i>
                 <div>
-                    <div class="text-2xl font-bold text-green-800">${data.results.frequent_itemsets.length}</div>
+                    <div class="text-2xl font-bold text-green-800">${data.results.itemset_count}</div>
                     <div class="text-sm text-green-600">Tập phổ biến</div>
                 </div>
             </div>
@@ -236,7 +428,7 @@ function populateSummaryCards(data) {
             <div class="flex items-center">
                 <i class="fas fa-arrow-right text-purple-600 text-2xl mr-3"></i>
                 <div>
-                    <div class="text-2xl font-bold text-purple-800">${data.results.association_rules.length}</div>
+                    <div class="text-2xl font-bold text-purple-800">${data.results.rule_count}</div>
                     <div class="text-sm text-purple-600">Luật kết hợp</div>
                 </div>
             </div>
@@ -247,39 +439,52 @@ function populateSummaryCards(data) {
                 <div>
                     <div class="text-2xl font-bold text-orange-800">${data.results.execution_time}s</div>
                     <div class="text-sm text-orange-600">Thời gian chạy</div>
+                    ${data.timings ? `<div class="text-xs text-orange-500">Đường găng ${data.timings.critical_path_time}s · CPU ${data.timings.cpu_time.total}s</div>` : ''}
                 </div>
             </div>
         </div>
     `;
 }
 
-function populateItemsets(itemsets) {
+function populatePartialNotice(results) {
+    const partialNotice = document.getElementById('partialNotice');
+    if (!results.partial) {
+        partialNotice.classList.add('hidden');
+        return;
+    }
+    const exceeded = results.budget.exceeded;
+    partialNotice.innerHTML = `
+        <i class="fas fa-exclamation-triangle mr-2"></i>
+        Kết quả dở dang: thuật toán dừng sớm vì chạm giới hạn <strong>${exceeded.limit}</strong>
+        (${exceeded.value} &gt; ${exceeded.maximum}). Các tập phổ biến hiển thị có support chính xác
+        nhưng có thể chưa đầy đủ.
+    `;
+    partialNotice.classList.remove('hidden');
+}
+
+function populateItemsets(page) {
     const itemsetsList = document.getElementById('itemsetsList');
+    const itemsets = page.items;
 
-    if (itemsets.length === 0) {
-        itemsetsList.innerHTML = '<p class="text-gray-500 text-center py-8">Không tìm thấy tập phổ biến nào với ngưỡng đã cho.</p>';
+    if (page.total === 0) {
+        itemsetsList.innerHTML = resultToolbar('itemsets', page) +
+            '<p class="text-gray-500 text-center py-8">Không tìm thấy tập phổ biến nào với ngưỡng đã cho.</p>';
+        bindResultControls(itemsetsList, 'itemsets');
         return;
     }
 
-    // Sort by support descending (already sorted from backend, but ensure consistency)
-    const sortedItemsets = [...itemsets].sort((a, b) => {
-        if (a.support === 'N/A' && b.support === 'N/A') return 0;
-        if (a.support === 'N/A') return 1;
-        if (b.support === 'N/A') return -1;
-        return b.support - a.support;
-    });
-
     itemsetsList.innerHTML = `
+        ${resultToolbar('itemsets', page)}
         <div class="mb-4 text-sm text-gray-600 bg-green-50 p-3 rounded-lg">
-            <i class="fas fa-sort-amount-down mr-2"></i>
-            <strong>Đã sắp xếp theo độ Support từ cao xuống thấp</strong> (${sortedItemsets.length} tập phổ biến)
+            <i class="fas fa-sort-amount-${page.order === 'desc' ? 'down' : 'up'} mr-2"></i>
+            <strong>Đã sắp xếp theo ${SORT_OPTIONS.itemsets[page.sort]} ${page.order === 'desc' ? 'giảm dần' : 'tăng dần'}</strong> (${page.total} tập phổ biến)
         </div>
-        ${sortedItemsets.map((item, index) => `
+        ${itemsets.map((item, index) => `
             <div class="border border-gray-200 rounded-lg p-4 hover:shadow-md transition">
                 <div class="flex items-center justify-between">
                     <div class="flex items-center">
                         <span class="bg-blue-100 text-blue-800 text-xs font-medium px-2.5 py-0.5 rounded-full mr-3">
-                            #${item.rank || (index + 1)}
+                            #${item.rank || ((page.page - 1) * page.per_page + index + 1)}
                         </span>
                         <div>
                             <div class="font-medium text-gray-800">
@@ -300,31 +505,34 @@ function populateItemsets(itemsets) {
                 </div>
             </div>
         `).join('')}
+        ${resultPager('itemsets', page)}
     `;
+    bindResultControls(itemsetsList, 'itemsets');
 }
 
-function populateRules(rules) {
+function populateRules(page) {
     const rulesList = document.getElementById('rulesList');
+    const rules = page.items;
 
-    if (rules.length === 0) {
-        rulesList.innerHTML = '<p class="text-gray-500 text-center py-8">Không tìm thấy luật kết hợp nào với ngưỡng đã cho.</p>';
+    if (page.total === 0) {
+        rulesList.innerHTML = resultToolbar('rules', page) +
+            '<p class="text-gray-500 text-center py-8">Không tìm thấy luật kết hợp nào với ngưỡng đã cho.</p>';
+        bindResultControls(rulesList, 'rules');
         return;
     }
 
-    // Sắp xếp theo confidence từ cao xuống thấp (đề phòng)
-    const sortedRules = [...rules].sort((a, b) => b.confidence - a.confidence);
-
     rulesList.innerHTML = `
+        ${resultToolbar('rules', page)}
         <div class="mb-4 text-sm text-gray-600 bg-blue-50 p-3 rounded-lg">
-            <i class="fas fa-sort-amount-down mr-2"></i>
-            <strong>Đã sắp xếp theo độ tin cậy từ cao xuống thấp</strong> (${sortedRules.length} luật kết hợp)
+            <i class="fas fa-sort-amount-${page.order === 'desc' ? 'down' : 'up'} mr-2"></i>
+            <strong>Đã sắp xếp theo ${SORT_OPTIONS.rules[page.sort]} ${page.order === 'desc' ? 'giảm dần' : 'tăng dần'}</strong> (${page.total} luật kết hợp)
         </div>
-        ${sortedRules.map((rule, index) => `
+        ${rules.map((rule, index) => `
             <div class="border border-gray-200 rounded-lg p-4 hover:shadow-md transition">
                 <div class="flex items-start justify-between">
                     <div class="flex items-start">
                         <span class="bg-purple-100 text-purple-800 text-xs font-medium px-2.5 py-0.5 rounded-full mr-3 mt-1">
-                            #${index + 1}
+                            #${(page.page - 1) * page.per_page + index + 1}
                         </span>
                         <div class="flex-1">
                             <div class="font-medium text-gray-800 mb-2">
@@ -342,7 +550,9 @@ function populateRules(rules) {
                 </div>
             </div>
         `).join('')}
+        ${resultPager('rules', page)}
     `;
+    bindResultControls(rulesList, 'rules');
 }
 
 // Compare button functionality
@@ -357,7 +567,10 @@ compareBtn.addEventListener('click', async () => {
         compareBtn.disabled = true;
         compareBtn.innerHTML = '<i class="fas fa-spinner fa-spin mr-2"></i>Đang so sánh...';
 
-        const response = await fetch('/compare');
+        const compareUrl = currentResults && currentResults.job_id
+            ? `/compare?job_id=${encodeURIComponent(currentResults.job_id)}`
+            : '/compare';
+        const response = await fetch(compareUrl);
         const result = await response.json();
 
         if (!response.ok) {
@@ -366,7 +579,7 @@ compareBtn.addEventListener('click', async () => {
 
         // Switch to comparison mode
         isComparisonMode = true;
-        showComparison(currentResults, result.library_results);
+        showComparison(currentResults, result.library_results, result.comparison);
 
         compareBtn.innerHTML = '<i class="fas fa-arrow-left mr-2"></i>Quay lại kết quả gốc';
         compareBtn.disabled = false;
@@ -393,14 +606,15 @@ function showOriginalResults() {
     stepsTab.style.display = 'block';
 
     // Restore original data
-    populateItemsets(currentResults.results.frequent_itemsets);
-    populateRules(currentResults.results.association_rules);
+    loadResultPage('itemsets');
+    loadResultPage('rules');
 
     // Update button
     compareBtn.innerHTML = '<i class="fas fa-balance-scale mr-2"></i>So sánh với thư viện';
 }
 
-function showComparison(customResults, libraryResults) {
+// comparison: so sánh đã làm trên server (/compare?job_id=), gồm số lượng và trang đầu của mỗi nhóm
+function showComparison(customResults, libraryResults, comparison) {
     // Update header
     const header = document.querySelector('#resultsSection h2');
     header.innerHTML = '<i class="fas fa-balance-scale mr-2 text-blue-600"></i>So sánh kết quả: Thuật toán tự viết vs Thư viện';
@@ -412,8 +626,8 @@ function showComparison(customResults, libraryResults) {
     updateTabsForComparison();
 
     // Populate comparison data
-    populateItemsetsComparison(customResults.results.frequent_itemsets, libraryResults.frequent_itemsets);
-    populateRulesComparison(customResults.results.association_rules, libraryResults.association_rules);
+    populateItemsetsComparison(comparison.itemsets);
+    populateRulesComparison(comparison.rules);
 }
 
 function populateComparisonSummary(customResults, libraryResults) {
@@ -423,8 +637,8 @@ function populateComparisonSummary(customResults, libraryResults) {
             <div class="text-center">
                 <div class="text-lg font-bold text-blue-800">Thuật toán tự viết</div>
                 <div class="text-sm text-blue-600 mt-2">
-                    <div>Itemsets: ${customResults.results.frequent_itemsets.length}</div>
-                    <div>Rules: ${customResults.results.association_rules.length}</div>
+                    <div>Itemsets: ${customResults.results.itemset_count}</div>
+                    <div>Rules: ${customResults.results.rule_count}</div>
                     <div>Thời gian: ${customResults.results.execution_time}s</div>
                 </div>
             </div>
@@ -433,8 +647,8 @@ function populateComparisonSummary(customResults, libraryResults) {
             <div class="text-center">
                 <div class="text-lg font-bold text-green-800">Thư viện (mlxtend)</div>
                 <div class="text-sm text-green-600 mt-2">
-                    <div>Itemsets: ${libraryResults.frequent_itemsets.length}</div>
-                    <div>Rules: ${libraryResults.association_rules.length}</div>
+                    <div>Itemsets: ${libraryResults.itemset_count}</div>
+                    <div>Rules: ${libraryResults.rule_count}</div>
                     <div>Thời gian: ${libraryResults.execution_time.toFixed(4)}s</div>
                 </div>
             </div>
@@ -443,8 +657,8 @@ function populateComparisonSummary(customResults, libraryResults) {
             <div class="text-center">
                 <div class="text-lg font-bold text-yellow-800">Chênh lệch</div>
                 <div class="text-sm text-yellow-600 mt-2">
-                    <div>Itemsets: ${Math.abs(customResults.results.frequent_itemsets.length - libraryResults.frequent_itemsets.length)}</div>
-                    <div>Rules: ${Math.abs(customResults.results.association_rules.length - libraryResults.association_rules.length)}</div>
+                    <div>Itemsets: ${Math.abs(customResults.results.itemset_count - libraryResults.itemset_count)}</div>
+                    <div>Rules: ${Math.abs(customResults.results.rule_count - libraryResults.rule_count)}</div>
                     <div>Thời gian: ${Math.abs(customResults.results.execution_time - libraryResults.execution_time).toFixed(4)}s</div>
                 </div>
             </div>
@@ -470,81 +684,33 @@ function updateTabsForComparison() {
     switchTab('itemsets');
 }
 
-function populateItemsetsComparison(customItemsets, libraryItemsets) {
-    const itemsetsList = document.getElementById('itemsetsList');
-
-    // Function to create itemset key for comparison
-    const getItemsetKey = (itemset) => {
-        return [...itemset].sort().join(',');
-    };
-
-    // Create maps for easier lookup
-    const customMap = new Map();
-    customItemsets.forEach(item => {
-        const key = getItemsetKey(item.itemset);
-        customMap.set(key, item);
-    });
-
-    const libraryMap = new Map();
-    libraryItemsets.forEach(item => {
-        const key = getItemsetKey(item.itemset);
-        libraryMap.set(key, item);
-    });
-
-    // Find common, custom-only, and library-only itemsets
-    const commonKeys = new Set();
-    const customOnlyKeys = new Set();
-    const libraryOnlyKeys = new Set();
-
-    // Check custom itemsets
-    for (const key of customMap.keys()) {
-        if (libraryMap.has(key)) {
-            commonKeys.add(key);
-        } else {
-            customOnlyKeys.add(key);
-        }
-    }
-
-    // Check library itemsets
-    for (const key of libraryMap.keys()) {
-        if (!customMap.has(key)) {
-            libraryOnlyKeys.add(key);
-        }
-    }
-
-    // Create sorted arrays for display
-    const commonItemsets = Array.from(commonKeys).map(key => ({
-        custom: customMap.get(key),
-        library: libraryMap.get(key),
-        key: key
-    })).sort((a, b) => b.library.support - a.library.support);
-
-    const customOnlyItemsets = Array.from(customOnlyKeys).map(key => customMap.get(key))
-        .sort((a, b) => {
-            if (a.support === 'N/A' && b.support === 'N/A') return 0;
-            if (a.support === 'N/A') return 1;
-            if (b.support === 'N/A') return -1;
-            return b.support - a.support;
-        });
+// Ghi chú khi chỉ hiện trang đầu của một nhóm
+function shownNote(shown, total) {
+    return shown < total ? `<div class="text-xs text-gray-500 mt-1">Hiện ${shown} / ${total}</div>` : '';
+}
 
-    const libraryOnlyItemsets = Array.from(libraryOnlyKeys).map(key => libraryMap.get(key))
-        .sort((a, b) => b.support - a.support);
+function populateItemsetsComparison(itemsets) {
+    const itemsetsList = document.getElementById('itemsetsList');
+    const commonItemsets = itemsets.common_items;
+    const customOnlyItemsets = itemsets.custom_only_items;
+    const libraryOnlyItemsets = itemsets.library_only_items;
 
     itemsetsList.innerHTML = `
         <div class="mb-4 text-sm text-gray-600 bg-yellow-50 p-3 rounded-lg">
             <i class="fas fa-balance-scale mr-2"></i>
             <strong>So sánh chi tiết:</strong>
-            ${commonItemsets.length} chung |
-            ${customOnlyItemsets.length} chỉ có tự viết |
-            ${libraryOnlyItemsets.length} chỉ có thư viện
+            ${itemsets.common} chung |
+            ${itemsets.custom_only} chỉ có tự viết |
+            ${itemsets.library_only} chỉ có thư viện
         </div>
 
         <!-- Common Itemsets -->
-        ${commonItemsets.length > 0 ? `
+        ${itemsets.common > 0 ? `
         <div class="mb-6">
             <h3 class="text-lg font-semibold mb-3 text-purple-600">
-                <i class="fas fa-equals mr-2"></i>Tập phổ biến chung (${commonItemsets.length})
+                <i class="fas fa-equals mr-2"></i>Tập phổ biến chung (${itemsets.common})
             </h3>
+            ${shownNote(commonItemsets.length, itemsets.common)}
             <div class="grid md:grid-cols-2 gap-4">
                 <div class="space-y-2 max-h-64 overflow-y-auto">
                     <h4 class="font-medium text-blue-600">Thuật toán tự viết</h4>
@@ -575,12 +741,13 @@ function populateItemsetsComparison(customItemsets, libraryItemsets) {
         ` : ''}
 
         <!-- Different Itemsets -->
-        ${(customOnlyItemsets.length > 0 || libraryOnlyItemsets.length > 0) ? `
+        ${(itemsets.custom_only > 0 || itemsets.library_only > 0) ? `
         <div class="grid md:grid-cols-2 gap-6">
             <div>
                 <h3 class="text-lg font-semibold mb-3 text-blue-600">
-                    <i class="fas fa-code mr-2"></i>Chỉ có ở tự viết (${customOnlyItemsets.length})
+                    <i class="fas fa-code mr-2"></i>Chỉ có ở tự viết (${itemsets.custom_only})
                 </h3>
+                ${shownNote(customOnlyItemsets.length, itemsets.custom_only)}
                 <div class="space-y-2 max-h-64 overflow-y-auto">
                     ${customOnlyItemsets.map((item, index) => `
                         <div class="border border-blue-200 rounded p-2 text-sm">
@@ -595,8 +762,9 @@ function populateItemsetsComparison(customItemsets, libraryItemsets) {
             </div>
             <div>
                 <h3 class="text-lg font-semibold mb-3 text-green-600">
-                    <i class="fas fa-book mr-2"></i>Chỉ có ở thư viện (${libraryOnlyItemsets.length})
+                    <i class="fas fa-book mr-2"></i>Chỉ có ở thư viện (${itemsets.library_only})
                 </h3>
+                ${shownNote(libraryOnlyItemsets.length, itemsets.library_only)}
                 <div class="space-y-2 max-h-64 overflow-y-auto">
                     ${libraryOnlyItemsets.map((item, index) => `
                         <div class="border border-green-200 rounded p-2 text-sm">
@@ -614,23 +782,25 @@ function populateItemsetsComparison(customItemsets, libraryItemsets) {
     `;
 }
 
-function populateRulesComparison(customRules, libraryRules) {
+function populateRulesComparison(rules) {
     const rulesList = document.getElementById('rulesList');
 
-    // Sắp xếp cả 2 danh sách theo confidence từ cao xuống thấp
-    const sortedCustomRules = [...customRules].sort((a, b) => b.confidence - a.confidence);
-    const sortedLibraryRules = [...libraryRules].sort((a, b) => b.confidence - a.confidence);
+    // Server đã sắp xếp cả 2 danh sách theo confidence từ cao xuống thấp
+    const sortedCustomRules = rules.custom_items;
+    const sortedLibraryRules = rules.library_items;
 
     rulesList.innerHTML = `
         <div class="mb-4 text-sm text-gray-600 bg-yellow-50 p-3 rounded-lg">
             <i class="fas fa-sort-amount-down mr-2"></i>
             <strong>Cả 2 danh sách đã được sắp xếp theo độ tin cậy từ cao xuống thấp</strong>
+            (${rules.common} luật chung)
         </div>
         <div class="grid md:grid-cols-2 gap-6">
             <div>
                 <h3 class="text-lg font-semibold mb-4 text-blue-600">
-                    <i class="fas fa-code mr-2"></i>Thuật toán tự viết (${sortedCustomRules.length})
+                    <i class="fas fa-code mr-2"></i>Thuật toán tự viết (${rules.custom_total})
                 </h3>
+                ${shownNote(sortedCustomRules.length, rules.custom_total)}
                 <div class="space-y-3 max-h-96 overflow-y-auto">
                     ${sortedCustomRules.map((rule, index) => `
                         <div class="border border-blue-200 rounded p-3 text-sm">
@@ -649,8 +819,9 @@ function populateRulesComparison(customRules, libraryRules) {
             </div>
             <div>
                 <h3 class="text-lg font-semibold mb-4 text-green-600">
-                    <i class="fas fa-book mr-2"></i>Thư viện mlxtend (${sortedLibraryRules.length})
+                    <i class="fas fa-book mr-2"></i>Thư viện mlxtend (${rules.library_total})
                 </h3>
+                ${shownNote(sortedLibraryRules.length, rules.library_total)}
                 <div class="space-y-3 max-h-96 overflow-y-auto">
                     ${sortedLibraryRules.map((rule, index) => `
                         <div class="border border-green-200 rounded p-3 text-sm">
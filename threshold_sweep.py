@@ -0,0 +1,180 @@
+from itertools import combinations
+
+import numpy as np
+
+from apriori_test import main_apriori_algorithm
+from eclat_test import eclat
+from fpgrowth_test import fpgrowth
+from execution_trace import ExecutionTrace
+from mining_limits import downward_closed
+
+# Engines a support index can be mined with
+SWEEP_ALGORITHMS = ('apriori', 'fp-growth', 'eclat')
+
+# Most points a threshold grid may hold, the curve has one entry per support / confidence pair
+MAX_GRID_POINTS = 50
+
+# Confidence grid used when none is given
+DEFAULT_CONFIDENCE_GRID = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+# Points of the support grid spread between the floor and the highest itemset support when none is given
+DEFAULT_SUPPORT_POINTS = 10
+
+
+def parse_grid(text, name):
+    """Thresholds of a comma separated list such as '0.1, 0.2, 0.5', sorted; None when text is blank
+
+    Raises ValueError on values outside (0, 1] or more than MAX_GRID_POINTS values.
+    """
+    if text is None or not text.strip():
+        return None
+    values = sorted({float(value) for value in text.split(',') if value.strip()})
+    if not values:
+        return None
+    if len(values) > MAX_GRID_POINTS:
+        raise ValueError(f"{name} holds {len(values)} thresholds, at most {MAX_GRID_POINTS} are allowed")
+    for value in values:
+        if not 0 < value <= 1:
+            raise ValueError(f"{name} thresholds must be in (0, 1], got {value}")
+    return values
+
+
+class SupportIndex:
+    """Frequent itemsets of one mining pass at a floor support, with their support counts
+
+    Any support threshold at or above the floor selects a subset of the index: an itemset is
+    frequent when count / total_transactions >= support_threshold, as in the engines. Every
+    subset of an indexed itemset is indexed too, so rules of any confidence are derived from
+    the counts alone (confidence >= confidence_threshold, as in Apriori and mlxtend).
+    The candidate rules of the whole index are enumerated once, on first use, and kept as
+    arrays that every later query and the threshold curve filter.
+    """
+
+    def __init__(self, support_counts, total_transactions, support_floor, partial=False):
+        self.total_transactions = total_transactions
+        self.support_floor = support_floor
+        # A partial index misses itemsets, its counts are still exact
+        self.partial = partial
+        # Itemsets by support count, highest first
+        ranked = sorted(support_counts.items(), key=lambda entry: (-entry[1], sorted(map(str, entry[0]))))
+        self.itemsets = [itemset for itemset, _ in ranked]
+        self.counts = {itemset: count for itemset, count in ranked}
+        self.supports = np.array([count for _, count in ranked], dtype=np.float64) / total_transactions
+        self.rule_itemsets = None
+
+    def __len__(self):
+        return len(self.itemsets)
+
+    def check_support(self, support_threshold):
+        if support_threshold < self.support_floor:
+            raise ValueError(f"support_threshold {support_threshold} is below the floor {self.support_floor} "
+                             f"the index was mined at")
+
+    def frequent_itemsets(self, support_threshold):
+        """[(itemset, support)] of the itemsets at or above support_threshold, highest support first"""
+        self.check_support(support_threshold)
+        # supports are in descending order, the frequent ones are a prefix
+        frequent = int(np.count_nonzero(self.supports >= support_threshold))
+        return [(itemset, float(support)) for itemset, support in zip(self.itemsets[:frequent], self.supports)]
+
+    def build_rules(self):
+        """Enumerate every rule of the index once: antecedent, consequent and the arrays filtered later"""
+        if self.rule_itemsets is not None:
+            return
+        antecedents = []
+        consequents = []
+        rule_itemsets = []
+        confidences = []
+        for position, itemset in enumerate(self.itemsets):
+            if len(itemset) < 2:
+                continue
+            count = self.counts[itemset]
+            for size in range(1, len(itemset)):
+                for antecedent in combinations(itemset, size):
+                    antecedent = frozenset(antecedent)
+                    antecedents.append(antecedent)
+                    consequents.append(itemset - antecedent)
+                    rule_itemsets.append(position)
+                    confidences.append(count / self.counts[antecedent])
+        self.rule_antecedents = antecedents
+        self.rule_consequents = consequents
+        self.rule_itemsets = np.array(rule_itemsets, dtype=np.int64)
+        self.rule_supports = self.supports[self.rule_itemsets] if rule_itemsets else np.empty(0)
+        self.rule_confidences = np.array(confidences, dtype=np.float64)
+
+    def association_rules(self, support_threshold, confidence_threshold):
+        """[(antecedent, consequent, confidence)] of the frequent itemsets, highest confidence first"""
+        self.check_support(support_threshold)
+        self.build_rules()
+        selected = np.flatnonzero((self.rule_supports >= support_threshold)
+                                  & (self.rule_confidences >= confidence_threshold))
+        # Stable, so rules of equal confidence keep the order of their itemsets' supports
+        selected = selected[np.argsort(-self.rule_confidences[selected], kind='stable')]
+        return [
+            (self.rule_antecedents[rule], self.rule_consequents[rule], float(self.rule_confidences[rule]))
+            for rule in selected
+        ]
+
+    def default_support_grid(self, points=DEFAULT_SUPPORT_POINTS):
+        """points thresholds evenly spread from the floor to the highest itemset support"""
+        highest = float(self.supports[0]) if len(self.supports) else self.support_floor
+        return [round(float(value), 6) for value in np.linspace(self.support_floor, max(highest, self.support_floor),
+                                                                 points)]
+
+    def curve(self, support_grid, confidence_grid):
+        """Itemset and rule counts at every support / confidence pair of the grids
+
+        Returns one {'support_threshold', 'confidence_threshold', 'itemsets', 'rules'} entry
+        per pair, support thresholds outer. Counting sorts each support level's confidences
+        once, so the cost does not grow with the number of rules per pair.
+        """
+        for support_threshold in support_grid:
+            self.check_support(support_threshold)
+        self.build_rules()
+        confidence_grid = np.asarray(confidence_grid, dtype=np.float64)
+        points = []
+        for support_threshold in support_grid:
+            itemset_count = int(np.count_nonzero(self.supports >= support_threshold))
+            confidences = np.sort(self.rule_confidences[self.rule_supports >= support_threshold])
+            # rules with confidence >= c are those from the first index not below c
+            rule_counts = len(confidences) - np.searchsorted(confidences, confidence_grid, side='left')
+            for confidence_threshold, rule_count in zip(confidence_grid, rule_counts):
+                points.append({
+                    'support_threshold': support_threshold,
+                    'confidence_threshold': float(confidence_threshold),
+                    'itemsets': itemset_count,
+                    'rules': int(rule_count),
+                })
+        return points
+
+
+def mine_support_index(transactions, support_floor, algorithm='fp-growth', weights=None, trace=None, budget=None):
+    """Mine every frequent itemset at support_floor once and index their support counts
+
+    transactions and weights are those the engines take (see clean_data.deduplicate_transactions).
+    The engine runs without rule generation and hands over its support counts directly.
+    When budget stops the engine early, only the itemsets whose subsets were all found are
+    indexed and the index is marked partial.
+    """
+    if algorithm not in SWEEP_ALGORITHMS:
+        raise ValueError(f"Unknown algorithm '{algorithm}', expected one of {SWEEP_ALGORITHMS}")
+    if trace is None:
+        trace = ExecutionTrace('off')
+    total_transactions = len(transactions) if weights is None else sum(weights)
+
+    if algorithm == 'fp-growth':
+        freq_items, _, support_counts = fpgrowth(transactions, support_floor, 1.0, trace=trace, weights=weights,
+                                                 budget=budget, rules=False)
+        if freq_items is None:
+            support_counts = {}
+        else:
+            support_counts = {frozenset(itemset): support_counts[frozenset(itemset)] for itemset in freq_items}
+    else:
+        engine = main_apriori_algorithm if algorithm == 'apriori' else eclat
+        support_counts = {}
+        engine(transactions, support_floor, 1.0, trace=trace, weights=weights, budget=budget, rules=False,
+               support_counts=support_counts)
+
+    partial = budget is not None and budget.exceeded is not None
+    if partial:
+        support_counts = downward_closed(support_counts)
+    return SupportIndex(support_counts, total_transactions, support_floor, partial)